@@ -1,116 +1,64 @@
-import os
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
-
-from agno.agent import Agent
-from agno.team import Team
-from agno.models.openai import OpenAIChat
-from app.tools.menu_tool import get_menu, get_ingredients, get_price
-from app.tools.order_api_tool import create_complete_order,filter_orders,update_order_address,get_client_orders
-from app.init_db import initialize_database
-
-from agno.knowledge.knowledge import Knowledge
-from agno.knowledge.embedder.openai import OpenAIEmbedder
-from agno.vectordb.langchaindb import LangChainVectorDb
-
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from app.embeddings.knowledge_setup import setup_knowledge_base
-
-
-# Inicializa o banco de dados
-initialize_database()
-
-# Configura a base de conhecimento com Chroma
-knowledge = setup_knowledge_base(
-    file_path="data/historia_pizza.txt",
-    chunk_size=800,
-    chunk_overlap=120,
-    vectorstore_type="chroma",  # Força o uso do Chroma
-    persist_directory="./data/chroma_db",  # Pasta para persistir os dados
-    debug=True  # Mostra debug da API
-)
-
-
-SYSTEM_PROMPT = """
-Você é o atendente da Beauty Pizza. Seja objetivo e amigável.
-
-REGRAS OBRIGATÓRIAS:
-- Para dúvidas de cardápio: use get_menu()
-- Para saber ingrediente de alguma pizza get_ingredients(flavor)
-- Para montar pedido: SEMPRE peça sabor, tamanho e borda (todos obrigatórios)
-- Sempre passe o preço apos o pedido
-- Para preços: SEMPRE use get_price() - NUNCA chute valores
-- Antes de confirmar: mostre resumo completo do carrinho
-
-Sempre responda em português brasileiro.
 """
+Agente da Beauty Pizza (time + base de conhecimento).
 
-SYSTEM_PROMPT2 = """
-Você é o atendente da Beauty Pizza. Seu objetivo é executar ações relacionadas a registro, busca e update de pedidos.
-
-REGRAS OBRIGATÓRIAS:
--Quando tiver todas as informações, utilize create_complete_order para criar todo o pedido
--Para atualizar o endereço de um pedido existente, utilize update_order_address
--Para buscar pedidos de um cliente, utilize get_client_orders ou filter_orders
--Para cada ação, utilize os dados fornecidos pelo cliente
-
-
-PARÂMETROS OBRIGATORIOS DE CADA FUNÇÃO:
-
-update_order_address()
-order_id (int) - ID do pedido (OBRIGATORIO)
-delivery_address (Dict) - Logradouro de entrega, que deve conter:
-            {
-            "street_name": "Nome da rua" (OBRIGATORIO),
-            "number": "Numero do logradouro" (OBRIGATORIO),
-            "complement": "Complemento" ,
-            "reference_point": "Ponto de referência"
-            }
-
-create_complete_order() 
-client_name (str) - Nome do cliente
-client_document (str) - Documento do cliente
-delivery_address (Dict) - Logradouro de entrega, que deve conter:
-            {
-            "street_name": "Nome da rua" (OBRIGATORIO),
-            "number": "Numero do logradouro" (OBRIGATORIO),
-            "complement": "Complemento" ,
-            "reference_point": "Ponto de referência"
-            }
-delivery_date (str) - Data de entrega no formato "YYYY-MM-DD"
-items (List[Dict]) - Lista de itens ex:     Example:
-        items = [
-            {"name": "Produto A", "quantity": 2, "unit_price": 10.50},
-            {"name": "Produto B", "quantity": 1, "unit_price": 25.00}
-        ]
-
-get_client_orders()
-client_document (str) - Documento do cliente
-
-Sempre responda em português brasileiro.
+Importar este módulo não tem efeitos colaterais: o banco, a base de
+conhecimento (Chroma ou snapshot) e o time só são montados na primeira
+chamada a get_agent() (CLI em app.main, workers em app.workers).
+`from app.agent import agent` continua funcionando e monta o agente na hora.
 """
-debug_mode = False
-markdown = False
-information_agent = Agent(
-    name="Information Agent",
-    role="Procurar informações referentes ao cardapio, pedidos e ingredientes",
-    model=OpenAIChat(id="gpt-4.1", temperature=0, max_tokens=6000),
-    instructions=SYSTEM_PROMPT,
-    knowledge=knowledge,
-    tools=[get_menu, get_ingredients, get_price],
-    markdown=markdown,
-    debug_mode=debug_mode
-)
+import os
+import threading
 
-executor_agent = Agent(
-    name="Executor Agent",
-    role="Executar ações relacionadas a pedidos",
-    model=OpenAIChat(id="gpt-4.1", temperature=0, max_tokens=6000),
-    tools=[get_price,create_complete_order,filter_orders,update_order_address,get_client_orders],
-    instructions=SYSTEM_PROMPT2,
-    markdown=markdown,
-    debug_mode=debug_mode
-)
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-agent = Team(model=OpenAIChat(id="gpt-4.1", temperature=0, max_tokens=6000),
-             members=[information_agent, executor_agent])
+from app.team import SYSTEM_PROMPT, SYSTEM_PROMPT2, build_team  # noqa: F401,E402 (reexportados)
+
+
+_agent = None
+_knowledge = None
+_lock = threading.Lock()
+
+
+def get_knowledge():
+    """Inicializa o banco e a base de conhecimento (uma vez por processo)."""
+    global _knowledge
+    with _lock:
+        if _knowledge is None:
+            from app.init_db import initialize_database
+            from app.embeddings.knowledge_setup import setup_knowledge_base
+
+            # Inicializa o banco de dados
+            initialize_database()
+
+            # Configura a base de conhecimento com Chroma
+            # (ou a partir de um snapshot pré-construído, se KNOWLEDGE_SNAPSHOT estiver definido)
+            _knowledge = setup_knowledge_base(
+                file_path=os.getenv("KNOWLEDGE_SNAPSHOT", "data/historia_pizza.txt"),
+                chunk_size=800,
+                chunk_overlap=120,
+                vectorstore_type="chroma",  # Força o uso do Chroma
+                persist_directory="./data/chroma_db",  # Pasta para persistir os dados
+                debug=True  # Mostra debug da API
+            )
+        return _knowledge
+
+
+def get_agent():
+    """Time de agentes do processo, montado na primeira chamada."""
+    global _agent
+    if _agent is None:
+        knowledge = get_knowledge()
+        with _lock:
+            if _agent is None:
+                # Prompts, ferramentas e modelos ficam em app/team.py
+                _agent = build_team(knowledge=knowledge)
+    return _agent
+
+
+def __getattr__(name: str):
+    # Compatibilidade: `agent` e `knowledge` como atributos, montados sob demanda
+    if name == "agent":
+        return get_agent()
+    if name == "knowledge":
+        return get_knowledge()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
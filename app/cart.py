@@ -0,0 +1,208 @@
+"""
+Carrinho estruturado por sessão.
+
+O pedido em montagem não depende mais de o modelo reler a conversa: itens
+(PizzaSpec + quantidade + preço unitário), dados do cliente e endereço ficam
+num Cart por sessão.
+- as ferramentas de app.tools.cart_tool alteram o carrinho da sessão atual,
+  definido por `use_cart` (como o catálogo em menu_tool.use_catalog)
+- o prompt recebe o resumo compacto (Cart.summary) no lugar do histórico longo
+- create_complete_order consome o carrinho
+- o carrinho é salvo junto com a sessão (SessionStore.load_cart/save_cart)
+- um turno abandonado pelo prazo (Cart.cancel_turns) não altera mais o carrinho
+"""
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Any, Optional
+
+
+CUSTOMER_FIELDS = ("client_name", "client_document", "delivery_date", "delivery_address")
+_FIELD_LABELS = {
+    "client_name": "nome", "client_document": "documento",
+    "delivery_date": "data de entrega", "delivery_address": "endereço",
+}
+
+
+class TurnCancelled(RuntimeError):
+    """O turno que tentou alterar o carrinho já foi abandonado (prazo do turno esgotado)."""
+
+
+def _money(value: float) -> str:
+    return f"R$ {value:.2f}".replace(".", ",")
+
+
+class CartItem:
+    """Uma linha do carrinho: pizza (IDs de sabor/tamanho/borda), quantidade e preço unitário."""
+
+    def __init__(self, flavor: int, size: int, crust: int, quantity: int, unit_price: float, name: str):
+        self.flavor = flavor
+        self.size = size
+        self.crust = crust
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.name = name
+
+    @property
+    def spec(self):
+        return self.flavor, self.size, self.crust
+
+    @property
+    def total(self) -> float:
+        return self.quantity * self.unit_price
+
+    def order_item(self) -> Dict[str, Any]:
+        """Item no formato da API de pedidos."""
+        return {"name": self.name, "quantity": self.quantity, "unit_price": self.unit_price}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CartItem":
+        return cls(**data)
+
+
+class Cart:
+    """Carrinho de uma sessão (seguro para as ferramentas em paralelo do mesmo turno)."""
+
+    def __init__(self):
+        self.items: List[CartItem] = []
+        self.client_name: Optional[str] = None
+        self.client_document: Optional[str] = None
+        self.delivery_date: Optional[str] = None
+        self.delivery_address: Optional[Dict[str, str]] = None
+        self._lock = threading.RLock()
+        # Turnos iniciados antes do último cancel_turns não podem mais alterar o carrinho
+        self._turn = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def total(self) -> float:
+        return sum(item.total for item in self.items)
+
+    def is_empty(self) -> bool:
+        return not self.items and not any(getattr(self, f) for f in CUSTOMER_FIELDS)
+
+    @contextmanager
+    def editing(self):
+        """Trava o carrinho para alteração; levanta TurnCancelled se o turno atual foi abandonado."""
+        with self._lock:
+            binding = _current_cart.get()
+            if binding is not None and binding[0] is self and binding[1] != self._turn:
+                raise TurnCancelled("Turno cancelado pelo prazo: o carrinho não foi alterado")
+            yield self
+
+    def cancel_turns(self) -> None:
+        """Invalida os turnos em andamento (espera a alteração em curso terminar)."""
+        with self._lock:
+            self._turn += 1
+
+    def add(self, flavor: int, size: int, crust: int, quantity: int, unit_price: float, name: str) -> CartItem:
+        """Adiciona pizzas; a mesma combinação soma na linha existente."""
+        if quantity < 1:
+            raise ValueError("quantity deve ser pelo menos 1")
+        with self.editing():
+            for item in self.items:
+                if item.spec == (flavor, size, crust):
+                    item.quantity += quantity
+                    return item
+            item = CartItem(flavor, size, crust, quantity, unit_price, name)
+            self.items.append(item)
+            return item
+
+    def remove(self, item_number: int, quantity: Optional[int] = None) -> CartItem:
+        """Remove a linha `item_number` (1 = primeira) ou só `quantity` unidades dela."""
+        if quantity is not None and quantity < 1:
+            raise ValueError("quantity deve ser pelo menos 1")
+        with self.editing():
+            if not 1 <= item_number <= len(self.items):
+                raise IndexError(f"O carrinho não tem o item {item_number} (itens: {len(self.items)})")
+            item = self.items[item_number - 1]
+            if quantity is None or quantity >= item.quantity:
+                return self.items.pop(item_number - 1)
+            item.quantity -= quantity
+            return item
+
+    def set_customer(self, **fields) -> None:
+        """Atualiza nome, documento, data e endereço de entrega (campos None são ignorados)."""
+        with self.editing():
+            for name, value in fields.items():
+                if name not in CUSTOMER_FIELDS:
+                    raise ValueError(f"Campo desconhecido: {name}")
+                if value:
+                    setattr(self, name, value)
+
+    def missing(self) -> List[str]:
+        """O que ainda falta para fechar o pedido."""
+        missing = [] if self.items else ["itens"]
+        return missing + [_FIELD_LABELS[f] for f in CUSTOMER_FIELDS if not getattr(self, f)]
+
+    def order_items(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [item.order_item() for item in self.items]
+
+    def clear(self) -> None:
+        with self.editing():
+            self.items = []
+            for name in CUSTOMER_FIELDS:
+                setattr(self, name, None)
+
+    def summary(self) -> str:
+        """Resumo compacto para o prompt (uma linha por item)."""
+        with self._lock:
+            if self.is_empty():
+                return "Carrinho vazio."
+            lines = [
+                f"{n}) {item.quantity}x {item.name} {_money(item.unit_price)} = {_money(item.total)}"
+                for n, item in enumerate(self.items, 1)
+            ]
+            lines.append(f"Total: {_money(self.total)}")
+            if self.client_name or self.client_document:
+                lines.append(f"Cliente: {self.client_name or '?'} ({self.client_document or 'sem documento'})")
+            if self.delivery_address:
+                address = self.delivery_address
+                parts = [f"{address.get('street_name', '?')}, {address.get('number', '?')}", address.get("complement")]
+                lines.append(f"Endereço: {' - '.join(p for p in parts if p)}")
+            if self.delivery_date:
+                lines.append(f"Entrega: {self.delivery_date}")
+            missing = self.missing()
+            lines.append(f"Falta: {', '.join(missing)}" if missing else "Pronto para fechar o pedido.")
+            return "\n".join(lines)
+
+    def to_json(self) -> str:
+        with self._lock:
+            data = {f: getattr(self, f) for f in CUSTOMER_FIELDS}
+            data["items"] = [item.to_dict() for item in self.items]
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Cart":
+        data = json.loads(raw)
+        cart = cls()
+        cart.items = [CartItem.from_dict(item) for item in data.pop("items", [])]
+        cart.set_customer(**data)
+        return cart
+
+
+# Carrinho da sessão em atendimento e o turno em que foi associado: (cart, turno)
+_current_cart: ContextVar = ContextVar("session_cart", default=None)
+
+
+@contextmanager
+def use_cart(cart: Optional[Cart]):
+    """Direciona as ferramentas do carrinho para `cart` neste contexto (um turno)."""
+    token = _current_cart.set((cart, cart._turn) if cart is not None else None)
+    try:
+        yield cart
+    finally:
+        _current_cart.reset(token)
+
+
+def current_cart() -> Optional[Cart]:
+    """Carrinho da sessão atual (None fora de um turno com carrinho)."""
+    binding = _current_cart.get()
+    return binding[0] if binding is not None else None
@@ -1,3 +1,4 @@
 from .knowledge_setup import setup_knowledge_base, AgnoEmbedderAdapter, install_vectorstore_dependencies
+from .lexical import BM25Index, HybridRetriever
 
-__all__ = ["setup_knowledge_base", "AgnoEmbedderAdapter", "install_vectorstore_dependencies"]
\ No newline at end of file
+__all__ = ["setup_knowledge_base", "AgnoEmbedderAdapter", "install_vectorstore_dependencies", "BM25Index", "HybridRetriever"]
@@ -0,0 +1,320 @@
+"""
+Benchmark dos vectorstores e escolha do backend "auto" por perfil medido.
+
+Para cada backend instalado (chroma, faiss, docarray, ivf, simple) e cada
+tamanho de corpus sintético, mede:
+- tempo de construção (via create_vectorstore, o mesmo caminho da produção)
+- latência de consulta (p50/p95)
+- memória alocada na construção (tracemalloc: Python e NumPy; bibliotecas
+  nativas como FAISS/Chroma alocam fora dele e aparecem subestimadas)
+- recall@k contra a busca exata
+
+Os embeddings vêm de um embedder falso e determinístico (sem API): cada
+palavra tem um vetor aleatório fixo e o texto é a soma normalizada.
+
+O perfil salvo (RETRIEVAL_PROFILE, padrão data/retrieval_profile.json) é
+usado por `create_vectorstore(vectorstore_type="auto")`: entre os backends
+instalados, escolhe o mais rápido no tamanho de corpus mais próximo do real.
+Sem perfil, vale a ordem fixa (Chroma > FAISS > DocArray > Simple).
+
+Uso:
+    python -m app.embeddings.backend_benchmark --sizes 500 5000 20000 --save
+    python -m app.embeddings.backend_benchmark --choose 12000
+"""
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+PROFILE_PATH = os.getenv("RETRIEVAL_PROFILE", "data/retrieval_profile.json")
+# Ordem de preferência sem perfil (e desempate)
+BACKENDS = ("chroma", "faiss", "docarray", "ivf", "simple")
+# Backends que recarregam o índice sem gerar embeddings de novo
+PERSISTENT_BACKENDS = {"chroma", "ivf"}
+# A partir deste tamanho, re-gerar embeddings a cada início custa mais que a busca: exige persistência
+PERSIST_MIN_TEXTS = 5000
+
+
+class FakeEmbeddings:
+    """Embedder determinístico sem API: soma normalizada de vetores fixos por palavra."""
+
+    def __init__(self, dim: int = 256, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self._words: Dict[str, Any] = {}
+        self._cache: Dict[str, List[float]] = {}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._cache.get(text)
+        if vector is None:
+            vector = self._cache[text] = self._embed(text)
+        return vector
+
+    def _word(self, word: str):
+        vector = self._words.get(word)
+        if vector is None:
+            word_seed = zlib.crc32(word.encode("utf-8")) + self.seed
+            if HAS_NUMPY:
+                vector = np.random.default_rng(word_seed).standard_normal(self.dim).astype(np.float32)
+            else:
+                rng = random.Random(word_seed)
+                vector = [rng.gauss(0, 1) for _ in range(self.dim)]
+            self._words[word] = vector
+        return vector
+
+    def _embed(self, text: str) -> List[float]:
+        words = text.split()
+        if HAS_NUMPY:
+            total = np.sum([self._word(w) for w in words], axis=0) if words else np.zeros(self.dim, np.float32)
+            norm = float(np.linalg.norm(total)) or 1.0
+            return (total / norm).tolist()
+        total = [0.0] * self.dim
+        for word in words:
+            total = [a + b for a, b in zip(total, self._word(word))]
+        norm = math.sqrt(sum(x * x for x in total)) or 1.0
+        return [x / norm for x in total]
+
+
+def synthetic_corpus(n: int, n_queries: int = 50, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """
+    Corpus sintético em tópicos: cada texto mistura palavras do seu tópico e
+    palavras comuns; cada consulta sorteia palavras do tópico de um texto.
+    """
+    rng = random.Random(seed)
+    topics = max(8, n // 50)
+    texts = []
+    for i in range(n):
+        topic = rng.randrange(topics)
+        words = [f"t{topic}w{rng.randrange(30)}" for _ in range(8)] + [f"c{rng.randrange(200)}" for _ in range(4)]
+        texts.append(f"doc{i} " + " ".join(words))
+    queries = []
+    for _ in range(n_queries):
+        topic_words = [w for w in rng.choice(texts).split() if w.startswith("t")]
+        queries.append(" ".join(rng.sample(topic_words, min(5, len(topic_words)))))
+    return texts, queries
+
+
+def exact_top_k(embeddings: FakeEmbeddings, texts: List[str], queries: List[str], k: int) -> List[set]:
+    """Vizinhos exatos (cosseno) de cada consulta: o gabarito do recall."""
+    if HAS_NUMPY:
+        matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        truth = []
+        for query in queries:
+            scores = matrix @ np.asarray(embeddings.embed_query(query), dtype=np.float32)
+            truth.append(set(np.argsort(-scores)[:k].tolist()))
+        return truth
+    vectors = embeddings.embed_documents(texts)
+    truth = []
+    for query in queries:
+        q = embeddings.embed_query(query)
+        scores = [sum(a * b for a, b in zip(v, q)) for v in vectors]
+        truth.append(set(sorted(range(len(texts)), key=scores.__getitem__, reverse=True)[:k]))
+    return truth
+
+
+def available_backends() -> List[str]:
+    """Backends instalados, na ordem de preferência."""
+    from .knowledge_setup import HAS_CHROMA, HAS_FAISS, HAS_DOCARRAY, HAS_NUMPY as SETUP_HAS_NUMPY
+
+    installed = {
+        "chroma": HAS_CHROMA, "faiss": HAS_FAISS, "docarray": HAS_DOCARRAY,
+        "ivf": SETUP_HAS_NUMPY, "simple": True,
+    }
+    return [b for b in BACKENDS if installed[b]]
+
+
+def default_backend(available: List[str]) -> str:
+    """Escolha sem perfil: Chroma > FAISS > DocArray > Simple (o IVF só quando pedido)."""
+    return next((b for b in available if b != "ivf"), "simple")
+
+
+class _Split:
+    # create_vectorstore só lê page_content
+    def __init__(self, text: str):
+        self.page_content = text
+
+
+@contextlib.contextmanager
+def _built(backend: str, texts: List[str], embeddings: FakeEmbeddings):
+    # Constrói num diretório temporário (Chroma/IVF persistem), removido ao final
+    from .knowledge_setup import create_vectorstore
+
+    directory = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            store = create_vectorstore([_Split(t) for t in texts], embeddings, backend, directory)
+        yield store
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _result_text(doc) -> str:
+    # SimpleInMemory/IVF devolvem dicts; os do LangChain, Documents
+    return doc["page_content"] if isinstance(doc, dict) else doc.page_content
+
+
+def benchmark_backend(
+    backend: str,
+    texts: List[str],
+    queries: List[str],
+    truth: List[set],
+    embeddings: FakeEmbeddings,
+    k: int = 4,
+    memory: bool = True
+) -> Dict[str, Any]:
+    """Mede um backend num corpus (embeddings já em cache: só o índice é medido)."""
+    position = {text: i for i, text in enumerate(texts)}
+    latencies, hits = [], 0
+    start = time.perf_counter()
+    with _built(backend, texts, embeddings) as store:
+        build_s = time.perf_counter() - start
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            docs = store.similarity_search(query, k=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & {position.get(_result_text(d)) for d in docs})
+    latencies.sort()
+
+    memory_mb = None
+    if memory:
+        # Segunda construção com tracemalloc (ele deixaria a primeira mais lenta)
+        tracemalloc.start()
+        try:
+            with _built(backend, texts, embeddings):
+                memory_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "backend": backend,
+        "n": len(texts),
+        "build_s": build_s,
+        "query_p50_ms": latencies[len(latencies) // 2],
+        "query_p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "memory_mb": memory_mb,
+        "recall": hits / (k * len(queries)) if queries else 1.0,
+        "persistent": backend in PERSISTENT_BACKENDS,
+    }
+
+
+def benchmark_backends(
+    sizes: Tuple[int, ...] = (500, 5000, 20000),
+    backends: Optional[List[str]] = None,
+    n_queries: int = 50,
+    k: int = 4,
+    dim: int = 256,
+    seed: int = 0,
+    memory: bool = True
+) -> List[Dict[str, Any]]:
+    """Roda o benchmark de todos os backends disponíveis em cada tamanho de corpus."""
+    backends = backends or available_backends()
+    rows = []
+    for n in sizes:
+        texts, queries = synthetic_corpus(n, n_queries, seed)
+        embeddings = FakeEmbeddings(dim, seed)
+        truth = exact_top_k(embeddings, texts, queries, k)
+        for backend in backends:
+            rows.append(benchmark_backend(backend, texts, queries, truth, embeddings, k, memory))
+    return rows
+
+
+def save_profile(rows: List[Dict[str, Any]], path: str = PROFILE_PATH, **params):
+    """Grava o perfil usado pelo modo "auto"."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "params": params, "results": rows}, f, indent=2)
+
+
+def load_profile(path: str = PROFILE_PATH) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def choose_backend(
+    n_texts: int,
+    available: List[str],
+    profile_path: str = PROFILE_PATH,
+    persistent: Optional[bool] = None,
+    min_recall: float = 0.9
+) -> Optional[str]:
+    """
+    Backend mais rápido (p50 de consulta) no tamanho medido mais próximo de n_texts.
+
+    Args:
+        n_texts: número de chunks do corpus real
+        available: backends instalados
+        persistent: exige backend persistente (None: só a partir de PERSIST_MIN_TEXTS)
+        min_recall: descarta backends aproximados abaixo deste recall (se sobrar algum)
+
+    Returns:
+        Nome do backend, ou None sem perfil utilizável (vale a ordem fixa)
+    """
+    profile = load_profile(profile_path)
+    if not profile:
+        return None
+    rows = [r for r in profile.get("results", []) if r["backend"] in available]
+    if persistent is None:
+        persistent = n_texts >= PERSIST_MIN_TEXTS
+    if persistent:
+        rows = [r for r in rows if r["persistent"]] or rows
+    if not rows:
+        return None
+
+    # Tamanho mais próximo em escala logarítmica
+    target = math.log(max(n_texts, 1))
+    nearest = min({r["n"] for r in rows}, key=lambda n: abs(math.log(n) - target))
+    candidates = [r for r in rows if r["n"] == nearest]
+    candidates = [r for r in candidates if r["recall"] >= min_recall] or candidates
+    best = min(candidates, key=lambda r: (r["query_p50_ms"], r["build_s"], BACKENDS.index(r["backend"])))
+    return best["backend"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark dos vectorstores")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 20000], help="Tamanhos de corpus")
+    parser.add_argument("--backends", nargs="+", default=None, help="Backends (padrão: todos os instalados)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--no-memory", action="store_true", help="Não mede memória (metade do tempo)")
+    parser.add_argument("--save", action="store_true", help=f"Grava o perfil em {PROFILE_PATH}")
+    parser.add_argument("--choose", type=int, default=None, help="Mostra o backend escolhido para N chunks")
+    args = parser.parse_args()
+
+    if args.choose is not None:
+        backends = available_backends()
+        chosen = choose_backend(args.choose, backends)
+        print(f"📊 {args.choose} chunks -> {chosen or default_backend(backends) + ' (sem perfil: ordem fixa)'}")
+    else:
+        rows = benchmark_backends(tuple(args.sizes), args.backends, args.queries, args.k, args.dim,
+                                  memory=not args.no_memory)
+        print(f"{'backend':>9} {'N':>7} {'build(s)':>9} {'p50(ms)':>8} {'p95(ms)':>8} {'mem(MB)':>8} {'recall':>7}")
+        for row in rows:
+            memory = f"{row['memory_mb']:>8.1f}" if row["memory_mb"] is not None else f"{'-':>8}"
+            print(f"{row['backend']:>9} {row['n']:>7} {row['build_s']:>9.2f} {row['query_p50_ms']:>8.2f} "
+                  f"{row['query_p95_ms']:>8.2f} {memory} {row['recall']:>7.3f}")
+        if args.save:
+            save_profile(rows, queries=args.queries, k=args.k, dim=args.dim)
+            print(f"💾 Perfil salvo em {PROFILE_PATH}")
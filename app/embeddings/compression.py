@@ -0,0 +1,232 @@
+"""
+Compressão do contexto recuperado antes de ir para o prompt.
+
+Os chunks são gerados com sobreposição (`chunk_overlap`), então os top-k da
+busca costumam repetir trechos. Depois da recuperação:
+1. frases repetidas (ou já contidas numa frase de um chunk mais bem
+   posicionado, como os fragmentos da sobreposição) são removidas
+2. seleção estilo MMR por chunk: relevância (posição na busca + termos da
+   query) contra redundância (Jaccard dos termos) com os já escolhidos, dentro
+   do orçamento de tokens; um chunk que não cabe inteiro mantém as frases com
+   mais termos da query
+3. só depois, chunks escolhidos que são vizinhos (chunk_3 + chunk_4) viram um
+   trecho só, sem repetir a sobreposição
+
+Cada consulta registra os tokens antes/depois em `last_report` e `stats`.
+"""
+import logging
+import re
+import threading
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from .lexical import normalize_text, tokenize
+
+
+logger = logging.getLogger("beauty_pizza.retrieval")
+
+_POSITION_RE = re.compile(r"chunk_(\d+)$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def chunk_position(metadata: Dict) -> Optional[int]:
+    """Posição do chunk no documento ("chunk_12" -> 12), se conhecida."""
+    match = _POSITION_RE.search(str((metadata or {}).get("source", "")))
+    return int(match.group(1)) if match else None
+
+
+def merge_overlap(first: str, second: str, min_overlap: int = 20) -> str:
+    """Concatena dois chunks vizinhos sem repetir o sufixo de `first` que abre `second`."""
+    first, second = first.rstrip(), second.lstrip()
+    for size in range(min(len(first), len(second)), min_overlap - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+class ContextCompressor:
+    """
+    Pós-processamento dos chunks recuperados.
+
+    Args:
+        max_tokens: orçamento de tokens do conhecimento injetado por consulta
+        diversity: peso da redundância no MMR (0 = só relevância)
+        min_overlap: menor sobreposição (caracteres) considerada ao unir vizinhos
+        count_tokens: contador de tokens (ex.: AgnoEmbedderAdapter.count_tokens);
+            sem ele, ~4 caracteres por token
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 700,
+        diversity: float = 0.3,
+        min_overlap: int = 20,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.max_tokens = max_tokens
+        self.diversity = diversity
+        self.min_overlap = min_overlap
+        self.count_tokens = count_tokens or (lambda text: max(1, len(text) // 4))
+        self.stats = {"queries": 0, "tokens_in": 0, "tokens_out": 0, "tokens_saved": 0}
+        self.last_report: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def compress(self, query: str, items: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """
+        Comprime os chunks recuperados.
+
+        Args:
+            query: consulta do usuário
+            items: (texto, metadados) na ordem de relevância da busca
+
+        Returns:
+            (texto, metadados) dos trechos escolhidos, do mais relevante ao
+            menos; metadados["sources"] lista os chunks que compõem cada trecho
+        """
+        tokens_in = sum(self.count_tokens(text) for text, _ in items)
+        chunks = self._dedupe_sentences(self._unique(items))
+        passages = self._fit(self._merge_neighbours(self._select(query, chunks, len(items))))
+
+        tokens_out = sum(self.count_tokens(p["text"]) for p in passages)
+        report = {
+            "query": query,
+            "chunks_in": len(items),
+            "passages_out": len(passages),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
+        with self._lock:
+            self.stats["queries"] += 1
+            for key in ("tokens_in", "tokens_out", "tokens_saved"):
+                self.stats[key] += report[key]
+            self.last_report = report
+        logger.info(
+            "contexto comprimido: %d chunks -> %d trechos, %d -> %d tokens (-%d)",
+            len(items), len(passages), tokens_in, tokens_out, tokens_in - tokens_out
+        )
+        return [(p["text"], dict(p["metadata"], sources=p["sources"])) for p in passages]
+
+    # -- etapas ---------------------------------------------------------------
+
+    @staticmethod
+    def _unique(items: List[Tuple[str, Dict]]) -> List[Dict[str, Any]]:
+        # Remove repetidos (o mesmo chunk pode vir do BM25 e da busca vetorial)
+        chunks, seen = [], set()
+        for rank, (text, metadata) in enumerate(items):
+            metadata = metadata or {}
+            key = metadata.get("source") or text
+            if key not in seen:
+                seen.add(key)
+                chunks.append({"text": text, "metadata": metadata, "rank": rank,
+                               "position": chunk_position(metadata)})
+        return chunks
+
+    def _dedupe_sentences(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Os mais relevantes primeiro: a frase fica no chunk de melhor posição
+        seen: List[str] = []
+        kept = []
+        for chunk in chunks:
+            sentences = []
+            for sentence in split_sentences(chunk["text"]):
+                key = normalize_text(sentence)
+                if len(key) >= self.min_overlap and any(key in other for other in seen):
+                    continue
+                seen.append(key)
+                sentences.append(sentence)
+            if sentences:
+                chunk["sentences"] = sentences
+                chunk["text"] = " ".join(sentences)
+                kept.append(chunk)
+        return kept
+
+    def _select(self, query: str, chunks: List[Dict[str, Any]], retrieved: int) -> List[Dict[str, Any]]:
+        if not chunks:
+            return []
+        query_terms = set(tokenize(query))
+        for chunk in chunks:
+            chunk["terms"] = set(tokenize(chunk["text"]))
+            coverage = len(query_terms & chunk["terms"]) / len(query_terms) if query_terms else 0.0
+            chunk["relevance"] = 0.5 * (1 - chunk["rank"] / retrieved) + 0.5 * coverage
+
+        selected: List[Dict[str, Any]] = []
+        remaining = self.max_tokens
+        candidates = list(chunks)
+        while candidates and remaining > 0:
+            def mmr(c):
+                redundancy = max((_jaccard(c["terms"], s["terms"]) for s in selected), default=0.0)
+                return (1 - self.diversity) * c["relevance"] - self.diversity * redundancy
+
+            best = max(candidates, key=mmr)
+            candidates.remove(best)
+            tokens = self.count_tokens(best["text"])
+            if tokens > remaining:
+                best = self._truncate(best, query_terms, remaining)
+                if best is None:
+                    continue
+                tokens = self.count_tokens(best["text"])
+            selected.append(best)
+            remaining -= tokens
+        return selected
+
+    def _truncate(self, chunk: Dict[str, Any], query_terms: set, budget: int) -> Optional[Dict[str, Any]]:
+        # Mantém as frases com mais termos da query que cabem no orçamento, na ordem original
+        order = sorted(
+            range(len(chunk["sentences"])),
+            key=lambda i: (-len(query_terms & set(tokenize(chunk["sentences"][i]))), i)
+        )
+        keep, used = [], 0
+        for i in order:
+            tokens = self.count_tokens(chunk["sentences"][i])
+            if used + tokens <= budget:
+                keep.append(i)
+                used += tokens
+        keep.sort()
+        sentences = [chunk["sentences"][i] for i in keep]
+        # A contagem do texto unido pode passar da soma das frases
+        while sentences and self.count_tokens(" ".join(sentences)) > budget:
+            sentences.pop()
+        if not sentences:
+            return None
+        # Frases fora de ordem contígua não servem mais para unir com vizinhos
+        position = chunk["position"] if len(sentences) == len(chunk["sentences"]) else None
+        return dict(chunk, text=" ".join(sentences), sentences=sentences, position=position)
+
+    def _merge_neighbours(self, selected: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Une apenas chunks escolhidos e vizinhos no documento
+        positioned = sorted((c for c in selected if c["position"] is not None), key=lambda c: c["position"])
+        passages: List[Dict[str, Any]] = []
+        for chunk in positioned:
+            last = passages[-1] if passages else None
+            if last is not None and last["end"] == chunk["position"] - 1:
+                last["text"] = merge_overlap(last["text"], chunk["text"], self.min_overlap).replace("\n", " ")
+                last["end"] = chunk["position"]
+                last["rank"] = min(last["rank"], chunk["rank"])
+                last["sources"].append(chunk["metadata"].get("source"))
+            else:
+                passages.append({
+                    "text": chunk["text"], "metadata": chunk["metadata"], "rank": chunk["rank"],
+                    "end": chunk["position"], "sources": [chunk["metadata"].get("source")],
+                })
+        for chunk in selected:
+            if chunk["position"] is None:
+                passages.append({"text": chunk["text"], "metadata": chunk["metadata"], "rank": chunk["rank"],
+                                 "end": None, "sources": [chunk["metadata"].get("source")]})
+        return sorted(passages, key=lambda p: p["rank"])
+
+    def _fit(self, passages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # A junção dos vizinhos pode mudar a contagem: corta o fim do trecho menos relevante
+        while passages and sum(self.count_tokens(p["text"]) for p in passages) > self.max_tokens:
+            sentences = split_sentences(passages[-1]["text"])[:-1]
+            if sentences:
+                passages[-1]["text"] = " ".join(sentences)
+            else:
+                passages.pop()
+        return passages
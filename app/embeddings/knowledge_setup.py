@@ -1,40 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from importlib.util import find_spec
+from typing import List, Dict, Any, Optional
+
+from agno.knowledge.document import Document
 from agno.knowledge.knowledge import Knowledge
 from agno.knowledge.embedder.openai import OpenAIEmbedder
 from agno.vectordb.langchaindb import LangChainVectorDb
 
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.scheduler import Priority, get_scheduler
 
-# Importações condicionais para diferentes vectorstores
-try:
-    from langchain_community.vectorstores import FAISS
-    HAS_FAISS = True
-except ImportError:
-    HAS_FAISS = False
+from .compression import ContextCompressor
+from .lexical import BM25Index, HybridRetriever
+from .quantization import QuantizedVectors
+from .snapshot import KnowledgeSnapshot, is_snapshot
 
-try:
-    from langchain_community.vectorstores import Chroma
-    HAS_CHROMA = True
-except ImportError:
-    HAS_CHROMA = False
 
-try:
-    from langchain_community.vectorstores import DocArrayInMemorySearch
-    HAS_DOCARRAY = True
-except ImportError:
-    HAS_DOCARRAY = False
+def _has_modules(*names: str) -> bool:
+    """Verifica se os pacotes estão instalados sem importá-los."""
+    return all(find_spec(name) is not None for name in names)
 
-# VectorStore simples em memória usando apenas Python puro
-from typing import List, Dict, Any, Optional
+
+# Descoberta dos vectorstores opcionais: só o backend escolhido é importado,
+# e apenas no primeiro uso (ver create_vectorstore)
+HAS_FAISS = _has_modules("langchain_community", "faiss")
+HAS_CHROMA = _has_modules("langchain_community", "chromadb")
+HAS_DOCARRAY = _has_modules("langchain_community", "docarray")
+HAS_NUMPY = _has_modules("numpy")
 
 
+# VectorStore simples em memória usando apenas Python puro
 class SimpleInMemoryVectorStore:
-    """VectorStore simples em memória usando apenas Python padrão."""
+    """
+    VectorStore simples em memória usando apenas Python padrão.
+
+    Os embeddings ficam em buffers contíguos (ver QuantizedVectors) no dtype
+    escolhido: "float32", "float16" ou "int8". Com rescore=True uma cópia
+    float32 em disco (mmap) reordena os melhores candidatos com o score exato.
+    """
     
-    def __init__(self, embeddings_func):
+    def __init__(self, embeddings_func, dtype: str = "float32", rescore: bool = False):
         self.embeddings_func = embeddings_func
+        self.rescore = rescore
         self.texts: List[str] = []
-        self.embeddings: List[List[float]] = []
+        self.vectors = QuantizedVectors(dtype, keep_float32=rescore)
         self.metadatas: List[Dict] = []
     
     @classmethod
@@ -42,10 +54,11 @@ class SimpleInMemoryVectorStore:
         cls,
         texts: List[str],
         embedding,
-        metadatas: Optional[List[Dict]] = None
+        metadatas: Optional[List[Dict]] = None,
+        **kwargs
     ):
         """Cria um vectorstore a partir de textos."""
-        instance = cls(embedding)
+        instance = cls(embedding, **kwargs)
         instance.add_texts(texts, metadatas)
         return instance
     
@@ -58,7 +71,7 @@ class SimpleInMemoryVectorStore:
         text_embeddings = self.embeddings_func.embed_documents(texts)
         
         self.texts.extend(texts)
-        self.embeddings.extend(text_embeddings)
+        self.vectors.add(text_embeddings)
         self.metadatas.extend(metadatas)
     
     def similarity_search(self, query: str, k: int = 4) -> List[Dict[str, Any]]:
@@ -68,16 +81,11 @@ class SimpleInMemoryVectorStore:
         
         # Gera embedding da query
         query_embedding = self.embeddings_func.embed_query(query)
-        
-        # Calcula similaridades (cosine similarity simplificada)
-        similarities = []
-        for i, doc_embedding in enumerate(self.embeddings):
-            similarity = self._cosine_similarity(query_embedding, doc_embedding)
-            similarities.append((similarity, i))
-        
-        # Ordena por similaridade e pega os top k
-        similarities.sort(reverse=True)
-        top_k = similarities[:k]
+        return self.similarity_search_by_vector(query_embedding, k)
+    
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Dict[str, Any]]:
+        """Busca por similaridade a partir de um embedding já calculado."""
+        top_k = self.vectors.search(embedding, k, rescore=self.rescore)
         
         # Retorna documentos no formato esperado pelo LangChain
         results = []
@@ -88,48 +96,240 @@ class SimpleInMemoryVectorStore:
             })
         
         return results
-    
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calcula similaridade coseno entre dois vetores."""
-        # Produto escalar
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        
-        # Normas
-        norm1 = sum(a * a for a in vec1) ** 0.5
-        norm2 = sum(b * b for b in vec2) ** 0.5
-        
-        # Evita divisão por zero
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        
-        return dot_product / (norm1 * norm2)
 
 
 class AgnoEmbedderAdapter:
-    """Adaptador para compatibilizar o embedder do Agno com o LangChain."""
-    
-    def __init__(self, agno_embedder):
+    """Adaptador para compatibilizar o embedder do Agno com o LangChain.
+
+    Os textos são agrupados em lotes limitados por número de tokens e enviados
+    em paralelo por um pool de threads. Respostas 429 (rate limit) aumentam um
+    atraso compartilhado entre os workers, que diminui a cada sucesso.
+    """
+
+    def __init__(
+        self,
+        agno_embedder,
+        max_batch_tokens: int = 8000,
+        max_batch_size: int = 256,
+        max_workers: int = 4,
+        max_retries: int = 6,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        show_progress: bool = False,
+        query_cache_size: int = 1024
+    ):
         self.agno = agno_embedder
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.show_progress = show_progress
+        self.last_stats: Dict[str, Any] = {}
+
+        self._lock = threading.Lock()
+        self._backoff = 0.0
+        self._encoder = _load_token_encoder()
+
+        # Cache LRU de embeddings de queries (compartilhado quando o adapter é
+        # compartilhado entre tenants, ver app.tenants)
+        self.query_cache_size = query_cache_size
+        self.cache_stats = {"hits": 0, "misses": 0}
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def count_tokens(self, text: str) -> int:
+        """Conta tokens com tiktoken, ou estima ~4 caracteres por token."""
+        if self._encoder is not None:
+            return len(self._encoder.encode(text))
+        return max(1, len(text) // 4)
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Agrupa os índices dos textos em lotes respeitando o limite de tokens."""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = self.count_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens
+                            or len(current) >= self.max_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        """Embed múltiplos documentos."""
-        # Usa o método get_embeddings_batch se disponível
-        if hasattr(self.agno, "get_embeddings_batch"):
-            return self.agno.get_embeddings_batch(texts)
-        # Senão usa get_embedding para cada texto
-        elif hasattr(self.agno, "get_embedding"):
-            return [self.agno.get_embedding(text) for text in texts]
-        else:
+        """Embed múltiplos documentos em lotes concorrentes, mantendo a ordem de entrada."""
+        if not hasattr(self.agno, "get_embeddings_batch") and not hasattr(self.agno, "get_embedding"):
             raise AttributeError(f"Embedder {type(self.agno)} não possui método de embedding reconhecido")
+        if not texts:
+            return []
+
+        batches = self.make_batches(texts)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        done = 0
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            futures = {
+                pool.submit(self._embed_with_retry, [texts[i] for i in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                embeddings = future.result()
+                if len(embeddings) != len(batch):
+                    # Sem isso o lote curto deixaria buracos (None) que só estourariam no vectorstore
+                    raise RuntimeError(
+                        f"Embedder devolveu {len(embeddings)} embeddings para um lote de {len(batch)} textos"
+                    )
+                for i, embedding in zip(batch, embeddings):
+                    results[i] = embedding
+                done += len(batch)
+                if self.show_progress:
+                    elapsed = time.perf_counter() - start
+                    rate = done / elapsed if elapsed > 0 else 0.0
+                    print(f"🔢 Embeddings: {done}/{len(texts)} textos ({rate:.1f} textos/s)")
+
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "texts": len(texts),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "texts_per_second": len(texts) / elapsed if elapsed > 0 else 0.0,
+        }
+        return results
 
     def embed_query(self, text: str) -> list[float]:
-        """Embed uma única query."""
+        """Embed uma única query (com cache LRU)."""
+        with self._lock:
+            cached = self._query_cache.get(text)
+            if cached is not None:
+                self._query_cache.move_to_end(text)
+                self.cache_stats["hits"] += 1
+                return cached
+            self.cache_stats["misses"] += 1
+
+        scheduler = get_scheduler()
+        scheduler.acquire(scheduler.effective_priority(Priority.INFORMATION), self.count_tokens(text))
         # Usa get_embedding do Agno
         if hasattr(self.agno, "get_embedding"):
-            return self.agno.get_embedding(text)
+            embedding = self.agno.get_embedding(text)
         else:
             # Fallback: usa embed_documents com uma lista de um item
-            return self.embed_documents([text])[0]
+            embedding = self.embed_documents([text])[0]
+
+        if self.query_cache_size > 0:
+            with self._lock:
+                self._query_cache[text] = embedding
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return embedding
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Envia um lote usando get_embeddings_batch ou get_embedding."""
+        # Indexação é tarefa de fundo: espera a vez sem ser rejeitada
+        get_scheduler().acquire(Priority.BACKGROUND, sum(self.count_tokens(t) for t in batch), max_wait=None)
+        if hasattr(self.agno, "get_embeddings_batch"):
+            return self.agno.get_embeddings_batch(batch)
+        return [self.agno.get_embedding(text) for text in batch]
+
+    def _embed_with_retry(self, batch: List[str]) -> List[List[float]]:
+        """Envia um lote aplicando o backoff compartilhado em respostas 429."""
+        attempt = 0
+        while True:
+            with self._lock:
+                delay = self._backoff
+            if delay:
+                time.sleep(delay)
+            try:
+                embeddings = self._embed_batch(batch)
+            except Exception as e:
+                if not _is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self._backoff = min(
+                        self.max_backoff,
+                        max(self.initial_backoff, self._backoff * 2)
+                    )
+                    delay = self._backoff
+                if self.show_progress:
+                    print(f"⏳ Rate limit atingido, aguardando {delay:.1f}s (tentativa {attempt}/{self.max_retries})")
+                continue
+            with self._lock:
+                self._backoff = self._backoff / 2 if self._backoff > 0.05 else 0.0
+            return embeddings
+
+
+@dataclass
+class RetrievalKnowledge(Knowledge):
+    """
+    Knowledge que busca pelo HybridRetriever (BM25 + vetorial) e comprime os
+    chunks recuperados (ContextCompressor) antes de irem para o prompt.
+
+    O retriever híbrido é chamado aqui direto (com max_results); o vector_db
+    recebe o mesmo retriever adaptado (HybridRetriever.as_langchain).
+    """
+    retriever: Optional[Any] = None
+    compressor: Optional[ContextCompressor] = None
+
+    def search(self, query: str, max_results: Optional[int] = None, filters=None, search_type=None) -> List[Document]:
+        if self.retriever is None:
+            documents = super().search(query, max_results=max_results, filters=filters, search_type=search_type)
+        else:
+            try:
+                documents = [
+                    Document(content=d.page_content, meta_data=d.metadata)
+                    for d in self.retriever.search(query, max_results or self.max_results)
+                ]
+            except Exception as e:
+                print(f"❌ Erro na busca da base de conhecimento: {e}")
+                return []
+        return self._compress(query, documents)
+
+    async def asearch(self, query: str, max_results: Optional[int] = None, filters=None, search_type=None) -> List[Document]:
+        if self.retriever is not None:
+            return self.search(query, max_results=max_results, filters=filters, search_type=search_type)
+        documents = await super().asearch(query, max_results=max_results, filters=filters, search_type=search_type)
+        return self._compress(query, documents)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Contadores da busca (embeddings evitados pelo BM25) e da compressão."""
+        metrics: Dict[str, Any] = {}
+        if self.retriever is not None:
+            metrics["retrieval"] = self.retriever.metrics()
+        if self.compressor is not None:
+            metrics["compression"] = dict(self.compressor.stats)
+        return metrics
+
+    def _compress(self, query: str, documents: List[Document]) -> List[Document]:
+        if self.compressor is None or not documents:
+            return documents
+        compressed = self.compressor.compress(query, [(d.content, d.meta_data or {}) for d in documents])
+        return [Document(content=text, meta_data=metadata) for text, metadata in compressed]
+
+
+def _load_token_encoder():
+    """Carrega o encoder do tiktoken, se instalado."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """Identifica erros 429 do OpenAI/httpx sem depender das classes concretas."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
 
 
 def debug_langchain_vectordb():
@@ -151,6 +351,19 @@ def debug_langchain_vectordb():
     print("---")
 
 
+def load_splits(file_path: str, chunk_size: int = 800, chunk_overlap: int = 120):
+    """Carrega o arquivo de texto e divide em chunks (LangChain importado sob demanda)."""
+    from langchain_community.document_loaders import TextLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    docs = TextLoader(file_path, encoding="utf-8").load()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, 
+        chunk_overlap=chunk_overlap
+    )
+    return splitter.split_documents(docs)
+
+
 def setup_knowledge_base(
     file_path: str = "data/historia_pizza.txt",
     chunk_size: int = 800,
@@ -158,19 +371,36 @@ def setup_knowledge_base(
     embedder_model: str = "text-embedding-3-small",
     vectorstore_type: str = "chroma",
     persist_directory: str = "./chroma_db",
-    debug: bool = False
+    debug: bool = False,
+    lexical: bool = True,
+    vector_dtype: str = "float32",
+    rescore: bool = False,
+    embeddings: Optional[AgnoEmbedderAdapter] = None,
+    context_tokens: Optional[int] = 700
 ) -> Knowledge:
     """
     Configura a base de conhecimento com embeddings e vectorstore.
     
     Args:
-        file_path: Caminho para o arquivo de texto
+        file_path: Caminho para o arquivo de texto ou para um snapshot
+            gerado por `python -m app.embeddings.snapshot build`
         chunk_size: Tamanho dos chunks
         chunk_overlap: Sobreposição entre chunks
         embedder_model: Modelo de embedding a usar
-        vectorstore_type: Tipo de vectorstore ("faiss", "chroma", "simple", "auto")
+        vectorstore_type: Tipo de vectorstore ("faiss", "chroma", "ivf", "simple", "auto")
         persist_directory: Diretório para persistir dados do Chroma
         debug: Se True, mostra debug da API
+        lexical: Se True, cria um índice BM25 que responde consultas com
+            match lexical confiante sem gerar embedding da query
+        vector_dtype: Armazenamento dos vetores no vectorstore "simple"
+            ("float32", "float16" ou "int8")
+        rescore: Reordena os melhores candidatos com float32 exato, lido do
+            disco sob demanda (não aumenta a memória residente)
+        embeddings: Adapter de embeddings já existente (compartilha cliente
+            e cache de queries entre bases, ex.: vários tenants)
+        context_tokens: Orçamento de tokens do conhecimento injetado por
+            consulta (chunks vizinhos unidos, sobreposição e repetições
+            removidas, seleção MMR); None desliga a compressão
     
     Returns:
         Knowledge: Objeto de conhecimento configurado
@@ -180,25 +410,36 @@ def setup_knowledge_base(
         debug_langchain_vectordb()
     
     try:
-        # 1) Carrega e processa o documento
-        docs = TextLoader(file_path, encoding="utf-8").load()
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
-        )
-        splits = splitter.split_documents(docs)
-        
-        # 2) Configura os embedders
-        agno_embedder = OpenAIEmbedder(id=embedder_model)
-        lc_embeddings = AgnoEmbedderAdapter(agno_embedder)
+        # 1) Configura os embedders
+        if embeddings is not None:
+            lc_embeddings, agno_embedder = embeddings, embeddings.agno
+        else:
+            agno_embedder = OpenAIEmbedder(id=embedder_model)
+            lc_embeddings = AgnoEmbedderAdapter(agno_embedder, show_progress=debug)
         
-        # 3) Escolhe o vectorstore
-        vectorstore = create_vectorstore(
-            splits, 
-            lc_embeddings, 
-            vectorstore_type, 
-            persist_directory
-        )
+        if is_snapshot(file_path):
+            # 2) Snapshot pré-construído: mmap, sem chunking nem re-embedding
+            # O embedder das consultas precisa ser o mesmo usado para gerar o snapshot
+            vectorstore = KnowledgeSnapshot(
+                file_path, lc_embeddings, embedder_model=agno_embedder.id, dim=agno_embedder.dimensions
+            )
+            texts, metadatas = vectorstore.texts, vectorstore.metadatas
+            print(f"📦 Usando snapshot {vectorstore.manifest['version']} ({vectorstore.count} chunks) de: {file_path}")
+        else:
+            # 2) Carrega e processa o documento
+            splits = load_splits(file_path, chunk_size, chunk_overlap)
+            texts = [d.page_content for d in splits]
+            metadatas = [{"source": f"chunk_{i}"} for i in range(len(texts))]
+            
+            # 3) Escolhe o vectorstore
+            vectorstore = create_vectorstore(
+                splits, 
+                lc_embeddings, 
+                vectorstore_type, 
+                persist_directory,
+                vector_dtype=vector_dtype,
+                rescore=rescore
+            )
         
         # 4) Envolve o vectorstore em LangChainVectorDb do Agno
         # Tenta diferentes formas de instanciar baseado na API disponível
@@ -217,61 +458,120 @@ def setup_knowledge_base(
                     # Última tentativa: apenas o vectorstore como positional
                     lc_db = LangChainVectorDb(vectorstore)
         
-        # 5) Cria e retorna a base de conhecimento
-        knowledge = Knowledge(name="kb_pizza", vector_db=lc_db)
+        # 5) Índice BM25 local: evita o embedding da query quando há match lexical
+        retriever = None
+        if lexical:
+            bm25 = BM25Index.from_texts(texts, metadatas)
+            retriever = HybridRetriever(bm25, vectorstore, k=4 if context_tokens is None else 8)
+            # Buscas direto pelo vector_db (sem o RetrievalKnowledge) também usam o híbrido
+            lc_db.knowledge_retriever = retriever.as_langchain()
+            if debug:
+                print(f"🔤 Índice BM25 criado com {len(texts)} chunks")
+
+        # 6) Compressão do contexto recuperado antes do prompt
+        compressor = None
+        if context_tokens is not None:
+            compressor = ContextCompressor(max_tokens=context_tokens, count_tokens=lc_embeddings.count_tokens)
+        
+        # 7) Cria e retorna a base de conhecimento
+        # Com compressão, busca mais candidatos: o MMR escolhe dentro do orçamento
+        knowledge = RetrievalKnowledge(
+            name="kb_pizza", vector_db=lc_db, retriever=retriever, compressor=compressor,
+            max_results=4 if compressor is None else 8
+        )
         
         print(f"✅ Knowledge base configurada com sucesso usando {type(vectorstore).__name__}")
         return knowledge
         
     except Exception as e:
         print(f"❌ Erro ao configurar knowledge base: {e}")
+        if is_snapshot(file_path):
+            # A abordagem alternativa re-chunkaria o binário: snapshot inválido ou de outro embedder é erro
+            raise
         print("Tentando abordagem alternativa...")
         return setup_knowledge_base_alternative(file_path, chunk_size, chunk_overlap, embedder_model)
 
 
-def create_vectorstore(splits, embeddings, vectorstore_type="chroma", persist_directory="./chroma_db"):
+def create_vectorstore(splits, embeddings, vectorstore_type="chroma", persist_directory="./chroma_db",
+                       vector_dtype="float32", rescore=False):
     """
     Cria o vectorstore mais adequado baseado na disponibilidade.
+
+    vector_dtype ("float32", "float16", "int8") e rescore só se aplicam ao
+    SimpleInMemoryVectorStore.
     """
     texts = [d.page_content for d in splits]
     metadatas = [{"source": f"chunk_{i}"} for i in range(len(texts))]
     
-    # Auto: escolhe o melhor disponível
+    # Auto: o mais rápido para este tamanho de corpus segundo o perfil de benchmark
+    # (python -m app.embeddings.backend_benchmark --save); sem perfil, o melhor instalado
     if vectorstore_type == "auto":
-        if HAS_CHROMA:
-            vectorstore_type = "chroma"
-        elif HAS_FAISS:
-            vectorstore_type = "faiss"
-        elif HAS_DOCARRAY:
-            vectorstore_type = "docarray"
-        else:
-            vectorstore_type = "simple"
+        from .backend_benchmark import available_backends, choose_backend, default_backend
+
+        available = available_backends()
+        chosen = choose_backend(len(texts), available)
+        if chosen:
+            print(f"📊 Vectorstore escolhido pelo perfil de benchmark: {chosen} ({len(texts)} chunks)")
+        vectorstore_type = chosen or default_backend(available)
     
     # Chroma (recomendado - persistente e local)
     if vectorstore_type == "chroma" and HAS_CHROMA:
+        from langchain_community.vectorstores import Chroma
+
+        def open_collection():
+            return Chroma(
+                collection_name="beauty_pizza_knowledge",
+                embedding_function=embeddings,
+                persist_directory=persist_directory
+            )
+
+        # Coleção já persistida com os mesmos chunks: reutiliza sem gerar embeddings
+        # (reinícios, tenants remontados depois de sair do cache)
+        ids = [m["source"] for m in metadatas]
+        vectorstore = open_collection()
+        stored = vectorstore.get(include=["documents"])
+        if stored["ids"]:
+            if dict(zip(stored["ids"], stored["documents"])) == dict(zip(ids, texts)):
+                print(f"📦 Usando coleção Chroma salva em: {persist_directory}")
+                return vectorstore
+            # O documento mudou: recria a coleção em vez de acumular chunks antigos
+            vectorstore.delete_collection()
+            vectorstore = open_collection()
         print(f"📦 Usando Chroma vectorstore (persistindo em: {persist_directory})")
-        return Chroma.from_texts(
-            texts=texts,
-            embedding=embeddings,
-            metadatas=metadatas,
-            persist_directory=persist_directory,
-            collection_name="beauty_pizza_knowledge"
-        )
+        vectorstore.add_texts(texts, metadatas=metadatas, ids=ids)
+        return vectorstore
     
     # FAISS (melhor performance, mas não persiste por padrão)
     elif vectorstore_type == "faiss" and HAS_FAISS:
         print("📦 Usando FAISS vectorstore")
+        from langchain_community.vectorstores import FAISS
         return FAISS.from_texts(texts, embedding=embeddings, metadatas=metadatas)
     
+    # IVF aproximado com NumPy (persistido em persist_directory)
+    elif vectorstore_type == "ivf" and HAS_NUMPY:
+        from .ann_index import IVFVectorStore
+        if IVFVectorStore.exists(persist_directory):
+            vectorstore = IVFVectorStore.load(persist_directory, embeddings)
+            if vectorstore.texts == texts:
+                print(f"📦 Usando índice IVF salvo em: {persist_directory}")
+                return vectorstore
+        print(f"📦 Usando IVF vectorstore (persistindo em: {persist_directory})")
+        vectorstore = IVFVectorStore.from_texts(texts, embedding=embeddings, metadatas=metadatas)
+        vectorstore.save(persist_directory)
+        return vectorstore
+    
     # DocArray InMemory 
     elif vectorstore_type == "docarray" and HAS_DOCARRAY:
         print("📦 Usando DocArray InMemory vectorstore (dados não persistem)")
+        from langchain_community.vectorstores import DocArrayInMemorySearch
         return DocArrayInMemorySearch.from_texts(texts, embedding=embeddings)
     
     # VectorStore simples em Python puro (sempre funciona)
     else:
         print("📦 Usando SimpleInMemory vectorstore (Python puro, dados não persistem)")
-        return SimpleInMemoryVectorStore.from_texts(texts, embedding=embeddings)
+        return SimpleInMemoryVectorStore.from_texts(
+            texts, embedding=embeddings, metadatas=metadatas, dtype=vector_dtype, rescore=rescore
+        )
 
 
 def setup_knowledge_base_alternative(
@@ -287,12 +587,7 @@ def setup_knowledge_base_alternative(
         from langchain_openai import OpenAIEmbeddings
         
         # 1) Carrega e processa o documento
-        docs = TextLoader(file_path, encoding="utf-8").load()
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
-        )
-        splits = splitter.split_documents(docs)
+        splits = load_splits(file_path, chunk_size, chunk_overlap)
         
         # 2) Usa diretamente o LangChain OpenAI embeddings
         lc_embeddings = OpenAIEmbeddings(model=embedder_model)
@@ -319,6 +614,7 @@ def setup_knowledge_base_alternative(
         # Fallback final: knowledge simples sem vectorstore avançado
         try:
             # Tenta criar uma versão muito básica
+            from langchain_community.document_loaders import TextLoader
             docs = TextLoader(file_path, encoding="utf-8").load()
             agno_embedder = OpenAIEmbedder(id=embedder_model)
             knowledge = Knowledge(name="kb_pizza")
@@ -0,0 +1,233 @@
+import heapq
+import logging
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+
+# Stopwords do português que não ajudam a diferenciar os chunks (termos do
+# domínio, como "pizza" e "historia", ficam: o IDF já reduz o peso deles)
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das",
+    "em", "no", "na", "nos", "nas", "por", "pelo", "pela", "para", "com", "sem", "e",
+    "ou", "que", "se", "como", "mais", "foi", "era", "ao", "aos", "sua", "seu", "suas",
+    "seus", "sobre", "qual", "quais", "quando", "onde", "quem", "me", "voce", "voces",
+}
+
+logger = logging.getLogger("beauty_pizza.retrieval")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Remove acentos e coloca em minúsculas ("Nápoles" -> "napoles")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokeniza o texto de forma insensível a acentos, sem stopwords."""
+    return [t for t in _TOKEN_RE.findall(normalize_text(text)) if t not in STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """
+    Índice BM25 em memória construído junto com o vectorstore.
+
+    Índice invertido (termo -> [(documento, tf)]): cada consulta percorre só
+    as postings dos seus termos, não todos os documentos.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.term_freqs: List[Dict[str, int]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.avg_length = 0.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], metadatas: Optional[List[Dict]] = None, **kwargs) -> "BM25Index":
+        """Cria o índice a partir dos textos dos chunks."""
+        instance = cls(**kwargs)
+        instance.add_texts(texts, metadatas)
+        return instance
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None):
+        """Adiciona textos ao índice."""
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+
+        for text, metadata in zip(texts, metadatas):
+            doc_id = len(self.texts)
+            counts = Counter(tokenize(text))
+            self.texts.append(text)
+            self.metadatas.append(metadata)
+            self.term_freqs.append(dict(counts))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        """IDF do BM25 (variante sempre positiva)."""
+        n = len(self.texts)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[float, int]]:
+        """Retorna os top k como (score, índice), do maior para o menor score."""
+        terms = tokenize(query)
+        if not terms or not self.texts:
+            return []
+
+        scores: Dict[int, float] = {}
+        avg_length = self.avg_length or 1.0
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, ((score, i) for i, score in scores.items()))
+
+
+class HybridRetriever:
+    """
+    Retriever que consulta primeiro o índice BM25 e só gera embedding da query
+    quando o resultado lexical não é conclusivo.
+
+    - Match lexical confiante: devolve os chunks do BM25 sem chamar a API.
+    - Caso ambíguo: busca vetorial + fusão por Reciprocal Rank Fusion (RRF).
+
+    Cada consulta é registrada no logger "beauty_pizza.retrieval" com a taxa
+    de embeddings evitados; os contadores ficam em `metrics()`.
+    """
+
+    def __init__(
+        self,
+        bm25: BM25Index,
+        vectorstore,
+        k: int = 4,
+        min_score: float = 2.0,
+        min_margin: float = 1.5,
+        min_coverage: float = 0.75,
+        rrf_k: int = 60
+    ):
+        self.bm25 = bm25
+        self.vectorstore = vectorstore
+        self.k = k
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.min_coverage = min_coverage
+        self.rrf_k = rrf_k
+        self.stats = {"queries": 0, "lexical_only": 0, "hybrid": 0}
+        self._lock = threading.Lock()
+
+    def is_confident(self, query: str, ranked: List[Tuple[float, int]]) -> bool:
+        """
+        O top 1 precisa cobrir a maioria dos termos da query, ter score mínimo
+        e se destacar do segundo colocado.
+        """
+        if not ranked or ranked[0][0] < self.min_score:
+            return False
+        terms = set(tokenize(query))
+        matched = [t for t in terms if t in self.bm25.term_freqs[ranked[0][1]]]
+        if len(matched) < self.min_coverage * len(terms):
+            return False
+        if len(ranked) == 1:
+            return True
+        return ranked[0][0] >= self.min_margin * ranked[1][0]
+
+    def as_langchain(self):
+        """BaseRetriever do LangChain (o tipo que o LangChainVectorDb do Agno aceita)."""
+        return _langchain_retriever_class()(hybrid=self)
+
+    def search(self, query: str, k: int = 4) -> List[Any]:
+        """Busca lexical, com fallback híbrido quando necessário."""
+        lexical = self.bm25.search(query, k)
+
+        if self.is_confident(query, lexical):
+            self._record("lexical_only")
+            return [self._document(self.bm25.texts[i], self.bm25.metadatas[i]) for _, i in lexical]
+
+        self._record("hybrid")
+        vector_docs = [self._as_document(d) for d in self.vectorstore.similarity_search(query, k=k)]
+
+        # Reciprocal Rank Fusion entre as duas listas
+        fused: Dict[str, float] = {}
+        docs: Dict[str, Any] = {}
+        for rank, (_, i) in enumerate(lexical):
+            doc = self._document(self.bm25.texts[i], self.bm25.metadatas[i])
+            key = self._key(doc)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            docs[key] = doc
+        for rank, doc in enumerate(vector_docs):
+            key = self._key(doc)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+
+        ranked_keys = sorted(fused, key=fused.get, reverse=True)
+        return [docs[key] for key in ranked_keys[:k]]
+
+    def embedding_skip_rate(self) -> float:
+        """Fração das consultas respondidas sem chamada de embedding."""
+        with self._lock:
+            queries, lexical_only = self.stats["queries"], self.stats["lexical_only"]
+        return lexical_only / queries if queries else 0.0
+
+    def metrics(self) -> Dict[str, Any]:
+        """Contadores de consultas e a taxa de embeddings evitados."""
+        with self._lock:
+            stats = dict(self.stats)
+        return dict(stats, embedding_skip_rate=stats["lexical_only"] / stats["queries"] if stats["queries"] else 0.0)
+
+    def _record(self, path: str):
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats[path] += 1
+            queries, lexical_only = self.stats["queries"], self.stats["lexical_only"]
+        logger.info(
+            "busca %s: embedding evitado em %d de %d consultas (%.0f%%)",
+            "só BM25" if path == "lexical_only" else "híbrida", lexical_only, queries, 100 * lexical_only / queries
+        )
+
+    def _key(self, doc) -> str:
+        metadata = getattr(doc, "metadata", None) or {}
+        return metadata.get("source") or doc.page_content
+
+    def _as_document(self, doc):
+        # SimpleInMemoryVectorStore devolve dicts em vez de Documents
+        if isinstance(doc, dict):
+            return self._document(doc["page_content"], doc.get("metadata", {}))
+        return doc
+
+    @staticmethod
+    def _document(text: str, metadata: Dict):
+        from langchain_core.documents import Document
+        return Document(page_content=text, metadata=dict(metadata))
+
+
+@lru_cache(maxsize=None)
+def _langchain_retriever_class():
+    # Definida sob demanda para não importar o langchain_core junto com o módulo
+    from langchain_core.retrievers import BaseRetriever
+
+    class HybridLangChainRetriever(BaseRetriever):
+        """Adapta o HybridRetriever para a interface de retrievers do LangChain."""
+        hybrid: Any
+
+        def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Any]:
+            return self.hybrid.search(query, self.hybrid.k)
+
+    return HybridLangChainRetriever
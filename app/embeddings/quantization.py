@@ -0,0 +1,192 @@
+import mmap
+import struct
+import tempfile
+import threading
+from array import array
+from typing import List, Dict, Any, Optional, Tuple
+
+
+DTYPES = ("float32", "float16", "int8")
+
+
+def normalize(vector: List[float]) -> List[float]:
+    """Normaliza o vetor para norma 1 (cosseno vira produto escalar)."""
+    norm = sum(x * x for x in vector) ** 0.5
+    if norm == 0:
+        return [0.0] * len(vector)
+    return [x / norm for x in vector]
+
+
+class QuantizedVectors:
+    """
+    Armazena vetores normalizados em buffers contíguos.
+
+    - float32: array('f'), 4 bytes por dimensão
+    - float16: bytearray empacotado com struct 'e', 2 bytes por dimensão
+    - int8: array('b') + uma escala float32 por vetor, 1 byte por dimensão
+
+    Com keep_float32=True uma cópia float32 vai para um arquivo temporário e é
+    lida por mmap só no rescoring dos melhores candidatos: a memória residente
+    continua a do dtype escolhido.
+    """
+
+    def __init__(self, dtype: str = "float32", keep_float32: bool = False):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype inválido: {dtype}. Use um de {DTYPES}")
+        self.dtype = dtype
+        self.keep_float32 = keep_float32 and dtype != "float32"
+        self.dim: Optional[int] = None
+        self.count = 0
+
+        self._f32 = array("f")
+        self._f16 = bytearray()
+        self._i8 = array("b")
+        self._scales = array("f")
+        self._row16: Optional[struct.Struct] = None
+        # Cópia float32 em disco para o rescoring (keep_float32)
+        self._exact_file = tempfile.TemporaryFile() if self.keep_float32 else None
+        self._exact_map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, vectors: List[List[float]]):
+        """Normaliza, quantiza e anexa os vetores."""
+        for vector in vectors:
+            if self.dim is None:
+                self.dim = len(vector)
+                self._row16 = struct.Struct(f"<{self.dim}e")
+            elif len(vector) != self.dim:
+                raise ValueError(f"Dimensão {len(vector)} diferente da esperada ({self.dim})")
+
+            unit = normalize(vector)
+            if self.dtype == "float32":
+                self._f32.extend(unit)
+            elif self.keep_float32:
+                self._exact_file.write(array("f", unit).tobytes())
+            if self.dtype == "float16":
+                self._f16.extend(self._row16.pack(*unit))
+            elif self.dtype == "int8":
+                peak = max((abs(x) for x in unit), default=0.0)
+                scale = peak / 127 if peak else 1.0
+                self._i8.extend(max(-127, min(127, round(x / scale))) for x in unit)
+                self._scales.append(scale)
+            self.count += 1
+
+    def get(self, i: int) -> List[float]:
+        """Retorna o vetor i (dequantizado)."""
+        if self.dtype == "float32":
+            return self._f32[i * self.dim:(i + 1) * self.dim].tolist()
+        if self.dtype == "float16":
+            return list(self._row16.unpack_from(self._f16, i * self._row16.size))
+        scale = self._scales[i]
+        return [c * scale for c in self._i8[i * self.dim:(i + 1) * self.dim]]
+
+    def exact(self, i: int) -> List[float]:
+        """Vetor float32 usado no rescoring (ou o dequantizado, se não houver cópia)."""
+        if self.dtype == "float32":
+            return self._f32[i * self.dim:(i + 1) * self.dim].tolist()
+        if self.keep_float32:
+            row_bytes = 4 * self.dim
+            row = array("f")
+            row.frombytes(self._exact_view()[i * row_bytes:(i + 1) * row_bytes])
+            return row.tolist()
+        return self.get(i)
+
+    def _exact_view(self) -> mmap.mmap:
+        # Remapeia quando vetores foram adicionados depois do último mmap
+        with self._lock:
+            size = 4 * self.dim * self.count
+            if self._exact_map is None or len(self._exact_map) < size:
+                self._exact_file.flush()
+                self._exact_map = mmap.mmap(self._exact_file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._exact_map
+
+    def scores(self, query: List[float]) -> List[float]:
+        """Similaridade (produto escalar com a query normalizada) contra todos os vetores."""
+        if not self.count:
+            return []
+        q = normalize(query)
+        dim = self.dim
+        results = []
+        if self.dtype == "float32":
+            data = self._f32
+            for i in range(self.count):
+                results.append(sum(a * b for a, b in zip(q, data[i * dim:(i + 1) * dim])))
+        elif self.dtype == "float16":
+            unpack = self._row16.unpack_from
+            size = self._row16.size
+            for i in range(self.count):
+                results.append(sum(a * b for a, b in zip(q, unpack(self._f16, i * size))))
+        else:
+            data = self._i8
+            for i in range(self.count):
+                results.append(self._scales[i] * sum(a * b for a, b in zip(q, data[i * dim:(i + 1) * dim])))
+        return results
+
+    def search(self, query: List[float], k: int = 4, rescore: bool = False,
+               candidates: Optional[int] = None) -> List[Tuple[float, int]]:
+        """
+        Top k por similaridade nos dados quantizados. Com rescore=True os
+        `candidates` melhores (padrão 4*k) são reordenados com float32 exato.
+        """
+        ranked = sorted(((s, i) for i, s in enumerate(self.scores(query))), reverse=True)
+        if not rescore or self.dtype == "float32":
+            return ranked[:k]
+
+        q = normalize(query)
+        pool = ranked[:candidates or 4 * k]
+        rescored = [(sum(a * b for a, b in zip(q, self.exact(i))), i) for _, i in pool]
+        rescored.sort(reverse=True)
+        return rescored[:k]
+
+    def nbytes(self) -> int:
+        """Bytes ocupados pelos buffers de vetores em memória (sem a cópia float32 em disco)."""
+        total = len(self._f16) + self._i8.itemsize * len(self._i8) + self._scales.itemsize * len(self._scales)
+        return total + self._f32.itemsize * len(self._f32)
+
+
+def measure_quantization_recall(
+    vectors: List[List[float]],
+    queries: List[List[float]],
+    k: int = 4,
+    rescore: bool = False
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compara recall@k de cada dtype contra a busca float32 exata.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: por dtype, {"recall": float, "bytes_per_vector": float}
+    """
+    baseline = QuantizedVectors("float32")
+    baseline.add(vectors)
+    expected = [{i for _, i in baseline.search(q, k)} for q in queries]
+
+    report = {}
+    for dtype in DTYPES:
+        store = QuantizedVectors(dtype, keep_float32=rescore)
+        store.add(vectors)
+        hits = 0
+        total = sum(len(truth) for truth in expected)
+        for q, truth in zip(queries, expected):
+            hits += len(truth & {i for _, i in store.search(q, k, rescore=rescore)})
+        report[dtype] = {
+            "recall": hits / total if total else 1.0,
+            "bytes_per_vector": store.nbytes() / len(store) if len(store) else 0.0,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import random
+
+    random.seed(0)
+    dim, n, n_queries = 256, 2000, 50
+    vectors = [[random.gauss(0, 1) for _ in range(dim)] for _ in range(n)]
+    queries = [[random.gauss(0, 1) for _ in range(dim)] for _ in range(n_queries)]
+    for rescore in (False, True):
+        report = measure_quantization_recall(vectors, queries, k=10, rescore=rescore)
+        for dtype, row in report.items():
+            print(f"{dtype:8s} rescore={rescore!s:5s} recall@10={row['recall']:.3f} "
+                  f"bytes/vetor={row['bytes_per_vector']:.0f}")
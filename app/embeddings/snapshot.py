@@ -0,0 +1,319 @@
+"""
+Snapshot pré-construído da base de conhecimento.
+
+Um único arquivo versionado com os chunks, metadados e embeddings, carregado
+via mmap: o boot não faz chamadas de rede nem re-embedding, e vários processos
+compartilham as mesmas páginas físicas. O cardápio não faz parte do snapshot:
+as ferramentas leem o SQLite de cada loja (app.init_db, app.tenants).
+
+O manifest registra o modelo de embedding usado; abrir o snapshot com outro
+modelo de consulta levanta ValueError (as distâncias não seriam comparáveis).
+
+Layout (little-endian):
+
+    MAGIC (4 bytes) | versão do formato (u32) | tamanho do manifest (u32)
+    manifest JSON (utf-8), com padding até alinhamento de 64 bytes
+    seção "vectors":   float32[count * dim], vetores normalizados
+    seção "offsets":   u64[count + 1], início de cada texto na seção "texts"
+    seção "texts":     textos utf-8 concatenados
+    seção "metadatas": JSON com a lista de metadados
+
+O manifest guarda offset/tamanho de cada seção e o sha256 de todas elas.
+
+Uso:
+    python -m app.embeddings.snapshot build --output data/knowledge.bpks
+    python -m app.embeddings.snapshot verify data/knowledge.bpks
+"""
+import hashlib
+import json
+import mmap
+import struct
+import time
+from array import array
+from importlib.util import find_spec
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+# NumPy é opcional e só é importado ao abrir um snapshot
+HAS_NUMPY = find_spec("numpy") is not None
+
+
+MAGIC = b"BPKS"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+_HEADER = struct.Struct("<4sII")
+SECTIONS = ("vectors", "offsets", "texts", "metadatas")
+
+
+def is_snapshot(path: str) -> bool:
+    """Verifica se o arquivo começa com o magic do snapshot."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_snapshot(
+    output_path: str,
+    texts: List[str],
+    embeddings: List[List[float]],
+    metadatas: Optional[List[Dict]] = None,
+    version: Optional[str] = None,
+    embedder_model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Grava o snapshot em `output_path`.
+
+    Returns:
+        Dict[str, Any]: manifest gravado.
+    """
+    if len(texts) != len(embeddings):
+        raise ValueError("texts e embeddings devem ter o mesmo tamanho")
+    metadatas = metadatas if metadatas is not None else [{} for _ in texts]
+    dim = len(embeddings[0]) if embeddings else 0
+
+    vectors = array("f")
+    for vector in embeddings:
+        if len(vector) != dim:
+            raise ValueError(f"Dimensão {len(vector)} diferente da esperada ({dim})")
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        vectors.extend(x / norm for x in vector)
+
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = array("Q", [0])
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+
+    payloads = {
+        "vectors": vectors.tobytes(),
+        "offsets": offsets.tobytes(),
+        "texts": b"".join(encoded),
+        "metadatas": json.dumps(metadatas, ensure_ascii=False).encode("utf-8"),
+    }
+
+    # Calcula offsets relativos ao início das seções (alinhados em 64 bytes)
+    layout: Dict[str, Dict[str, int]] = {}
+    position = 0
+    digest = hashlib.sha256()
+    for name in SECTIONS:
+        position = _align(position)
+        layout[name] = {"offset": position, "length": len(payloads[name])}
+        digest.update(payloads[name])
+        position += len(payloads[name])
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version or time.strftime("%Y%m%d%H%M%S"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "embedder_model": embedder_model,
+        "count": len(texts),
+        "dim": dim,
+        "sections": layout,
+        "sha256": digest.hexdigest(),
+    }
+    manifest_bytes = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+    data_start = _align(_HEADER.size + len(manifest_bytes))
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(manifest_bytes)))
+        f.write(manifest_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name in SECTIONS:
+            f.write(b"\0" * (data_start + layout[name]["offset"] - f.tell()))
+            f.write(payloads[name])
+    Path(tmp_path).replace(output_path)
+    return manifest
+
+
+class KnowledgeSnapshot:
+    """
+    Snapshot aberto via mmap (somente leitura).
+
+    Expõe a mesma interface de busca dos vectorstores locais
+    (similarity_search / similarity_search_by_vector).
+
+    `embedder_model`/`dim`, quando informados, precisam bater com o manifest.
+    """
+
+    def __init__(self, path: str, embeddings_func=None, verify: bool = False,
+                 embedder_model: Optional[str] = None, dim: Optional[int] = None):
+        self.path = path
+        self.embeddings_func = embeddings_func
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, manifest_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} não é um snapshot da base de conhecimento")
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"Versão de formato {format_version} não suportada (esperado {FORMAT_VERSION})")
+
+        self.manifest: Dict[str, Any] = json.loads(self._mm[_HEADER.size:_HEADER.size + manifest_len])
+        self._data_start = _align(_HEADER.size + manifest_len)
+        self.count: int = self.manifest["count"]
+        self.dim: int = self.manifest["dim"]
+        self._metadatas: Optional[List[Dict]] = None
+
+        built_with = self.manifest.get("embedder_model")
+        if embedder_model and built_with != embedder_model:
+            self._mm.close()
+            self._file.close()
+            raise ValueError(
+                f"Snapshot {path} gerado com o embedder {built_with!r}, mas as consultas usam {embedder_model!r}: "
+                f"gere o snapshot de novo com --model {embedder_model}"
+            )
+        if dim and self.count and dim != self.dim:
+            self._mm.close()
+            self._file.close()
+            raise ValueError(f"Snapshot {path} tem vetores de dimensão {self.dim}, o embedder gera {dim}")
+
+        self._offsets = memoryview(self._section("offsets")).cast("Q")
+        vectors = self._section("vectors")
+        if HAS_NUMPY:
+            import numpy as np
+            self.vectors = np.frombuffer(vectors, dtype=np.float32).reshape(self.count, self.dim)
+        else:
+            self.vectors = memoryview(vectors).cast("f")
+
+        if verify and not self.verify():
+            raise ValueError(f"Checksum inválido para o snapshot {path}")
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(self.count)]
+
+    @property
+    def metadatas(self) -> List[Dict]:
+        if self._metadatas is None:
+            self._metadatas = json.loads(bytes(self._section("metadatas")))
+        return self._metadatas
+
+    def text(self, i: int) -> str:
+        """Lê o texto i direto do mmap."""
+        texts = self._section("texts")
+        return bytes(texts[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def verify(self) -> bool:
+        """Recalcula o sha256 das seções e compara com o manifest."""
+        digest = hashlib.sha256()
+        for name in SECTIONS:
+            digest.update(self._section(name))
+        return digest.hexdigest() == self.manifest["sha256"]
+
+    def search(self, query: List[float], k: int = 4) -> List[Tuple[float, int]]:
+        """Top k como (score, índice) por produto escalar com a query normalizada."""
+        if not self.count:
+            return []
+        norm = sum(x * x for x in query) ** 0.5 or 1.0
+        q = [x / norm for x in query]
+        if HAS_NUMPY:
+            import numpy as np
+            scores = self.vectors @ np.asarray(q, dtype=np.float32)
+            k = min(k, self.count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            return [(float(scores[i]), int(i)) for i in top[np.argsort(-scores[top])]]
+
+        dim = self.dim
+        scored = [
+            (sum(a * b for a, b in zip(q, self.vectors[i * dim:(i + 1) * dim])), i)
+            for i in range(self.count)
+        ]
+        scored.sort(reverse=True)
+        return scored[:k]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Dict[str, Any]]:
+        """Busca por similaridade."""
+        if not self.count:
+            return []
+        return self.similarity_search_by_vector(self.embeddings_func.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4) -> List[Dict[str, Any]]:
+        """Busca por similaridade a partir de um embedding já calculado."""
+        return [
+            {"page_content": self.text(i), "metadata": self.metadatas[i]}
+            for _, i in self.search(embedding, k)
+        ]
+
+    def close(self):
+        self.vectors = None
+        self._offsets.release()
+        self._mm.close()
+        self._file.close()
+
+    def _section(self, name: str) -> memoryview:
+        info = self.manifest["sections"][name]
+        start = self._data_start + info["offset"]
+        return memoryview(self._mm)[start:start + info["length"]]
+
+
+def build_snapshot(
+    output_path: str = "data/knowledge.bpks",
+    file_path: str = "data/historia_pizza.txt",
+    chunk_size: int = 800,
+    chunk_overlap: int = 120,
+    embedder_model: str = "text-embedding-3-small",
+    version: Optional[str] = None
+) -> Dict[str, Any]:
+    """Chunk + embedding do arquivo, gravando o snapshot."""
+    from langchain_community.document_loaders import TextLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from agno.knowledge.embedder.openai import OpenAIEmbedder
+    from .knowledge_setup import AgnoEmbedderAdapter
+
+    docs = TextLoader(file_path, encoding="utf-8").load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    texts = [d.page_content for d in splitter.split_documents(docs)]
+    metadatas = [{"source": f"chunk_{i}"} for i in range(len(texts))]
+
+    embeddings = AgnoEmbedderAdapter(OpenAIEmbedder(id=embedder_model), show_progress=True).embed_documents(texts)
+
+    return write_snapshot(
+        output_path,
+        texts,
+        embeddings,
+        metadatas,
+        version=version,
+        embedder_model=embedder_model
+    )
+
+
+def _align(position: int) -> int:
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snapshot da base de conhecimento da Beauty Pizza")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Gera o snapshot")
+    build.add_argument("--output", default="data/knowledge.bpks")
+    build.add_argument("--file", default="data/historia_pizza.txt")
+    build.add_argument("--chunk-size", type=int, default=800)
+    build.add_argument("--chunk-overlap", type=int, default=120)
+    build.add_argument("--model", default="text-embedding-3-small")
+    build.add_argument("--version")
+
+    verify = commands.add_parser("verify", help="Confere o checksum de um snapshot")
+    verify.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        manifest = build_snapshot(
+            args.output, args.file, args.chunk_size, args.chunk_overlap, args.model, args.version
+        )
+        print(f"✅ Snapshot {manifest['version']} gravado em {args.output} "
+              f"({manifest['count']} chunks, dim {manifest['dim']})")
+    else:
+        snapshot = KnowledgeSnapshot(args.path)
+        ok = snapshot.verify()
+        print(f"{'✅' if ok else '❌'} {args.path}: versão {snapshot.manifest['version']}, "
+              f"{snapshot.count} chunks, checksum {'ok' if ok else 'inválido'}")
+        snapshot.close()
@@ -0,0 +1,82 @@
+"""
+Orçamento de importação: mede tempo, RSS e módulos pesados carregados por
+`import app.agent` num processo limpo e falha se passar dos limites.
+
+O import não monta o agente (ver app.agent.get_agent), então não depende de
+rede. Verificado por tests/test_import_budget.py; pela linha de comando:
+    python -m app.import_budget --seconds 3 --rss-mb 400
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+
+# Backends que não devem ser carregados se não forem o vectorstore escolhido
+HEAVY_MODULES = ["faiss", "chromadb", "docarray", "sentence_transformers", "torch"]
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss / 1024,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure_import(module: str = "app.agent", heavy: List[str] = HEAVY_MODULES) -> Dict[str, Any]:
+    """Importa `module` num subprocesso e retorna tempo, pico de RSS e módulos pesados carregados."""
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=heavy)],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr}")
+    # O módulo pode imprimir mensagens no import: o JSON é a última linha
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check_import_budget(
+    module: str = "app.agent",
+    max_seconds: float = 3.0,
+    max_rss_mb: float = 400.0,
+    allowed: List[str] = ()
+) -> List[str]:
+    """Retorna a lista de violações do orçamento (vazia se estiver dentro)."""
+    stats = measure_import(module)
+    violations = []
+    if stats["seconds"] > max_seconds:
+        violations.append(f"tempo de import {stats['seconds']:.2f}s > {max_seconds:.2f}s")
+    if stats["rss_mb"] > max_rss_mb:
+        violations.append(f"RSS {stats['rss_mb']:.0f}MB > {max_rss_mb:.0f}MB")
+    unexpected = [m for m in stats["loaded"] if m not in allowed]
+    if unexpected:
+        violations.append(f"módulos pesados carregados: {', '.join(unexpected)}")
+    print(f"📏 import {module}: {stats['seconds']:.2f}s, RSS {stats['rss_mb']:.0f}MB, pesados: {stats['loaded'] or '—'}")
+    return violations
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Orçamento de tempo/memória para importar o agente")
+    parser.add_argument("--module", default="app.agent")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--rss-mb", type=float, default=400.0)
+    parser.add_argument("--allow", nargs="*", default=[], help="Módulos pesados permitidos (ex.: chromadb)")
+    args = parser.parse_args()
+
+    problems = check_import_budget(args.module, args.seconds, args.rss_mb, args.allow)
+    for problem in problems:
+        print(f"❌ {problem}")
+    sys.exit(1 if problems else 0)
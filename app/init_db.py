@@ -1,135 +1,380 @@
-# Script de inicialização da base de dados
+"""
+Inicialização da base de dados: schema versionado do cardápio e carga em lote de catálogos.
+
+- schema_version: migrações aplicadas em ordem, dentro de uma transação
+- lojas: dimensão de loja; `precos` é por loja (PK loja_id, pizza_id, tamanho_id, borda_id)
+- load_catalog: importa CSV (linhas de preço) ou JSON (catálogo completo) com
+  executemany numa única transação, em WAL, com upserts idempotentes
+
+Uso:
+    python -m app.init_db                               # cria/migra e carrega data/catalogo.json
+    python -m app.init_db load lojas.csv [outro.json]   # importa catálogos
+    python -m app.init_db bench --rows 100000           # tempo de carga e latência de consulta
+"""
+import csv
+import json
 import sqlite3
+import time
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator, Dict, Any, List
+
+
+DEFAULT_CATALOG = "data/catalogo.json"
+DEFAULT_STORE_ID = 1
+BATCH_SIZE = 10_000
+
+# Cada versão é uma lista de comandos aplicados na mesma transação
+MIGRATIONS: Dict[int, List[str]] = {
+    1: [
+        # Tabela para armazenar informações sobre as pizzas
+        """CREATE TABLE IF NOT EXISTS pizzas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sabor TEXT NOT NULL,
+            descricao TEXT NOT NULL,
+            ingredientes TEXT NOT NULL
+        )""",
+        # Tabela para os tamanhos de pizza disponíveis
+        """CREATE TABLE IF NOT EXISTS tamanhos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tamanho TEXT NOT NULL UNIQUE
+        )""",
+        # Tabela para os tipos de borda
+        """CREATE TABLE IF NOT EXISTS bordas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL UNIQUE
+        )""",
+        # Tabela de preços, relacionando pizza, tamanho e borda
+        """CREATE TABLE IF NOT EXISTS precos (
+            pizza_id INTEGER,
+            tamanho_id INTEGER,
+            borda_id INTEGER,
+            preco REAL NOT NULL,
+            PRIMARY KEY (pizza_id, tamanho_id, borda_id),
+            FOREIGN KEY (pizza_id) REFERENCES pizzas(id),
+            FOREIGN KEY (tamanho_id) REFERENCES tamanhos(id),
+            FOREIGN KEY (borda_id) REFERENCES bordas(id)
+        )""",
+    ],
+    2: [
+        # Dimensão de loja; a loja 1 recebe os preços existentes
+        """CREATE TABLE IF NOT EXISTS lojas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo TEXT NOT NULL UNIQUE,
+            nome TEXT NOT NULL
+        )""",
+        f"INSERT OR IGNORE INTO lojas (id, codigo, nome) VALUES ({DEFAULT_STORE_ID}, 'matriz', 'Beauty Pizza')",
+        # Preços por loja: a PK cobre a consulta exata (loja, sabor, tamanho, borda)
+        """CREATE TABLE precos_v2 (
+            loja_id INTEGER NOT NULL DEFAULT 1,
+            pizza_id INTEGER NOT NULL,
+            tamanho_id INTEGER NOT NULL,
+            borda_id INTEGER NOT NULL,
+            preco REAL NOT NULL,
+            PRIMARY KEY (loja_id, pizza_id, tamanho_id, borda_id),
+            FOREIGN KEY (loja_id) REFERENCES lojas(id),
+            FOREIGN KEY (pizza_id) REFERENCES pizzas(id),
+            FOREIGN KEY (tamanho_id) REFERENCES tamanhos(id),
+            FOREIGN KEY (borda_id) REFERENCES bordas(id)
+        ) WITHOUT ROWID""",
+        f"""INSERT INTO precos_v2 (loja_id, pizza_id, tamanho_id, borda_id, preco)
+            SELECT {DEFAULT_STORE_ID}, pizza_id, tamanho_id, borda_id, preco FROM precos""",
+        "DROP TABLE precos",
+        "ALTER TABLE precos_v2 RENAME TO precos",
+        # Consultas por combinação em todas as lojas (comparação de preços, relatórios)
+        "CREATE INDEX IF NOT EXISTS idx_precos_combinacao ON precos (pizza_id, tamanho_id, borda_id)",
+    ],
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+def _connect(db_path) -> sqlite3.Connection:
+    """Conexão em autocommit (transações explícitas) com WAL."""
+    con = sqlite3.connect(db_path, isolation_level=None)
+    # WAL: leitores (workers) não bloqueiam nem são bloqueados por escritas
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    return con
+
+
+def _apply_migrations(con: sqlite3.Connection) -> int:
+    # Chamar dentro de uma transação
+    con.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at TEXT NOT NULL)")
+    current = con.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    for version in range(current + 1, SCHEMA_VERSION + 1):
+        for statement in MIGRATIONS[version]:
+            con.execute(statement)
+        con.execute(
+            "INSERT INTO schema_version (version, applied_at) VALUES (?, ?)",
+            (version, datetime.now(timezone.utc).isoformat(timespec="seconds")),
+        )
+    return max(current, SCHEMA_VERSION)
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """Aplica as migrações pendentes e retorna a versão do schema."""
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        version = _apply_migrations(con)
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    return version
+
+
+def _table_exists(con: sqlite3.Connection, name: str) -> bool:
+    return con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone() is not None
+
 
-def initialize_database(db_path: str = "data/knowledge_base.db"):
-    """Inicializa o banco de dados com o schema e dados da Beauty Pizza"""
+def initialize_database(db_path: str = "data/knowledge_base.db", catalog_path: str = DEFAULT_CATALOG):
+    """
+    Inicializa (ou migra) o banco de dados e carrega o catálogo padrão da Beauty Pizza.
+
+    Migração e carga inicial rodam na mesma transação: se a carga falhar, nada é
+    gravado e a próxima execução tenta de novo. Banco sem pizzas e sem o arquivo
+    do catálogo é erro (FileNotFoundError), em vez de um cardápio vazio.
+    """
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Verificar se as tabelas já existem
-    with sqlite3.connect(db_path) as con:
-        cursor = con.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pizzas'")
-        if cursor.fetchone():
+
+    con = _connect(db_path)
+    try:
+        current = _table_exists(con, "schema_version") and con.execute(
+            "SELECT MAX(version) FROM schema_version").fetchone()[0]
+        has_pizzas = _table_exists(con, "pizzas")
+        seeded = has_pizzas and con.execute("SELECT EXISTS (SELECT 1 FROM pizzas)").fetchone()[0]
+        if current == SCHEMA_VERSION and seeded:
             print("Base de dados já existe. Pulando inicialização.")
             return
-    
-    print("Criando base de dados...")
-    
-    sql_script = """
-    -- Tabela para armazenar informações sobre as pizzas
-    CREATE TABLE IF NOT EXISTS pizzas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sabor TEXT NOT NULL,
-        descricao TEXT NOT NULL,
-        ingredientes TEXT NOT NULL
-    );
-
-    -- Tabela para os tamanhos de pizza disponíveis
-    CREATE TABLE IF NOT EXISTS tamanhos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        tamanho TEXT NOT NULL UNIQUE
-    );
-
-    -- Tabela para os tipos de borda
-    CREATE TABLE IF NOT EXISTS bordas (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        tipo TEXT NOT NULL UNIQUE
-    );
-
-    -- Tabela de preços, relacionando pizza, tamanho e borda
-    CREATE TABLE IF NOT EXISTS precos (
-        pizza_id INTEGER,
-        tamanho_id INTEGER,
-        borda_id INTEGER,
-        preco REAL NOT NULL,
-        PRIMARY KEY (pizza_id, tamanho_id, borda_id),
-        FOREIGN KEY (pizza_id) REFERENCES pizzas(id),
-        FOREIGN KEY (tamanho_id) REFERENCES tamanhos(id),
-        FOREIGN KEY (borda_id) REFERENCES bordas(id)
-    );
-
-    -- Inserção de dados nas tabelas
-    INSERT INTO pizzas (sabor, descricao, ingredientes) VALUES
-    ('Margherita', 'A clássica pizza italiana.', 'Molho de tomate, mussarela, manjericão fresco, azeite extra virgem.'),
-    ('Pepperoni', 'A pizza mais pedida nos EUA.', 'Molho de tomate, mussarela, fatias de pepperoni.'),
-    ('Quatro Queijos', 'Combinação de queijos para os amantes de laticínios.', 'Molho de tomate, mussarela, provolone, parmesão, gorgonzola.'),
-    ('Calabresa', 'Saborosa pizza de calabresa com cebola.', 'Molho de tomate, mussarela, calabresa fatiada, cebola.'),
-    ('Frango com Catupiry', 'Deliciosa pizza de frango desfiado com Catupiry original.', 'Molho de tomate, mussarela, frango desfiado, Catupiry.'),
-    ('Doce de Leite com Coco', 'Uma opção doce para fechar a refeição.', 'Doce de leite cremoso, coco ralado, leite condensado.');
-
-    INSERT INTO tamanhos (tamanho) VALUES
-    ('Pequena'),
-    ('Média'),
-    ('Grande');
-
-    INSERT INTO bordas (tipo) VALUES
-    ('Tradicional'),
-    ('Recheada com Cheddar'),
-    ('Recheada com Catupiry');
-
-    -- Inserção de preços para cada combinação de pizza, tamanho e borda
-    -- Margherita
-    INSERT INTO precos (pizza_id, tamanho_id, borda_id, preco) VALUES
-    (1, 1, 1, 25.00), -- Pequena, Tradicional
-    (1, 2, 1, 35.00), -- Média, Tradicional
-    (1, 3, 1, 45.00), -- Grande, Tradicional
-    (1, 2, 2, 38.00), -- Média, Recheada com Cheddar
-    (1, 3, 2, 48.00), -- Grande, Recheada com Cheddar
-    (1, 2, 3, 39.00), -- Média, Recheada com Catupiry
-    (1, 3, 3, 49.00); -- Grande, Recheada com Catupiry
-
-    -- Pepperoni
-    INSERT INTO precos (pizza_id, tamanho_id, borda_id, preco) VALUES
-    (2, 1, 1, 28.00),
-    (2, 2, 1, 38.00),
-    (2, 3, 1, 48.00),
-    (2, 2, 2, 41.00),
-    (2, 3, 2, 51.00),
-    (2, 2, 3, 42.00),
-    (2, 3, 3, 52.00);
-
-    -- Quatro Queijos
-    INSERT INTO precos (pizza_id, tamanho_id, borda_id, preco) VALUES
-    (3, 1, 1, 30.00),
-    (3, 2, 1, 40.00),
-    (3, 3, 1, 50.00),
-    (3, 2, 2, 43.00),
-    (3, 3, 2, 53.00),
-    (3, 2, 3, 44.00),
-    (3, 3, 3, 54.00);
-
-    -- Calabresa
-    INSERT INTO precos (pizza_id, tamanho_id, borda_id, preco) VALUES
-    (4, 1, 1, 27.00),
-    (4, 2, 1, 37.00),
-    (4, 3, 1, 47.00),
-    (4, 2, 2, 40.00),
-    (4, 3, 2, 50.00),
-    (4, 2, 3, 41.00),
-    (4, 3, 3, 51.00);
-
-    -- Frango com Catupiry
-    INSERT INTO precos (pizza_id, tamanho_id, borda_id, preco) VALUES
-    (5, 1, 1, 29.00),
-    (5, 2, 1, 39.00),
-    (5, 3, 1, 49.00),
-    (5, 2, 2, 42.00),
-    (5, 3, 2, 52.00),
-    (5, 2, 3, 43.00),
-    (5, 3, 3, 53.00);
-
-    -- Doce de Leite com Coco
-    INSERT INTO precos (pizza_id, tamanho_id, borda_id, preco) VALUES
-    (6, 1, 1, 25.00),
-    (6, 2, 1, 35.00),
-    (6, 3, 1, 45.00);
+
+        print("Criando base de dados..." if not has_pizzas else "Migrando base de dados...")
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            version = _apply_migrations(con)
+            if not con.execute("SELECT EXISTS (SELECT 1 FROM pizzas)").fetchone()[0]:
+                if not Path(catalog_path).exists():
+                    raise FileNotFoundError(f"Catálogo inicial não encontrado: {catalog_path}")
+                _import_catalog(con, Path(catalog_path))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+    print(f"Base de dados criada com sucesso! (schema v{version})")
+
+
+# ---------------------------------------------------------------------------
+# Carga em lote
+# ---------------------------------------------------------------------------
+
+_UPSERTS = {
+    "lojas": (
+        "INSERT INTO lojas (id, codigo, nome) VALUES (:id, :codigo, :nome) "
+        "ON CONFLICT(id) DO UPDATE SET codigo = excluded.codigo, nome = excluded.nome"
+    ),
+    "pizzas": (
+        "INSERT INTO pizzas (id, sabor, descricao, ingredientes) VALUES (:id, :sabor, :descricao, :ingredientes) "
+        "ON CONFLICT(id) DO UPDATE SET sabor = excluded.sabor, descricao = excluded.descricao, "
+        "ingredientes = excluded.ingredientes"
+    ),
+    "tamanhos": (
+        "INSERT INTO tamanhos (id, tamanho) VALUES (:id, :tamanho) "
+        "ON CONFLICT(id) DO UPDATE SET tamanho = excluded.tamanho"
+    ),
+    "bordas": (
+        "INSERT INTO bordas (id, tipo) VALUES (:id, :tipo) "
+        "ON CONFLICT(id) DO UPDATE SET tipo = excluded.tipo"
+    ),
+}
+
+_UPSERT_PRECO = (
+    "INSERT INTO precos (loja_id, pizza_id, tamanho_id, borda_id, preco) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(loja_id, pizza_id, tamanho_id, borda_id) DO UPDATE SET preco = excluded.preco "
+    "WHERE preco != excluded.preco"
+)
+
+
+def read_price_rows(path) -> Iterator[Dict[str, Any]]:
+    """
+    Lê linhas de preço de um CSV (cabeçalho loja,pizza_id,tamanho_id,borda_id,preco)
+    sob demanda. `loja` é o código da loja; `loja_id` numérico também é aceito.
     """
-    
-    with sqlite3.connect(db_path) as con:
-        con.executescript(sql_script)
-    
-    print("Base de dados criada com sucesso!")
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _store_ids(con: sqlite3.Connection, rows: List[Dict[str, Any]], cache: Dict[str, int]) -> None:
+    """Resolve códigos de loja para IDs, criando as lojas que ainda não existem."""
+    def lookup(codes):
+        placeholders = ",".join("?" * len(codes))
+        cache.update(con.execute(f"SELECT codigo, id FROM lojas WHERE codigo IN ({placeholders})", codes))
+
+    missing = sorted({str(r["loja"]) for r in rows if r.get("loja") not in (None, "") and str(r["loja"]) not in cache})
+    if missing:
+        lookup(missing)
+        new = [c for c in missing if c not in cache]
+        if new:
+            con.executemany("INSERT INTO lojas (codigo, nome) VALUES (?, ?)", [(c, c) for c in new])
+            lookup(new)
+
+
+def upsert_prices(con: sqlite3.Connection, rows: Iterable[Dict[str, Any]], batch_size: int = BATCH_SIZE) -> int:
+    """Upsert de preços em lotes de executemany (chamar dentro de uma transação)."""
+    cache: Dict[str, int] = {}
+    total = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return total
+        _store_ids(con, batch, cache)
+        con.executemany(_UPSERT_PRECO, (
+            (
+                int(r["loja_id"]) if r.get("loja_id") not in (None, "") else cache.get(str(r.get("loja")), DEFAULT_STORE_ID),
+                int(r["pizza_id"]), int(r["tamanho_id"]), int(r["borda_id"]), float(r["preco"]),
+            )
+            for r in batch
+        ))
+        total += len(batch)
+
+
+def _import_catalog(con: sqlite3.Connection, path: Path) -> Dict[str, int]:
+    # Chamar dentro de uma transação
+    counts: Dict[str, int] = {}
+    if path.suffix.lower() == ".json":
+        with open(path, encoding="utf-8") as f:
+            catalog = json.load(f)
+        for table, sql in _UPSERTS.items():
+            if catalog.get(table):
+                con.executemany(sql, catalog[table])
+                counts[table] = len(catalog[table])
+        counts["precos"] = upsert_prices(con, catalog.get("precos") or [])
+    else:
+        counts["precos"] = upsert_prices(con, read_price_rows(path))
+    return counts
+
+
+def load_catalog(path, db_path: str = "data/knowledge_base.db") -> Dict[str, int]:
+    """
+    Importa um catálogo numa única transação (tudo ou nada).
+
+    JSON: {"lojas": [...], "pizzas": [...], "tamanhos": [...], "bordas": [...], "precos": [...]}
+    CSV: apenas linhas de preço (ver read_price_rows).
+    Reimportar o mesmo arquivo não duplica nada (upserts por chave).
+    """
+    path = Path(path)
+    con = _connect(db_path)
+    start = time.perf_counter()
+    try:
+        migrate(con)
+        con.execute("BEGIN IMMEDIATE")
+        counts = _import_catalog(con, path)
+        con.execute("COMMIT")
+    except BaseException:
+        if con.in_transaction:
+            con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{n} {table}" for table, n in counts.items())
+    print(f"📥 {path.name}: {summary} em {elapsed:.2f}s")
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def synthetic_price_rows(n_rows: int) -> Iterator[Dict[str, Any]]:
+    """Linhas de preço para `n_rows` combinações (6 sabores x 3 tamanhos x 3 bordas por loja)."""
+    combos = [(p, t, b) for p in range(1, 7) for t in range(1, 4) for b in range(1, 4)]
+    for i in range(n_rows):
+        pizza_id, tamanho_id, borda_id = combos[i % len(combos)]
+        yield {
+            "loja": f"loja-{i // len(combos) + 1:05d}",
+            "pizza_id": pizza_id, "tamanho_id": tamanho_id, "borda_id": borda_id,
+            "preco": 20.0 + pizza_id * 2 + tamanho_id * 10 + borda_id * 3,
+        }
+
+
+def benchmark_catalog(n_rows: int = 100_000, lookups: int = 5_000, db_path: str | None = None) -> Dict[str, float]:
+    """Mede carga em lote (inicial e reimportação) e latência de get_price_by_ids com `n_rows` preços."""
+    import random
+    import statistics
+    import tempfile
+    from app.tools.menu_tool import get_price_by_ids
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = db_path or str(Path(tmp) / "catalogo.db")
+        csv_path = Path(tmp) / "precos.csv"
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["loja", "pizza_id", "tamanho_id", "borda_id", "preco"])
+            writer.writeheader()
+            writer.writerows(synthetic_price_rows(n_rows))
+
+        initialize_database(db)
+        start = time.perf_counter()
+        load_catalog(csv_path, db)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_catalog(csv_path, db)
+        reload_seconds = time.perf_counter() - start
+
+        con = sqlite3.connect(db)
+        stores = [row[0] for row in con.execute("SELECT id FROM lojas")]
+        total_rows = con.execute("SELECT COUNT(*) FROM precos").fetchone()[0]
+        con.close()
+
+        rng = random.Random(0)
+        timings = []
+        for _ in range(lookups):
+            args = (rng.randint(1, 6), rng.randint(2, 3), rng.randint(1, 3), rng.choice(stores))
+            start = time.perf_counter()
+            try:
+                get_price_by_ids(*args[:3], db_path=db, loja_id=args[3])
+            except LookupError:
+                pass
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+
+    return {
+        "rows": total_rows,
+        "load_seconds": load_seconds,
+        "rows_per_second": n_rows / load_seconds,
+        "reload_seconds": reload_seconds,
+        "lookup_p50_ms": statistics.median(timings) * 1000,
+        "lookup_p99_ms": timings[int(len(timings) * 0.99) - 1] * 1000,
+    }
+
 
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Banco do cardápio: inicialização, importação e benchmark")
+    parser.add_argument("--db", default="data/knowledge_base.db")
+    sub = parser.add_subparsers(dest="command")
+    load_cmd = sub.add_parser("load", help="Importa catálogos CSV/JSON")
+    load_cmd.add_argument("files", nargs="+")
+    bench_cmd = sub.add_parser("bench", help="Benchmark de carga e consulta")
+    bench_cmd.add_argument("--rows", type=int, default=100_000)
+    bench_cmd.add_argument("--lookups", type=int, default=5_000)
+    args = parser.parse_args()
+
+    if args.command == "load":
+        initialize_database(args.db)
+        for file in args.files:
+            load_catalog(file, args.db)
+    elif args.command == "bench":
+        result = benchmark_catalog(args.rows, args.lookups)
+        print(f"⏱️  {result['rows']} preços: carga {result['load_seconds']:.2f}s "
+              f"({result['rows_per_second']:,.0f} linhas/s), reimportação {result['reload_seconds']:.2f}s")
+        print(f"🔎 get_price_by_ids: p50 {result['lookup_p50_ms']:.3f}ms, p99 {result['lookup_p99_ms']:.3f}ms")
+    else:
+        initialize_database(args.db)
@@ -1,22 +1,19 @@
+import os
 import warnings
 
-from collections import deque
-from app.agent import agent
+from app.agent import get_agent
+from app.session_store import SessionStore
+from app.slo import answer_turn
 
 warnings.filterwarnings("ignore")
 
-WINDOW = 8  
-chat_window = deque(maxlen=WINDOW)  
-def render_transcript():
-    if not chat_window:
-        return ""
-    lines = []
-    for m in chat_window:
-        role = "Cliente" if m["role"] == "user" else "Atendente"
-        lines.append(f"{role}: {m['content']}")
-    return "\n".join(lines)
+# O pedido em montagem fica no carrinho da sessão (app.cart): a janela só guarda o contexto recente
+WINDOW = 6
+SESSION_ID = os.getenv("SESSION_ID", "cli")
 
 def main():
+    agent = get_agent()
+    sessions = SessionStore(window=WINDOW)
     print("""
           
 
@@ -40,28 +37,24 @@ def main():
             if user_input.lower() in ("sair","exit","quit"):
                 print("Até mais! 🍕"); break
             if user_input.lower() in ("limpar","clear","reset"):
-                chat_window.clear(); print("Contexto limpo. 🧼"); continue
+                sessions.clear(SESSION_ID); print("Contexto e carrinho limpos. 🧼"); continue
 
-            chat_window.append({"role":"user","content":user_input})
+            chat_window = sessions.append(SESSION_ID, "user", user_input)
             print('                            ')
             print('------------------')
 
 
-            # 2) monta um único prompt com transcript curto + pergunta atual
-            transcript = render_transcript()
-            composed = (
-                "CONVERSA ATÉ AQUI (use para manter continuidade):\n"
-                + (transcript if transcript else "—")
-                + "\n\nRESPOSTA PARA A ÚLTIMA MENSAGEM DO CLIENTE:"
+            # 2) monta um único prompt com transcript curto + pergunta atual e
+            # 3) chama o agente com prazo (TURN_DEADLINE); se estourar, resposta degradada
+            cart = sessions.load_cart(SESSION_ID)
+            assistant_text = answer_turn(
+                lambda composed: agent.run(composed, stream=False), chat_window, SESSION_ID, cart=cart
             )
-
-            # 3) chama o agente passando o composed (mantendo suas instructions originais)
-            response = agent.run(composed, stream=False)
-            assistant_text = getattr(response, "content", str(response)).strip()
+            sessions.save_cart(SESSION_ID, cart)
             print(f"Atendente: {assistant_text}\n")
 
             # 4) guarda a fala do atendente
-            chat_window.append({"role":"assistant","content":assistant_text})
+            sessions.append(SESSION_ID, "assistant", assistant_text)
             print('------------------')
 
         except KeyboardInterrupt:
@@ -0,0 +1,131 @@
+"""
+Pré-injeção do cardápio nas instructions dos agentes.
+
+O catálogo inteiro cabe em poucas linhas; renderizá-lo nas instructions evita
+as rodadas extras de modelo para chamar get_menu()/get_price(). A tabela é
+re-renderizada automaticamente quando o arquivo do banco muda.
+
+Com o cardápio nas instructions, as regras do prompt base que mandam chamar
+get_menu/get_price/get_ingredients são retiradas (instruções contraditórias
+anulariam a economia).
+
+Benchmark offline (replay das conversas gravadas, sem OPENAI_API_KEY):
+    python -m app.menu_context
+"""
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Tuple, Optional
+
+
+MENU_HEADER = """
+CARDÁPIO ATUAL (fonte: banco de dados; use estes dados diretamente, sem chamar get_menu/get_price).
+- Para dúvidas de cardápio, ingredientes e preços: responda com esta tabela - NUNCA chute valores
+- get_menu, get_ingredients e get_price continuam disponíveis apenas para validar um caso duvidoso
+Os IDs correspondem às enums Flavor, Size e Crust.
+"""
+
+# Regras do prompt base que mandam consultar o cardápio pelas ferramentas
+_TOOL_RULE_RE = re.compile(r"^[^\n]*\b(?:get_menu|get_price|get_ingredients)\b[^\n]*\n?", re.MULTILINE)
+
+
+def strip_menu_tool_rules(prompt: str) -> str:
+    """Remove do prompt as linhas que mandam chamar get_menu/get_price/get_ingredients."""
+    return _TOOL_RULE_RE.sub("", prompt)
+
+
+def catalog_fingerprint(db_path: str = "data/knowledge_base.db") -> Tuple:
+    """Assinatura barata do catálogo: mtime e tamanho do banco e do WAL."""
+    parts = []
+    for suffix in ("", "-wal"):
+        try:
+            stat = os.stat(f"{db_path}{suffix}")
+            parts.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+
+def render_menu_table(db_path: str = "data/knowledge_base.db", loja_id: Optional[int] = None) -> str:
+    """Renderiza cardápio e preços (da loja STORE_ID por padrão) em texto compacto e determinístico."""
+    from app.tools.menu_tool import STORE_ID
+
+    loja_id = STORE_ID if loja_id is None else loja_id
+    with sqlite3.connect(Path(db_path)) as con:
+        pizzas = con.execute("SELECT id, sabor, descricao, ingredientes FROM pizzas ORDER BY id").fetchall()
+        sizes = con.execute("SELECT id, tamanho FROM tamanhos ORDER BY id").fetchall()
+        crusts = con.execute("SELECT id, tipo FROM bordas ORDER BY id").fetchall()
+        prices = con.execute(
+            "SELECT pizza_id, tamanho_id, borda_id, preco FROM precos WHERE loja_id = ? "
+            "ORDER BY pizza_id, tamanho_id, borda_id",
+            (loja_id,)
+        ).fetchall()
+
+    lines = ["SABORES (id|sabor|descrição|ingredientes):"]
+    lines += [f"{i}|{sabor}|{descricao}|{ingredientes}" for i, sabor, descricao, ingredientes in pizzas]
+    lines.append("TAMANHOS: " + "; ".join(f"{i}={nome}" for i, nome in sizes))
+    lines.append("BORDAS: " + "; ".join(f"{i}={nome}" for i, nome in crusts))
+    lines.append("PREÇOS R$ (sabor_id: tamanho_id/borda_id=preço; combinação ausente = indisponível):")
+
+    by_flavor: dict = {}
+    for pizza_id, size_id, crust_id, price in prices:
+        by_flavor.setdefault(pizza_id, []).append(f"{size_id}/{crust_id}={price:.2f}")
+    lines += [f"{pizza_id}: {' '.join(entries)}" for pizza_id, entries in by_flavor.items()]
+    return "\n".join(lines)
+
+
+class MenuInstructions:
+    """
+    Instructions dinâmicas para o Agno: prompt base (sem as regras de consulta
+    ao cardápio pelas ferramentas) + tabela do cardápio.
+
+    O Agno aceita um callable em `instructions`; a tabela é cacheada e só é
+    re-renderizada quando o catalog_fingerprint muda.
+    """
+
+    def __init__(self, base_prompt: str, db_path: str = "data/knowledge_base.db", loja_id: Optional[int] = None):
+        self.base_prompt = base_prompt
+        self.db_path = db_path
+        self.loja_id = loja_id
+        self.renders = 0
+        self._fingerprint: Optional[Tuple] = None
+        self._text = ""
+        self._lock = threading.Lock()
+
+    def __call__(self, agent=None) -> str:
+        fingerprint = catalog_fingerprint(self.db_path)
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                base_prompt = strip_menu_tool_rules(self.base_prompt).rstrip()
+                self._text = f"{base_prompt}\n{MENU_HEADER}{render_menu_table(self.db_path, self.loja_id)}\n"
+                self._fingerprint = fingerprint
+                self.renders += 1
+            return self._text
+
+
+def benchmark_menu_preinjection(conversations_path: Optional[str] = None) -> dict:
+    """
+    Compara chamadas de modelo, tool calls e tokens com e sem pré-injeção do
+    cardápio, reexecutando as conversas gravadas no harness offline (app.replay).
+    """
+    from app.replay import CONVERSATIONS_PATH, METRICS, load_json, replay_conversations
+
+    conversations = load_json(conversations_path or CONVERSATIONS_PATH)
+    results = {}
+    for preinject in (False, True):
+        replayed = replay_conversations(conversations, menu_preinject=preinject)
+        results["preinject" if preinject else "tools"] = {
+            metric: sum(r["total"][metric] for r in replayed.values()) for metric in METRICS
+        }
+    return results
+
+
+if __name__ == "__main__":
+    results = benchmark_menu_preinjection()
+    for mode, row in results.items():
+        print(f"{mode:10s} chamadas de modelo={row['model_calls']} tool calls={row['tool_calls']} "
+              f"tokens de entrada={row['input_tokens']}")
+    saved = results["tools"]["model_calls"] - results["preinject"]["model_calls"]
+    print(f"📉 Chamadas de modelo evitadas nas conversas gravadas: {saved}")
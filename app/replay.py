@@ -0,0 +1,396 @@
+"""
+Harness de replay: orçamento de chamadas de LLM por turno.
+
+Reexecuta conversas gravadas (data/replay/conversations.json) no mesmo Team
+de produção (app.team.build_team), trocando apenas o cliente da OpenAI por um
+stub determinístico e a API de pedidos por respostas fixas. Tudo roda offline.
+
+Por turno são medidos: chamadas de modelo (coordenador + membros), tool calls
+e tokens de entrada (~4 caracteres por token de mensagens + schemas das
+ferramentas). Mudanças em SYSTEM_PROMPT/SYSTEM_PROMPT2, ferramentas ou
+estrutura do time que passem do orçamento (data/replay/budgets.json) falham:
+
+    python -m app.replay
+    python -m app.replay --update      # grava os valores atuais como orçamento
+
+O stub segue o roteiro de cada turno (`steps`: respostas do modelo com as
+tool calls) e reage às instructions: com o cardápio pré-injetado
+(MENU_PREINJECT=1) pula as consultas de get_menu/get_price/get_ingredients.
+"""
+import copy
+import functools
+import inspect
+import json
+import re
+import sys
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+from typing import List, Dict, Any, Optional
+
+from app.menu_context import MENU_HEADER
+from app.cart import Cart, current_cart, use_cart
+from app.session_store import compose_prompt
+from app.tools import order_api_tool
+
+
+CONVERSATIONS_PATH = "data/replay/conversations.json"
+BUDGETS_PATH = "data/replay/budgets.json"
+SAMPLE_ORDER_PATH = "data/replay/sample_order.json"
+METRICS = ("model_calls", "tool_calls", "input_tokens")
+
+# Ferramentas que o modelo dispensa quando o cardápio está nas instructions
+PROMPT_ANSWERABLE = {"get_menu", "get_price", "get_ingredients"}
+_MENU_MARKER = MENU_HEADER.strip().splitlines()[0]
+
+
+def estimate_input_tokens(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]]) -> int:
+    """Tokens de entrada de uma chamada (~4 caracteres por token; determinístico)."""
+    payload = json.dumps([messages, tools or []], ensure_ascii=False, default=str)
+    return len(payload) // 4
+
+
+def _member_id(member) -> str:
+    try:
+        from agno.utils.team import get_member_id
+        member_id = get_member_id(member)
+        if member_id:
+            return member_id
+    except ImportError:
+        pass
+    return re.sub(r"[^\w\-.]", "", member.name.replace(" ", "-").lower())
+
+
+def _tool_names(tools) -> List[str]:
+    names = []
+    for tool in tools or []:
+        if isinstance(tool, dict):
+            names.append(tool.get("function", {}).get("name"))
+        else:
+            names.append(getattr(tool, "name", None) or getattr(tool, "__name__", None))
+    return [n for n in names if n]
+
+
+# ---------------------------------------------------------------------------
+# API de pedidos offline
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def _load_sample_order() -> Dict[str, Any]:
+    return load_json(SAMPLE_ORDER_PATH)
+
+
+def sample_order() -> Dict[str, Any]:
+    """Pedido de exemplo usado pela API offline (cópia; pode ser alterada)."""
+    return copy.deepcopy(_load_sample_order())
+
+
+def _history(client_document: str, delivery_date: Optional[str] = None, limit: int = 5, **_) -> List[Dict[str, Any]]:
+    orders = [
+        dict(sample_order(), id=1003 - i, client_document=client_document, delivery_date=f"2025-01-{12 - i:02d}")
+        for i in range(3)
+    ]
+    return [o for o in orders if not delivery_date or o["delivery_date"] == delivery_date][:limit]
+
+
+def _create_order(**kw) -> Dict[str, Any]:
+    # Como a função real: campos omitidos vêm do carrinho, que é consumido
+    fields = ("client_name", "client_document", "delivery_date", "delivery_address")
+    data = {k: v for k, v in kw.items() if v}
+    cart = current_cart()
+    if cart is not None:
+        data = dict({k: getattr(cart, k) for k in fields}, items=cart.order_items(), **data)
+        cart.clear()
+    return dict(sample_order(), **{k: data[k] for k in fields + ("items",) if data.get(k)})
+
+
+ORDER_API_FIXTURES = {
+    "create_complete_order": _create_order,
+    "update_order_address": lambda order_id, delivery_address, **_: dict(
+        sample_order(), id=order_id, delivery_address=delivery_address),
+    "get_client_orders": _history,
+    "filter_orders": _history,
+}
+
+
+@contextmanager
+def offline_order_api():
+    """Troca as funções da API de pedidos por respostas fixas (mesma assinatura e docstring)."""
+    originals = {name: getattr(order_api_tool, name) for name in ORDER_API_FIXTURES}
+
+    def offline(name, original):
+        signature = inspect.signature(original)
+
+        @functools.wraps(original)
+        def call(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            return ORDER_API_FIXTURES[name](**bound.arguments)
+        return call
+
+    for name, original in originals.items():
+        setattr(order_api_tool, name, offline(name, original))
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(order_api_tool, name, original)
+
+
+# ---------------------------------------------------------------------------
+# Modelo stub
+# ---------------------------------------------------------------------------
+
+class ReplayScript:
+    """
+    Estado do replay: roteiro do turno atual e contadores.
+
+    Cada turno gravado tem `user`, `reply` e `steps` (lista de respostas do
+    modelo; cada resposta é uma lista de tool calls {"name", "arguments"}).
+    O coordenador delega os steps ao membro que possui as ferramentas e
+    responde com `reply` quando todos os membros terminaram.
+    """
+
+    def __init__(self, team):
+        self.member_tools = [(_member_id(m), set(_tool_names(m.tools))) for m in team.members]
+        self.turn: Dict[str, Any] = {}
+        self.delegations: List[tuple] = []
+        self.active: Optional[tuple] = None
+        self.stats: Dict[str, Any] = {}
+        self._ids = count(1)
+
+    def begin_turn(self, turn: Dict[str, Any]):
+        self.turn = turn
+        self.delegations = self._plan(turn.get("steps") or [])
+        self.active = None
+        self.stats = {"model_calls": 0, "tool_calls": 0, "input_tokens": 0, "delegations": 0, "calls_by": {}}
+
+    def _owners(self, step) -> List[str]:
+        names = {call["name"] for call in step}
+        return [member for member, tools in self.member_tools if names <= tools]
+
+    def _plan(self, steps) -> List[tuple]:
+        """Agrupa steps consecutivos no membro que cobre o maior prefixo restante."""
+        plan, i = [], 0
+        while i < len(steps):
+            best, best_len = None, 0
+            for member, _ in self.member_tools:
+                n = 0
+                while i + n < len(steps) and member in self._owners(steps[i + n]):
+                    n += 1
+                if n > best_len:
+                    best, best_len = member, n
+            if best is None:
+                # Nenhum membro tem a ferramenta: o coordenador responde sem ela
+                i += 1
+                continue
+            plan.append((best, steps[i:i + best_len]))
+            i += best_len
+        return plan
+
+    # -- API no formato chat.completions ------------------------------------
+
+    def create(self, model: str = "", messages: Optional[List[Dict[str, Any]]] = None, tools=None, **kwargs):
+        messages = messages or []
+        delegate_tool = next((t for t in tools or [] if "member" in t.get("function", {}).get("name", "")), None)
+        role = "coordenador" if delegate_tool else (self.active[0] if self.active else "membro")
+
+        self.stats["model_calls"] += 1
+        self.stats["input_tokens"] += estimate_input_tokens(messages, tools)
+        self.stats["calls_by"][role] = self.stats["calls_by"].get(role, 0) + 1
+
+        if delegate_tool:
+            calls = self._coordinator_step(messages, delegate_tool)
+        else:
+            calls = self._member_step(messages, set(_tool_names(tools)))
+            self.stats["tool_calls"] += len(calls)
+        return self._completion(model, calls, self.turn.get("reply", ""))
+
+    def _coordinator_step(self, messages, delegate_tool) -> List[Dict[str, Any]]:
+        name = delegate_tool["function"]["name"]
+        done = sum(
+            1 for m in self._current(messages) if m.get("role") == "assistant"
+            for tc in m.get("tool_calls") or [] if tc.get("function", {}).get("name") == name
+        )
+        if done >= len(self.delegations):
+            return []
+        self.active = self.delegations[done]
+        self.stats["delegations"] += 1
+        arguments = {}
+        params = delegate_tool["function"].get("parameters", {}).get("properties", {})
+        for param in params:
+            if "member" in param:
+                arguments[param] = self.active[0]
+            elif param == "expected_output":
+                arguments[param] = "Resposta para o cliente"
+            else:
+                arguments[param] = self.turn.get("user", "")
+        return [{"name": name, "arguments": arguments}]
+
+    def _member_step(self, messages, available) -> List[Dict[str, Any]]:
+        steps = self.active[1] if self.active else []
+        system = "\n".join(str(m.get("content")) for m in messages if m.get("role") in ("system", "developer"))
+        if _MENU_MARKER in system:
+            steps = [s for s in steps if not {c["name"] for c in s} <= PROMPT_ANSWERABLE]
+        steps = [[c for c in s if c["name"] in available] for s in steps]
+        steps = [s for s in steps if s]
+        done = sum(1 for m in self._current(messages) if m.get("role") == "assistant" and m.get("tool_calls"))
+        return steps[done] if done < len(steps) else []
+
+    @staticmethod
+    def _current(messages) -> List[Dict[str, Any]]:
+        """Mensagens depois da última mensagem do usuário (o turno em andamento)."""
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        return messages[last_user + 1:]
+
+    def _completion(self, model: str, calls: List[Dict[str, Any]], reply: str):
+        from openai.types.chat import ChatCompletion
+
+        message: Dict[str, Any] = {"role": "assistant", "content": None if calls else reply}
+        if calls:
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{next(self._ids)}",
+                    "type": "function",
+                    "function": {"name": c["name"], "arguments": json.dumps(c.get("arguments", {}), ensure_ascii=False)},
+                }
+                for c in calls
+            ]
+        return ChatCompletion.model_validate({
+            "id": f"replay-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": model or "replay",
+            "choices": [{"index": 0, "finish_reason": "tool_calls" if calls else "stop", "message": message}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+class _ReplayClient:
+    """Imita openai.OpenAI o suficiente para OpenAIChat: client.chat.completions.create(...)."""
+
+    def __init__(self, script: Optional[ReplayScript] = None):
+        self.chat = self
+        self.completions = script
+
+
+def replay_model_cls(base_cls, client):
+    """Subclasse do modelo de produção que fala com o stub em vez da OpenAI."""
+    return type(f"Replay{base_cls.__name__}", (base_cls,), {"get_client": lambda self: client})
+
+
+# ---------------------------------------------------------------------------
+# Execução e orçamento
+# ---------------------------------------------------------------------------
+
+def load_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def replay_conversations(
+    conversations: List[Dict[str, Any]], window: int = 6, menu_preinject: Optional[bool] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Reexecuta as conversas no Team com o modelo stub e retorna as métricas por turno.
+    menu_preinject força o cardápio nas instructions (padrão: MENU_PREINJECT).
+    """
+    from app.init_db import initialize_database
+    from app.team import build_team
+    from app.tools.parallel import ParallelOpenAIChat
+    from app.scheduler import ScheduledOpenAIChat
+
+    initialize_database()
+    results = {}
+    with offline_order_api():
+        client = _ReplayClient()
+        team = build_team(
+            knowledge=None,
+            member_model_cls=replay_model_cls(ParallelOpenAIChat, client),
+            team_model_cls=replay_model_cls(ScheduledOpenAIChat, client),
+            menu_preinject=menu_preinject,
+        )
+        client.completions = script = ReplayScript(team)
+
+        for conversation in conversations:
+            history = deque(maxlen=window)
+            cart = Cart()
+            turns = []
+            for turn in conversation["turns"]:
+                history.append({"role": "user", "content": turn["user"]})
+                script.begin_turn(turn)
+                with use_cart(cart):
+                    response = team.run(compose_prompt(history, cart), stream=False)
+                history.append({"role": "assistant", "content": str(getattr(response, "content", response) or "")})
+                turns.append(dict(script.stats, user=turn["user"]))
+            results[conversation["name"]] = {
+                "turns": turns,
+                "total": {metric: sum(t[metric] for t in turns) for metric in METRICS},
+            }
+    return results
+
+
+def check_budgets(results: Dict[str, Dict[str, Any]], budgets: Dict[str, Any]) -> List[str]:
+    """Retorna as violações de orçamento (vazia se tudo estiver dentro)."""
+    violations = []
+    per_turn = budgets.get("per_turn", {})
+    for name, result in results.items():
+        for i, turn in enumerate(result["turns"], 1):
+            for metric, limit in per_turn.items():
+                if turn[metric] > limit:
+                    violations.append(f"{name} turno {i}: {metric} {turn[metric]} > {limit}")
+        for metric, limit in budgets.get("conversations", {}).get(name, {}).items():
+            if result["total"][metric] > limit:
+                violations.append(f"{name}: {metric} total {result['total'][metric]} > {limit}")
+    return violations
+
+
+def budgets_from_results(results: Dict[str, Dict[str, Any]], token_headroom: float = 0.1) -> Dict[str, Any]:
+    """Orçamento a partir de uma execução: chamadas exatas, tokens com folga."""
+    def limit(metric, value):
+        return int(value * (1 + token_headroom)) if metric == "input_tokens" else value
+
+    turns = [t for r in results.values() for t in r["turns"]]
+    return {
+        "per_turn": {m: limit(m, max(t[m] for t in turns)) for m in METRICS},
+        "conversations": {
+            name: {m: limit(m, r["total"][m]) for m in METRICS} for name, r in results.items()
+        },
+    }
+
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    for name, result in results.items():
+        print(f"\n🎬 {name}")
+        print(f"{'turno':>5} {'modelo':>6} {'tools':>5} {'tokens':>7}  mensagem")
+        for i, turn in enumerate(result["turns"], 1):
+            print(f"{i:>5} {turn['model_calls']:>6} {turn['tool_calls']:>5} {turn['input_tokens']:>7}  {turn['user'][:50]}")
+        total = result["total"]
+        print(f"{'total':>5} {total['model_calls']:>6} {total['tool_calls']:>5} {total['input_tokens']:>7}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay offline de conversas com orçamento de chamadas de LLM")
+    parser.add_argument("--conversations", default=CONVERSATIONS_PATH)
+    parser.add_argument("--budgets", default=BUDGETS_PATH)
+    parser.add_argument("--update", action="store_true", help="Grava os valores atuais como novo orçamento")
+    parser.add_argument("--token-headroom", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = replay_conversations(load_json(args.conversations))
+    print_report(results)
+
+    if args.update:
+        with open(args.budgets, "w", encoding="utf-8") as f:
+            json.dump(budgets_from_results(results, args.token_headroom), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\n💾 Orçamento atualizado em {args.budgets}")
+        sys.exit(0)
+
+    problems = check_budgets(results, load_json(args.budgets))
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("\n✅ Dentro do orçamento de chamadas de LLM")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,282 @@
+"""
+Agendador único (por processo) para as chamadas à OpenAI.
+
+Todas as chamadas de modelo e de embedding passam por aqui:
+- token buckets de requisições/minuto e tokens/minuto
+- classes de prioridade: execução de pedido > informação > tarefas de fundo
+- controle de admissão: se a fila estiver cheia ou a espera estimada passar
+  de `max_wait`, levanta SchedulerOverloaded na hora (o atendimento responde
+  com a resposta degradada de app.slo em vez de deixar o cliente esperando)
+- prazo do turno (`turn_deadline`): depois dele nenhuma chamada é admitida
+  (e as ferramentas que alteram pedidos conferem `check_deadline`)
+- métricas de profundidade de fila e tempo de espera por prioridade
+
+Limites configuráveis por OPENAI_RPM, OPENAI_TPM, SCHEDULER_MAX_QUEUE e
+SCHEDULER_MAX_WAIT. SCHEDULER_SHARE (padrão 1) é a fração de RPM/TPM deste
+processo: o modo multi-processo (app.workers) divide os limites entre os workers.
+"""
+import asyncio
+import contextvars
+import heapq
+import os
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from itertools import count
+from typing import Dict, Any, Optional
+
+from agno.models.openai import OpenAIChat
+
+
+# Abertura da resposta rápida quando a admissão é recusada (montada em app.slo)
+HIGH_DEMAND_MESSAGE = "Estamos com alta demanda no momento 🍕"
+
+
+class Priority(IntEnum):
+    ORDER = 0          # checkout / execução de pedidos
+    INFORMATION = 1    # cardápio, história, dúvidas
+    BACKGROUND = 2     # indexação de embeddings
+
+
+class SchedulerOverloaded(RuntimeError):
+    """A requisição não foi admitida (fila cheia ou espera estimada alta demais)."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """O prazo do turno (ver app.slo) acabou: nenhuma nova chamada é feita."""
+
+
+class TokenBucket:
+    """Token bucket simples: `rate` unidades por segundo, até `capacity` acumuladas."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.available = capacity
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Segundos até haver `amount` disponível (0 se já houver)."""
+        self.refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar("scheduler_priority", default=Priority.BACKGROUND)
+# Instante (time.monotonic) em que o turno atual expira
+_turn_deadline: contextvars.ContextVar = contextvars.ContextVar("turn_deadline", default=None)
+
+
+@contextmanager
+def turn_deadline(seconds: Optional[float] = None, expires_at: Optional[float] = None):
+    """
+    Define o prazo do turno: chamadas feitas depois dele levantam DeadlineExceeded.
+
+    `expires_at` é o instante absoluto (time.monotonic) em que o turno expira;
+    sem ele, o prazo conta `seconds` a partir de agora.
+    """
+    token = _turn_deadline.set(time.monotonic() + seconds if expires_at is None else expires_at)
+    try:
+        yield
+    finally:
+        _turn_deadline.reset(token)
+
+
+def deadline_remaining() -> Optional[float]:
+    """Segundos restantes no prazo do turno (None se não houver prazo)."""
+    deadline = _turn_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline():
+    """Levanta DeadlineExceeded se o prazo do turno atual já acabou (turno abandonado)."""
+    remaining = deadline_remaining()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Prazo do turno esgotado")
+
+
+class RequestScheduler:
+    """Fila de prioridade com rate limiting por requisições e por tokens."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        max_queue: int = 64,
+        max_wait: Optional[float] = 20.0,
+        burst_seconds: float = 10.0
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60 * burst_seconds))
+        self.tokens = TokenBucket(tokens_per_minute / 60, max(1.0, tokens_per_minute / 60 * burst_seconds))
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._queue: list = []
+        self._seq = count()
+        self._stats = {
+            p.name.lower(): {"admitted": 0, "rejected": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for p in Priority
+        }
+
+    @contextmanager
+    def priority(self, priority: Priority):
+        """Eleva a prioridade das chamadas feitas neste contexto (ex.: turno de checkout)."""
+        token = _current_priority.set(priority)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+    def effective_priority(self, priority: Priority) -> Priority:
+        return Priority(min(priority, _current_priority.get()))
+
+    def acquire(self, priority: Priority = Priority.INFORMATION, tokens: int = 1,
+                max_wait: Optional[float] = -1) -> float:
+        """
+        Bloqueia até a requisição poder ser enviada e retorna o tempo de espera.
+
+        max_wait=-1 usa o padrão do agendador; None espera indefinidamente
+        (usado pela indexação em segundo plano).
+        """
+        max_wait = self.max_wait if max_wait == -1 else max_wait
+        remaining = deadline_remaining()
+        if remaining is not None:
+            # Turno com prazo: não inicia chamadas depois dele nem espera além dele
+            if remaining <= 0:
+                raise DeadlineExceeded("Prazo do turno esgotado")
+            if max_wait is not None:
+                max_wait = min(max_wait, remaining)
+        stats = self._stats[Priority(priority).name.lower()]
+        start = time.monotonic()
+        entry = [int(priority), next(self._seq), tokens]
+
+        with self._cond:
+            if max_wait is not None:
+                if len(self._queue) >= self.max_queue:
+                    stats["rejected"] += 1
+                    raise SchedulerOverloaded(f"Fila cheia ({len(self._queue)} requisições)")
+                estimate = self._estimated_wait(int(priority), tokens)
+                if estimate > max_wait:
+                    stats["rejected"] += 1
+                    raise SchedulerOverloaded(f"Espera estimada de {estimate:.1f}s")
+
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    delay = None
+                    if self._queue[0] is entry:
+                        delay = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+                        if delay <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            heapq.heappop(self._queue)
+                            break
+                    if max_wait is not None:
+                        remaining = start + max_wait - time.monotonic()
+                        if remaining <= 0:
+                            stats["rejected"] += 1
+                            raise SchedulerOverloaded(f"Tempo máximo de espera ({max_wait:.0f}s) excedido")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                raise
+            finally:
+                self._cond.notify_all()
+
+        waited = time.monotonic() - start
+        stats["admitted"] += 1
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+        return waited
+
+    def metrics(self) -> Dict[str, Any]:
+        """Profundidade da fila e tempos de espera por prioridade."""
+        with self._cond:
+            depth = {p.name.lower(): 0 for p in Priority}
+            for priority, _, _ in self._queue:
+                depth[Priority(priority).name.lower()] += 1
+            per_priority = {}
+            for name, s in self._stats.items():
+                per_priority[name] = dict(s, wait_avg=s["wait_total"] / s["admitted"] if s["admitted"] else 0.0)
+        return {"queue_depth": sum(depth.values()), "queue_by_priority": depth, "priorities": per_priority}
+
+    def _estimated_wait(self, priority: int, tokens: int) -> float:
+        # Chamado com o lock: soma o que está à frente na fila
+        ahead = [e for e in self._queue if e[0] <= priority]
+        self.requests.refill()
+        self.tokens.refill()
+        need_requests = len(ahead) + 1 - self.requests.available
+        need_tokens = sum(e[2] for e in ahead) + tokens - self.tokens.available
+        return max(0.0, need_requests / self.requests.rate, need_tokens / self.tokens.rate)
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Agendador compartilhado do processo (configurado pelo ambiente)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            max_wait = os.getenv("SCHEDULER_MAX_WAIT", "20")
+            share = float(os.getenv("SCHEDULER_SHARE", "1"))
+            _scheduler = RequestScheduler(
+                requests_per_minute=float(os.getenv("OPENAI_RPM", "500")) * share,
+                tokens_per_minute=float(os.getenv("OPENAI_TPM", "200000")) * share,
+                max_queue=int(os.getenv("SCHEDULER_MAX_QUEUE", "64")),
+                max_wait=float(max_wait) if max_wait else None,
+            )
+        return _scheduler
+
+
+def estimate_message_tokens(messages, completion_tokens: int = 500) -> int:
+    """Estimativa barata (~4 caracteres por token) de prompt + resposta."""
+    chars = sum(len(str(getattr(m, "content", "") or "")) for m in messages or [])
+    return chars // 4 + completion_tokens
+
+
+class ScheduledOpenAIChat(OpenAIChat):
+    """
+    OpenAIChat cujas chamadas passam pelo agendador compartilhado.
+
+    Vale também para os caminhos assíncronos (agent.arun): a espera pela vez
+    roda numa thread (asyncio.to_thread leva o contexto: prazo e prioridade),
+    sem bloquear o event loop.
+    """
+
+    priority: Priority = Priority.INFORMATION
+
+    def _acquire(self, messages):
+        scheduler = get_scheduler()
+        scheduler.acquire(scheduler.effective_priority(self.priority), estimate_message_tokens(messages))
+
+    def invoke(self, messages, *args, **kwargs):
+        self._acquire(messages)
+        return super().invoke(messages, *args, **kwargs)
+
+    def invoke_stream(self, messages, *args, **kwargs):
+        self._acquire(messages)
+        yield from super().invoke_stream(messages, *args, **kwargs)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.to_thread(self._acquire, messages)
+        return await super().ainvoke(messages, *args, **kwargs)
+
+    async def ainvoke_stream(self, messages, *args, **kwargs):
+        await asyncio.to_thread(self._acquire, messages)
+        async for response in super().ainvoke_stream(messages, *args, **kwargs):
+            yield response
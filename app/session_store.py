@@ -0,0 +1,214 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Tuple
+
+
+ROLE_CODES = {"user": "u", "assistant": "a"}
+ROLE_NAMES = {code: role for role, code in ROLE_CODES.items()}
+
+
+def serialize_window(window) -> bytes:
+    """Serializa a janela em JSON compacto ([[papel, texto], ...]) comprimido com zlib."""
+    rows = [[ROLE_CODES.get(m["role"], m["role"]), m["content"]] for m in window]
+    return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def deserialize_window(data: bytes, maxlen: int) -> deque:
+    rows = json.loads(zlib.decompress(data).decode("utf-8"))
+    return deque(({"role": ROLE_NAMES.get(r, r), "content": c} for r, c in rows), maxlen=maxlen)
+
+
+def render_transcript(window):
+    if not window:
+        return ""
+    lines = []
+    for m in window:
+        role = "Cliente" if m["role"] == "user" else "Atendente"
+        lines.append(f"{role}: {m['content']}")
+    return "\n".join(lines)
+
+
+def compose_prompt(window, cart=None):
+    """Monta um único prompt com o carrinho (se houver), transcript curto + pergunta atual."""
+    transcript = render_transcript(window)
+    cart_block = ""
+    if cart is not None and not cart.is_empty():
+        cart_block = (
+            "CARRINHO DA SESSÃO (estado atual do pedido; altere com add_to_cart/remove_from_cart):\n"
+            + cart.summary() + "\n\n"
+        )
+    return (
+        cart_block
+        + "CONVERSA ATÉ AQUI (use para manter continuidade):\n"
+        + (transcript if transcript else "—")
+        + "\n\nRESPOSTA PARA A ÚLTIMA MENSAGEM DO CLIENTE:"
+    )
+
+
+class SessionStore:
+    """
+    Armazena a janela de conversa de cada sessão.
+
+    - Camada em memória LRU limitada a `max_sessions` sessões
+    - Persistência write-through em SQLite (WAL), uma linha por sessão: as
+      sessões sobrevivem a reinícios de processo/worker
+    - Sessões ociosas há mais de `ttl` segundos expiram nas duas camadas
+    - O carrinho de cada sessão (app.cart) fica na tabela `carts`
+
+    load/save fazem no máximo uma leitura/escrita por chave primária por turno.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/sessions.db",
+        window: int = 8,
+        max_sessions: int = 1000,
+        ttl: float = 3600.0,
+        sweep_every: int = 500
+    ):
+        self.window = window
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sweep_every = sweep_every
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+        self._cache: "OrderedDict[str, Tuple[deque, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._saves = 0
+
+        db_path_obj = Path(db_path)
+        db_path_obj.parent.mkdir(parents=True, exist_ok=True)
+        self._con = sqlite3.connect(db_path_obj, check_same_thread=False, timeout=10.0, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)")
+        self._con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS carts (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def load(self, session_id: str) -> deque:
+        """Retorna a janela da sessão (vazia se não existir ou tiver expirado)."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._cache.move_to_end(session_id)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+
+            row = self._con.execute(
+                "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttl:
+                window = deserialize_window(row[0], self.window)
+                self.stats["disk_hits"] += 1
+            else:
+                window = deque(maxlen=self.window)
+                self.stats["misses"] += 1
+            self._remember(session_id, window, now)
+            return window
+
+    def save(self, session_id: str, window) -> None:
+        """Grava a janela da sessão (memória + SQLite)."""
+        now = time.time()
+        if not isinstance(window, deque) or window.maxlen != self.window:
+            window = deque(window, maxlen=self.window)
+        with self._lock:
+            self._remember(session_id, window, now)
+            self._con.execute(
+                """
+                INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                """,
+                (session_id, serialize_window(window), now)
+            )
+            self._saves += 1
+            sweep = self._saves % self.sweep_every == 0
+        if sweep:
+            self.expire()
+
+    def append(self, session_id: str, role: str, content: str) -> deque:
+        """Adiciona uma mensagem à janela e salva."""
+        window = self.load(session_id)
+        window.append({"role": role, "content": content})
+        self.save(session_id, window)
+        return window
+
+    def load_cart(self, session_id: str):
+        """Carrinho da sessão (vazio se não existir ou tiver expirado)."""
+        from app.cart import Cart
+
+        with self._lock:
+            row = self._con.execute(
+                "SELECT data, updated_at FROM carts WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row and time.time() - row[1] <= self.ttl:
+            return Cart.from_json(row[0])
+        return Cart()
+
+    def save_cart(self, session_id: str, cart) -> None:
+        """Grava o carrinho da sessão (carrinho vazio remove a linha)."""
+        with self._lock:
+            if cart.is_empty():
+                self._con.execute("DELETE FROM carts WHERE session_id = ?", (session_id,))
+                return
+            self._con.execute(
+                """
+                INSERT INTO carts (session_id, data, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                """,
+                (session_id, cart.to_json(), time.time())
+            )
+
+    def clear(self, session_id: str) -> None:
+        """Remove a sessão (e o carrinho) das duas camadas."""
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._con.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._con.execute("DELETE FROM carts WHERE session_id = ?", (session_id,))
+
+    def expire(self) -> int:
+        """Remove sessões ociosas há mais de `ttl` segundos. Retorna quantas expiraram no disco."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            stale = [sid for sid, (_, seen) in self._cache.items() if seen < cutoff]
+            for sid in stale:
+                del self._cache[sid]
+            removed = self._con.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+            self._con.execute("DELETE FROM carts WHERE updated_at < ?", (cutoff,))
+            self.stats["expired"] += removed
+        return removed
+
+    def close(self) -> None:
+        self._con.close()
+
+    def _remember(self, session_id: str, window: deque, now: float):
+        # Chamado com o lock: atualiza a LRU e descarta as menos recentes
+        self._cache[session_id] = (window, now)
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+            self.stats["evictions"] += 1
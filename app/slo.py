@@ -0,0 +1,333 @@
+"""
+SLO de latência por turno com resposta degradada.
+
+Cada turno tem um prazo (TURN_DEADLINE, segundos). O Team roda numa thread
+própria; se o prazo estourar (ou o agendador recusar a admissão), o turno é
+cancelado — o prazo (contado desde a submissão do turno) fica no contexto e
+o agendador recusa qualquer nova chamada de modelo/embedding depois dele,
+assim como as ferramentas que alteram pedidos — e o cliente recebe na hora uma
+resposta degradada montada sem LLM:
+- perguntas de cardápio, preço e ingredientes: respondidas direto do menu_tool
+- intenção de pedido (palavra de pedido + sabor ou tamanho reconhecido):
+  pizzas completas (sabor, tamanho e borda) entram no carrinho da sessão, as
+  demais ficam anotadas na conversa (o pedido é retomado no próximo turno) e
+  o cliente recebe uma previsão; o turno abandonado não altera mais o
+  carrinho (Cart.cancel_turns)
+- demais casos: pedido de desculpas com previsão de normalização
+
+Cada degradação é registrada no logger "beauty_pizza.slo" e contabilizada em
+`get_monitor().metrics()`.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from contextvars import copy_context
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from app.cart import Cart, use_cart
+from app.embeddings.lexical import normalize_text
+from app.scheduler import HIGH_DEMAND_MESSAGE, DeadlineExceeded, SchedulerOverloaded, check_deadline, turn_deadline
+from app.session_store import compose_prompt
+from app.tools import menu_tool
+from app.tools.cart_tool import add_pizza
+from app.tools.schemas import PizzaIngredients
+
+
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "25"))
+# Threads que executam os turnos (turnos cancelados ainda ocupam a thread até a próxima chamada)
+TURN_THREADS = int(os.getenv("TURN_THREADS", "32"))
+
+logger = logging.getLogger("beauty_pizza.slo")
+
+_MENU_WORDS = ("cardapio", "menu", "sabores", "opcoes", "o que voces tem", "quais pizzas")
+_PRICE_WORDS = ("preco", "quanto", "valor", "custa", "custo")
+_INGREDIENT_WORDS = ("ingrediente", "leva", "vem na", "vem no", "feita com", "feito com")
+_ORDER_WORDS = ("quero", "queria", "pedir", "pedido", "pede", "manda", "fechar", "encomendar", "vou querer")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TURN_THREADS, thread_name_prefix="turn")
+        return _executor
+
+
+def run_with_deadline(fn: Callable, *args, deadline: float = TURN_DEADLINE):
+    """
+    Executa fn(*args) com prazo. Levanta DeadlineExceeded quando o prazo acaba.
+
+    O prazo conta a partir da submissão (inclui a espera por uma thread livre).
+    A execução continua em segundo plano apenas até a próxima chamada ao
+    agendador ou ferramenta que altera pedidos, que recusam o turno expirado.
+    """
+    expires_at = time.monotonic() + deadline
+
+    def target(expires_at: float):
+        with turn_deadline(expires_at=expires_at):
+            # Turno que esperou a fila além do prazo: o cliente já recebeu a resposta degradada
+            check_deadline()
+            return fn(*args)
+
+    # O contexto (tenant, prioridade) acompanha a thread do turno
+    future = _get_executor().submit(copy_context().run, target, expires_at)
+    try:
+        return future.result(timeout=max(expires_at - time.monotonic(), 0))
+    except FuturesTimeout:
+        future.cancel()
+        raise DeadlineExceeded(f"Turno passou de {deadline:.0f}s") from None
+
+
+class DegradationMonitor:
+    """Latência dos turnos normais (para a previsão) e contagem das degradações."""
+
+    def __init__(self, history: int = 200):
+        self._latencies: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.stats = {"turns": 0, "degraded": 0, "deadline": 0, "overloaded": 0}
+        self.intents: Dict[str, int] = {}
+
+    def record_success(self, elapsed: float):
+        with self._lock:
+            self.stats["turns"] += 1
+            self._latencies.append(elapsed)
+
+    def record_degradation(self, session_id: str, reason: str, intent: str, elapsed: float):
+        with self._lock:
+            self.stats["turns"] += 1
+            self.stats["degraded"] += 1
+            self.stats[reason] += 1
+            self.intents[intent] = self.intents.get(intent, 0) + 1
+        logger.warning(
+            "turno degradado session=%s reason=%s intent=%s elapsed=%.2fs", session_id, reason, intent, elapsed
+        )
+
+    def eta_seconds(self) -> float:
+        """Previsão de normalização: p90 dos turnos recentes (entre 1 e 10 minutos)."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        p90 = latencies[int(len(latencies) * 0.9)] if latencies else 0.0
+        return min(max(p90 * 4, 60.0), 600.0)
+
+    def metrics(self) -> Dict[str, Any]:
+        eta = self.eta_seconds()
+        with self._lock:
+            turns = self.stats["turns"]
+            return dict(
+                self.stats,
+                degraded_rate=self.stats["degraded"] / turns if turns else 0.0,
+                intents=dict(self.intents),
+                eta_seconds=eta,
+            )
+
+
+_monitor: Optional[DegradationMonitor] = None
+
+
+def get_monitor() -> DegradationMonitor:
+    global _monitor
+    with _executor_lock:
+        if _monitor is None:
+            _monitor = DegradationMonitor()
+        return _monitor
+
+
+# ---------------------------------------------------------------------------
+# Respostas degradadas (sem LLM)
+# ---------------------------------------------------------------------------
+
+def detect_intent(message: str, pizza: Optional[Dict[str, Optional[int]]] = None) -> str:
+    """
+    Intenção do cliente por palavras-chave: price, ingredients, menu, order ou other.
+
+    Perguntas vêm antes do pedido ("quero ver o cardápio" é menu). Pedido exige
+    palavra de pedido e sabor ou tamanho reconhecido em `pizza` (de detect_pizza).
+    """
+    text = normalize_text(message)
+    if any(w in text for w in _PRICE_WORDS):
+        return "price"
+    if any(w in text for w in _INGREDIENT_WORDS):
+        return "ingredients"
+    if any(w in text for w in _MENU_WORDS):
+        return "menu"
+    if any(w in text for w in _ORDER_WORDS) and pizza and (pizza["flavor"] or pizza["size"]):
+        return "order"
+    return "other"
+
+
+def _match(text: str, names: Dict[int, str], keyword) -> Tuple[Optional[int], str]:
+    # Retorna o ID do primeiro nome citado no texto e o texto sem o trecho encontrado
+    for item_id, name in names.items():
+        for candidate in (normalize_text(name), keyword(normalize_text(name))):
+            if candidate and candidate in text:
+                return item_id, text.replace(candidate, " ", 1)
+    return None, text
+
+
+def detect_pizza(message: str, catalog: Dict[str, Dict[int, str]]) -> Dict[str, Optional[int]]:
+    """IDs de sabor, tamanho e borda citados na mensagem (None quando não citados)."""
+    text = normalize_text(message)
+    # O sabor sai do texto antes da borda ("frango com catupiry" não é borda de catupiry)
+    flavor, text = _match(text, catalog["sabores"], lambda n: n.split()[0] if len(n.split()[0]) > 3 else "")
+    size, text = _match(text, catalog["tamanhos"], lambda n: "")
+    crust, text = _match(text, catalog["bordas"], lambda n: n.split()[-1])
+    if crust is None and "sem borda" in text:
+        crust = min(catalog["bordas"]) if catalog["bordas"] else None
+    return {"flavor": flavor, "size": size, "crust": crust}
+
+
+def _money(value: float) -> str:
+    return f"R$ {value:.2f}".replace(".", ",")
+
+
+def _eta_text(eta: float) -> str:
+    minutes = max(1, round(eta / 60))
+    return f"cerca de {minutes} minuto{'s' if minutes > 1 else ''}"
+
+
+def _menu_answer() -> str:
+    menu = menu_tool.get_menu()
+    flavors = ", ".join(p["flavor"] for p in menu["sabores"])
+    return (
+        f"Nossos sabores: {flavors}. Tamanhos: {', '.join(menu['tamanhos'])}. "
+        f"Bordas: {', '.join(menu['bordas'])}."
+    )
+
+
+def _price_answer(pizza: Dict[str, Optional[int]], catalog: Dict[str, Dict[int, str]]) -> Optional[str]:
+    if pizza["flavor"] is None:
+        return None
+    flavor = catalog["sabores"][pizza["flavor"]]
+    sizes = [pizza["size"]] if pizza["size"] else list(catalog["tamanhos"])
+    crust = pizza["crust"] or min(catalog["bordas"])
+    prices = []
+    for size in sizes:
+        try:
+            price = menu_tool.get_price_by_ids(pizza["flavor"], size, crust)
+        except LookupError:
+            continue
+        prices.append(f"{catalog['tamanhos'][size]} {_money(price)}")
+    if not prices:
+        return None
+    return f"{flavor} com borda {catalog['bordas'][crust]}: {'; '.join(prices)}."
+
+
+def _ingredients_answer(pizza: Dict[str, Optional[int]], catalog: Dict[str, Dict[int, str]]) -> Optional[str]:
+    if pizza["flavor"] is None:
+        return None
+    flavor = catalog["sabores"][pizza["flavor"]]
+    # get_ingredients só lê `.flavor`: dispensa a validação do enum (catálogos de outros tenants)
+    ingredients = menu_tool.get_ingredients(PizzaIngredients.model_construct(flavor=flavor))
+    if not ingredients:
+        return None
+    return f"A {flavor} leva: {', '.join(i.rstrip('.') for i in ingredients)}."
+
+
+def _describe(pizza: Dict[str, Optional[int]], catalog: Dict[str, Dict[int, str]]) -> str:
+    parts = [catalog["sabores"][pizza["flavor"]]]
+    if pizza["size"]:
+        parts.append(catalog["tamanhos"][pizza["size"]])
+    if pizza["crust"]:
+        parts.append(f"borda {catalog['bordas'][pizza['crust']]}")
+    return " ".join(parts)
+
+
+def degraded_answer(
+    message: str, reason: str = "deadline", eta: float = 60.0, cart: Optional[Cart] = None
+) -> Tuple[str, str]:
+    """
+    Resposta templada para quando o turno não cumpre o prazo.
+
+    Pedidos com sabor, tamanho e borda reconhecidos vão direto para o carrinho.
+
+    Returns:
+        (texto, intenção detectada)
+    """
+    intent = detect_intent(message)
+    apology = "Desculpe a demora! 🍕" if reason == "deadline" else HIGH_DEMAND_MESSAGE
+    later = f"Nosso atendimento deve normalizar em {_eta_text(eta)}."
+
+    try:
+        catalog = menu_tool.get_catalog_ids()
+        pizza = detect_pizza(message, catalog)
+        intent = detect_intent(message, pizza)
+        if intent == "order":
+            if cart is not None and all(pizza.values()):
+                item = add_pizza(cart, pizza["flavor"], pizza["size"], pizza["crust"])
+                held = f"Coloquei no seu carrinho: {item.name} ({_money(item.unit_price)}). "
+            elif pizza["flavor"]:
+                held = f"Anotei aqui: {_describe(pizza, catalog)}. "
+            else:
+                held = f"Anotei aqui: pizza {catalog['tamanhos'][pizza['size']]}. "
+            return (
+                f"{apology} {held}Ele fica reservado e eu sigo com a confirmação e o pagamento "
+                f"assim que o sistema normalizar ({_eta_text(eta)}).",
+                intent,
+            )
+        if intent == "price":
+            answer = _price_answer(pizza, catalog)
+        elif intent == "ingredients":
+            answer = _ingredients_answer(pizza, catalog)
+        elif intent == "menu":
+            answer = _menu_answer()
+        else:
+            answer = None
+    except Exception as e:
+        # O cardápio também pode estar indisponível: fica só o pedido de desculpas
+        logger.warning("resposta degradada sem cardápio: %s", e)
+        answer = None
+
+    if answer is None:
+        return f"{apology} Não consegui concluir sua solicitação agora. {later} Pode repetir em instantes?", intent
+    return f"{apology} {answer} {later}", intent
+
+
+def answer_turn(
+    run: Callable[[str], Any],
+    window,
+    session_id: str = "-",
+    deadline: Optional[float] = None,
+    cart: Optional[Cart] = None
+) -> str:
+    """
+    Turno completo com prazo: run(prompt) normalmente, resposta degradada se estourar.
+
+    Args:
+        run: executa o prompt no Team (ex.: lambda p: agent.run(p, stream=False))
+        window: janela da sessão, já com a mensagem do cliente
+        session_id: usado apenas no log
+        deadline: prazo em segundos (padrão TURN_DEADLINE)
+        cart: carrinho da sessão (resumo no prompt e alvo das ferramentas do carrinho)
+    """
+    monitor = get_monitor()
+    deadline = TURN_DEADLINE if deadline is None else deadline
+    start = time.perf_counter()
+    try:
+        with use_cart(cart):
+            response = run_with_deadline(run, compose_prompt(window, cart), deadline=deadline)
+    except (DeadlineExceeded, SchedulerOverloaded) as e:
+        reason = "deadline" if isinstance(e, DeadlineExceeded) else "overloaded"
+        if cart is not None:
+            # O turno abandonado continua na thread: suas ferramentas não alteram mais o carrinho
+            cart.cancel_turns()
+        message = next((m["content"] for m in reversed(window) if m["role"] == "user"), "")
+        text, intent = degraded_answer(message, reason, monitor.eta_seconds(), cart)
+        monitor.record_degradation(session_id, reason, intent, time.perf_counter() - start)
+        return text
+    monitor.record_success(time.perf_counter() - start)
+    return str(getattr(response, "content", response) or "").strip()
+
+
+if __name__ == "__main__":
+    import sys
+
+    for line in sys.stdin:
+        if line.strip():
+            text, intent = degraded_answer(line.strip())
+            print(f"[{intent}] {text}")
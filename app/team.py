@@ -0,0 +1,154 @@
+"""
+Definição do time de agentes (prompts, ferramentas e modelos).
+
+Sem efeitos colaterais no import: app.agent monta o time com a base de
+conhecimento e o harness de replay (app.replay) monta o mesmo time com um
+modelo stub, offline.
+"""
+import os
+from typing import Optional, Tuple
+
+from agno.agent import Agent
+from agno.team import Team
+from app.tools import cart_tool, menu_tool, order_api_tool
+from app.menu_context import MenuInstructions
+from app.tools.parallel import ParallelOpenAIChat
+from app.scheduler import Priority, ScheduledOpenAIChat
+
+
+SYSTEM_PROMPT = """
+Você é o atendente da Beauty Pizza. Seja objetivo e amigável.
+
+REGRAS OBRIGATÓRIAS:
+- Para dúvidas de cardápio: use get_menu()
+- Para saber ingrediente de alguma pizza get_ingredients(flavor)
+- Para montar pedido: SEMPRE peça sabor, tamanho e borda (todos obrigatórios) e use add_to_cart(pizza, quantity)
+- Para tirar itens do pedido: remove_from_cart(item_number, quantity)
+- Sempre passe o preço apos o pedido
+- Para preços: SEMPRE use get_price() - NUNCA chute valores
+- Antes de confirmar: mostre resumo completo do carrinho
+
+Sempre responda em português brasileiro.
+"""
+
+SYSTEM_PROMPT2 = """
+Você é o atendente da Beauty Pizza. Seu objetivo é executar ações relacionadas a registro, busca e update de pedidos.
+
+REGRAS OBRIGATÓRIAS:
+-Registre nome, documento, endereço e data de entrega no carrinho com update_cart_customer
+-Quando o carrinho estiver pronto, utilize create_complete_order
+-Para atualizar o endereço de um pedido existente, utilize update_order_address
+-Para buscar pedidos de um cliente, utilize get_client_orders ou filter_orders
+-Para cada ação, utilize os dados fornecidos pelo cliente
+
+
+PARÂMETROS OBRIGATORIOS DE CADA FUNÇÃO:
+
+update_order_address()
+order_id (int) - ID do pedido (OBRIGATORIO)
+delivery_address (Dict) - Logradouro de entrega, que deve conter:
+            {
+            "street_name": "Nome da rua" (OBRIGATORIO),
+            "number": "Numero do logradouro" (OBRIGATORIO),
+            "complement": "Complemento" ,
+            "reference_point": "Ponto de referência"
+            }
+
+create_complete_order()
+Sem parâmetros: itens, cliente, data e endereço vêm do carrinho (update_cart_customer)
+
+get_client_orders()
+client_document (str) - Documento do cliente
+limit (int) - Quantidade de pedidos mais recentes (padrão 5)
+
+Sempre responda em português brasileiro.
+"""
+debug_mode = False
+markdown = False
+
+
+def select_tools():
+    """Ferramentas por nome; TOOL_OUTPUT=compact troca pelas versões com saída enxuta (menos tokens de entrada)."""
+    tools = {
+        "get_menu": menu_tool.get_menu,
+        "get_ingredients": menu_tool.get_ingredients,
+        "get_price": menu_tool.get_price,
+        "create_complete_order": order_api_tool.create_complete_order,
+        "filter_orders": order_api_tool.filter_orders,
+        "update_order_address": order_api_tool.update_order_address,
+        "get_client_orders": order_api_tool.get_client_orders,
+        "add_to_cart": cart_tool.add_to_cart,
+        "remove_from_cart": cart_tool.remove_from_cart,
+        "view_cart": cart_tool.view_cart,
+        "update_cart_customer": cart_tool.update_cart_customer,
+    }
+    if os.getenv("TOOL_OUTPUT", "full") == "compact":
+        from app.tools import compact
+        for name in ("get_menu", "get_ingredients", "create_complete_order", "filter_orders",
+                     "update_order_address", "get_client_orders"):
+            tools[name] = getattr(compact, name)
+    return tools
+
+
+def build_model(model_cls, priority: Priority, client=None):
+    """Modelo gpt-4.1 com a prioridade usada no agendador de requisições (e cliente OpenAI compartilhado, se houver)."""
+    model = model_cls(id="gpt-4.1", temperature=0, max_tokens=6000)
+    model.priority = priority
+    if client is not None:
+        model.client = client
+    return model
+
+
+def build_team(
+    knowledge=None,
+    member_model_cls=ParallelOpenAIChat,
+    team_model_cls=ScheduledOpenAIChat,
+    prompts: Optional[Tuple[str, str]] = None,
+    db_path: str = menu_tool.DB_PATH,
+    loja_id: Optional[int] = None,
+    client=None,
+    menu_preinject: Optional[bool] = None
+) -> Team:
+    """
+    Monta o Team (coordenador + Information Agent + Executor Agent).
+
+    prompts, db_path e loja_id permitem montar o time de outra pizzaria
+    (ver app.tenants); client é um cliente OpenAI compartilhado entre times.
+    menu_preinject: cardápio nas instructions (padrão: MENU_PREINJECT=1).
+    """
+    tools = select_tools()
+    information_prompt, executor_prompt = prompts or (SYSTEM_PROMPT, SYSTEM_PROMPT2)
+
+    # MENU_PREINJECT=1: cardápio e preços vão direto nas instructions (menos rodadas de tool)
+    if menu_preinject is None:
+        menu_preinject = os.getenv("MENU_PREINJECT", "0") == "1"
+    information_instructions = (
+        MenuInstructions(information_prompt, db_path, loja_id) if menu_preinject else information_prompt
+    )
+    executor_instructions = MenuInstructions(executor_prompt, db_path, loja_id) if menu_preinject else executor_prompt
+
+    information_agent = Agent(
+        name="Information Agent",
+        role="Procurar informações referentes ao cardapio, pedidos e ingredientes",
+        model=build_model(member_model_cls, Priority.INFORMATION, client),
+        instructions=information_instructions,
+        knowledge=knowledge,
+        tools=[tools["get_menu"], tools["get_ingredients"], tools["get_price"],
+               tools["add_to_cart"], tools["remove_from_cart"]],
+        markdown=markdown,
+        debug_mode=debug_mode
+    )
+
+    executor_agent = Agent(
+        name="Executor Agent",
+        role="Executar ações relacionadas a pedidos",
+        model=build_model(member_model_cls, Priority.ORDER, client),
+        tools=[tools["view_cart"], tools["update_cart_customer"], tools["create_complete_order"],
+               tools["filter_orders"], tools["update_order_address"], tools["get_client_orders"]],
+        instructions=executor_instructions,
+        markdown=markdown,
+        debug_mode=debug_mode
+    )
+
+    return Team(model=build_model(team_model_cls, Priority.INFORMATION, client),
+                members=[information_agent, executor_agent])
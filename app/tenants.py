@@ -0,0 +1,286 @@
+"""
+Várias pizzarias (tenants) servidas por um único processo.
+
+Cada tenant tem seu catálogo (db_path + loja_id), sua base de conhecimento e
+seus prompts. Os recursos pesados são compartilhados por todos:
+- cliente OpenAI (um pool HTTP) usado por todos os modelos
+- adapter de embeddings, com o cache LRU de queries
+- pools HTTP da API de pedidos e o agendador de requisições (já por processo)
+
+A base de conhecimento de cada tenant (a parte cara: chunks, índices,
+vectorstore) é montada no primeiro uso e fica em cache; tenants ociosos são
+descartados por LRU (`max_active`) ou por inatividade (`idle_ttl`, conferida
+a cada acesso ao registro). O Team em si não é compartilhado entre turnos
+concorrentes: o Agent/Team do agno guarda estado da execução na instância,
+então cada turno monta o seu (barato) a partir dos recursos em cache.
+
+Configuração em data/tenants.json (ou TENANTS_FILE). Uso, uma mensagem por
+linha no formato "tenant|sessao|mensagem":
+    python -m app.tenants < conversas.txt
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from app.tools.menu_tool import DB_PATH, use_catalog
+
+
+TENANTS_FILE = "data/tenants.json"
+DEFAULT_BRAND = "Beauty Pizza"
+
+
+class TenantConfig:
+    """Configuração de uma pizzaria."""
+
+    def __init__(
+        self,
+        tenant_id: str,
+        nome: str = DEFAULT_BRAND,
+        db_path: str = DB_PATH,
+        loja_id: int = 1,
+        knowledge_path: Optional[str] = "data/historia_pizza.txt",
+        persist_directory: Optional[str] = None,
+        vectorstore_type: str = "chroma",
+        instructions: str = ""
+    ):
+        self.tenant_id = tenant_id
+        self.nome = nome
+        self.db_path = db_path
+        self.loja_id = loja_id
+        self.knowledge_path = knowledge_path
+        self.persist_directory = persist_directory or f"./data/tenants/{tenant_id}/chroma_db"
+        self.vectorstore_type = vectorstore_type
+        self.instructions = instructions
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TenantConfig":
+        data = dict(data)
+        return cls(data.pop("id"), **data)
+
+    def prompts(self) -> Tuple[str, str]:
+        """SYSTEM_PROMPT/SYSTEM_PROMPT2 com o nome da pizzaria e instruções extras do tenant."""
+        from app.team import SYSTEM_PROMPT, SYSTEM_PROMPT2
+
+        extra = f"\n{self.instructions.strip()}\n" if self.instructions else ""
+        return tuple(p.replace(DEFAULT_BRAND, self.nome) + extra for p in (SYSTEM_PROMPT, SYSTEM_PROMPT2))
+
+
+def load_tenants(path: str = TENANTS_FILE) -> Dict[str, TenantConfig]:
+    """Lê a lista de tenants de um arquivo JSON ([{"id": ..., "nome": ..., ...}])."""
+    with open(path, encoding="utf-8") as f:
+        return {c.tenant_id: c for c in map(TenantConfig.from_dict, json.load(f))}
+
+
+class SharedResources:
+    """Cliente OpenAI e embeddings criados uma única vez por processo (sob demanda)."""
+
+    def __init__(self, embedder_model: str = "text-embedding-3-small", query_cache_size: int = 4096):
+        self.embedder_model = embedder_model
+        self.query_cache_size = query_cache_size
+        self._openai_client = None
+        self._embeddings = None
+        self._lock = threading.Lock()
+
+    @property
+    def openai_client(self):
+        with self._lock:
+            if self._openai_client is None:
+                from openai import OpenAI
+                self._openai_client = OpenAI()
+            return self._openai_client
+
+    @property
+    def embeddings(self):
+        client = self.openai_client
+        with self._lock:
+            if self._embeddings is None:
+                from agno.knowledge.embedder.openai import OpenAIEmbedder
+                from app.embeddings.knowledge_setup import AgnoEmbedderAdapter
+
+                embedder = OpenAIEmbedder(id=self.embedder_model)
+                if hasattr(embedder, "openai_client"):
+                    embedder.openai_client = client
+                self._embeddings = AgnoEmbedderAdapter(embedder, query_cache_size=self.query_cache_size)
+            return self._embeddings
+
+
+class TenantRegistry:
+    """
+    Registro de tenants com montagem preguiçosa e despejo LRU.
+
+    `builder(config)` monta os recursos do tenant (a base de conhecimento),
+    guardados em cache. Montagens de tenants diferentes acontecem em paralelo;
+    pedidos simultâneos para o mesmo tenant ainda não montado esperam uma
+    única montagem. `get` devolve um Team novo por chamada (um por turno).
+    """
+
+    def __init__(
+        self,
+        tenants: Dict[str, TenantConfig],
+        max_active: int = 16,
+        idle_ttl: Optional[float] = 1800.0,
+        resources: Optional[SharedResources] = None,
+        builder: Optional[Callable[[TenantConfig], Any]] = None,
+        sessions=None
+    ):
+        self.tenants = tenants
+        self.max_active = max_active
+        self.idle_ttl = idle_ttl
+        self.resources = resources or SharedResources()
+        self.builder = builder or self._build_knowledge
+        self.sessions = sessions
+        self.stats = {"hits": 0, "builds": 0, "evictions": 0, "build_seconds": 0.0}
+
+        self._active: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str):
+        """Team novo do tenant para um turno, sobre os recursos em cache (montados no primeiro uso)."""
+        config = self.tenants.get(tenant_id)
+        if config is None:
+            raise KeyError(f"Tenant desconhecido: {tenant_id}")
+        return self._build_team(config, self.resources_for(tenant_id))
+
+    def resources_for(self, tenant_id: str):
+        """Recursos do tenant (builder), montados no primeiro uso e mantidos no cache LRU."""
+        if tenant_id not in self.tenants:
+            raise KeyError(f"Tenant desconhecido: {tenant_id}")
+
+        with self._lock:
+            found, resources = self._touch(tenant_id)
+            # Despejo barato a cada acesso: tenants ociosos saem mesmo sem novas montagens
+            self._evict_locked()
+            if found:
+                return resources
+            build_lock = self._build_locks.setdefault(tenant_id, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                found, resources = self._touch(tenant_id)
+                if found:
+                    return resources
+
+            start = time.perf_counter()
+            resources = self.builder(self.tenants[tenant_id])
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.stats["builds"] += 1
+                self.stats["build_seconds"] += elapsed
+                self._active[tenant_id] = {"resources": resources, "last_used": time.monotonic()}
+                self._evict_locked()
+            return resources
+
+    def run(self, tenant_id: str, message: str):
+        """Executa uma mensagem no Team do tenant, com as ferramentas apontando para o catálogo dele."""
+        team = self.get(tenant_id)
+        config = self.tenants[tenant_id]
+        with use_catalog(config.db_path, config.loja_id):
+            return team.run(message, stream=False)
+
+    def ask(self, tenant_id: str, session_id: str, message: str) -> str:
+        """Turno completo com janela de conversa por (tenant, sessão)."""
+        from app.session_store import SessionStore
+        from app.slo import answer_turn
+
+        if self.sessions is None:
+            self.sessions = SessionStore()
+        key = f"{tenant_id}:{session_id}"
+        window = self.sessions.append(key, "user", message)
+        cart = self.sessions.load_cart(key)
+        config = self.tenants[tenant_id]
+        # A resposta degradada (prazo estourado) também consulta o catálogo do tenant
+        with use_catalog(config.db_path, config.loja_id):
+            text = answer_turn(lambda prompt: self.run(tenant_id, prompt), window, key, cart=cart)
+        self.sessions.save_cart(key, cart)
+        self.sessions.append(key, "assistant", text)
+        return text
+
+    def evict(self, tenant_id: str) -> bool:
+        with self._lock:
+            if self._active.pop(tenant_id, None) is None:
+                return False
+            self.stats["evictions"] += 1
+            return True
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, active=len(self._active), active_tenants=list(self._active), tenants=len(self.tenants))
+
+    # -- interno ------------------------------------------------------------
+
+    def _touch(self, tenant_id: str) -> Tuple[bool, Any]:
+        # Chamado com o lock; (encontrado, recursos) — o builder pode devolver None (tenant sem base)
+        entry = self._active.get(tenant_id)
+        if entry is None:
+            return False, None
+        entry["last_used"] = time.monotonic()
+        self._active.move_to_end(tenant_id)
+        self.stats["hits"] += 1
+        return True, entry["resources"]
+
+    def _evict_locked(self):
+        now = time.monotonic()
+        if self.idle_ttl is not None:
+            for tenant_id in [t for t, e in self._active.items() if now - e["last_used"] > self.idle_ttl]:
+                del self._active[tenant_id]
+                self.stats["evictions"] += 1
+        while len(self._active) > self.max_active:
+            self._active.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _build_knowledge(self, config: TenantConfig):
+        from app.init_db import initialize_database
+
+        initialize_database(config.db_path)
+        knowledge = None
+        if config.knowledge_path:
+            from app.embeddings.knowledge_setup import setup_knowledge_base
+
+            knowledge = setup_knowledge_base(
+                file_path=config.knowledge_path,
+                chunk_size=800,
+                chunk_overlap=120,
+                vectorstore_type=config.vectorstore_type,
+                persist_directory=config.persist_directory,
+                embeddings=self.resources.embeddings,
+            )
+        print(f"🏪 Tenant {config.tenant_id} ({config.nome}) montado")
+        return knowledge
+
+    def _build_team(self, config: TenantConfig, knowledge):
+        from app.team import build_team
+
+        return build_team(
+            knowledge=knowledge,
+            prompts=config.prompts(),
+            db_path=config.db_path,
+            loja_id=config.loja_id,
+            client=self.resources.openai_client,
+        )
+
+
+def registry_from_env() -> TenantRegistry:
+    """Registro configurado por TENANTS_FILE, TENANTS_MAX_ACTIVE e TENANTS_IDLE_TTL."""
+    idle_ttl = os.getenv("TENANTS_IDLE_TTL", "1800")
+    return TenantRegistry(
+        load_tenants(os.getenv("TENANTS_FILE", TENANTS_FILE)),
+        max_active=int(os.getenv("TENANTS_MAX_ACTIVE", "16")),
+        idle_ttl=float(idle_ttl) if idle_ttl else None,
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    registry = registry_from_env()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        tenant_id, session_id, message = line.rstrip("\n").split("|", 2)
+        print(f"[{tenant_id}/{session_id}] {registry.ask(tenant_id, session_id, message)}")
+    print(f"📊 {registry.metrics()}")
@@ -0,0 +1,67 @@
+from typing import Dict, Optional
+
+from app.cart import Cart, current_cart
+from app.tools import menu_tool
+from .schemas import PizzaSpec
+
+
+def _cart() -> Cart:
+    cart = current_cart()
+    if cart is None:
+        raise LookupError("Nenhum carrinho ativo nesta sessão")
+    return cart
+
+
+def pizza_name(flavor: int, size: int, crust: int) -> str:
+    """Nome do item no pedido a partir dos IDs ("Pizza Pepperoni Grande - borda Recheada com Catupiry")."""
+    catalog = menu_tool.get_catalog_ids()
+    return (
+        f"Pizza {catalog['sabores'][flavor]} {catalog['tamanhos'][size]} "
+        f"- borda {catalog['bordas'][crust]}"
+    )
+
+
+def add_pizza(cart: Cart, flavor: int, size: int, crust: int, quantity: int = 1):
+    """Adiciona ao carrinho com o preço da tabela `precos` (loja do tenant atual)."""
+    price = menu_tool.get_price_by_ids(flavor, size, crust)
+    return cart.add(flavor, size, crust, quantity, price, pizza_name(flavor, size, crust))
+
+
+def add_to_cart(pizza: PizzaSpec, quantity: int = 1) -> str:
+    """Adiciona `quantity` pizzas ao carrinho (preço do cardápio) e retorna o resumo do carrinho."""
+    cart = _cart()
+    add_pizza(cart, int(pizza.flavor), int(pizza.size), int(pizza.crust), quantity)
+    return cart.summary()
+
+
+def remove_from_cart(item_number: int, quantity: Optional[int] = None) -> str:
+    """Remove o item `item_number` do resumo (1 = primeiro), ou só `quantity` unidades, e retorna o resumo."""
+    cart = _cart()
+    cart.remove(item_number, quantity)
+    return cart.summary()
+
+
+def view_cart() -> str:
+    """Mostra itens, preços, total, dados do cliente e o que falta para fechar o pedido."""
+    return _cart().summary()
+
+
+def update_cart_customer(client_name: Optional[str] = None, client_document: Optional[str] = None,
+                         delivery_date: Optional[str] = None,
+                         delivery_address: Optional[Dict[str, str]] = None) -> str:
+    """
+    Registra no carrinho os dados do cliente e da entrega (envie só o que o cliente informou).
+
+    Args:
+        client_name: nome do cliente
+        client_document: documento do cliente
+        delivery_date: data de entrega "YYYY-MM-DD"
+        delivery_address: {"street_name" (obrigatório), "number" (obrigatório), "complement", "reference_point"}
+
+    Returns:
+        Resumo atualizado do carrinho.
+    """
+    cart = _cart()
+    cart.set_customer(client_name=client_name, client_document=client_document,
+                      delivery_date=delivery_date, delivery_address=delivery_address)
+    return cart.summary()
@@ -0,0 +1,173 @@
+"""
+Versões compactas das ferramentas dos agentes (TOOL_OUTPUT=compact).
+
+Têm os mesmos nomes das ferramentas originais, mas devolvem texto enxuto:
+apenas os campos úteis, listas em formato tabular (campo|campo) e só a página
+pedida do histórico de pedidos. Menos tokens de entrada nas chamadas seguintes
+do modelo. O que é baixado da API continua dependendo dela paginar (ver
+order_api_tool.iter_order_pages).
+
+Redução de tokens por ferramenta:
+    python -m app.tools.compact
+"""
+import json
+from typing import List, Dict, Any, Optional
+
+from . import menu_tool, order_api_tool
+from .schemas import PizzaIngredients
+
+
+def estimate_tokens(value: Any) -> int:
+    """Conta tokens com tiktoken (ou ~4 caracteres por token) do valor serializado."""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(text))
+    except Exception:
+        return max(1, len(text) // 4)
+
+
+def to_table(rows: List[Dict[str, Any]], fields: List[str]) -> str:
+    """Lista de dicts -> cabeçalho + uma linha por item, separados por '|'."""
+    lines = ["|".join(fields)]
+    for row in rows:
+        lines.append("|".join("" if row.get(f) is None else str(row.get(f)) for f in fields))
+    return "\n".join(lines)
+
+
+def _order_total(order: Dict[str, Any]) -> float:
+    return sum(float(i.get("unit_price", 0)) * int(i.get("quantity", 0)) for i in order.get("items") or [])
+
+
+def _items_summary(order: Dict[str, Any]) -> str:
+    return "; ".join(f"{i.get('quantity')}x {i.get('name')}" for i in order.get("items") or [])
+
+
+def _address_summary(address: Dict[str, Any] | None) -> str:
+    if not address:
+        return ""
+    parts = [address.get("street_name"), address.get("number"), address.get("complement"), address.get("reference_point")]
+    return ", ".join(str(p) for p in parts if p)
+
+
+def format_orders(orders: List[Dict[str, Any]], limit: int = 5, offset: int = 0) -> str:
+    """
+    Tabela compacta de pedidos com paginação (mais recentes primeiro).
+
+    `orders` não precisa ser o histórico completo: basta trazer os primeiros
+    offset + limit + 1 pedidos; o excedente só indica que há mais páginas.
+    """
+    ordered = sorted(orders, key=lambda o: (o.get("delivery_date") or "", o.get("id") or 0), reverse=True)
+    page = ordered[offset:offset + limit]
+    if not page:
+        return "nenhum pedido encontrado"
+    rows = [
+        {"id": o.get("id"), "entrega": o.get("delivery_date"), "itens": _items_summary(o), "total": f"{_order_total(o):.2f}"}
+        for o in page
+    ]
+    text = f"pedidos {offset + 1}-{offset + len(page)}\n" + to_table(rows, ["id", "entrega", "itens", "total"])
+    if len(ordered) > offset + len(page):
+        text += f"\n(há pedidos mais antigos; use offset={offset + len(page)})"
+    return text
+
+
+def format_order(order: Dict[str, Any]) -> str:
+    """Resumo de uma linha de um pedido."""
+    return (
+        f"pedido #{order.get('id')} | cliente {order.get('client_name')} | entrega {order.get('delivery_date')} | "
+        f"itens: {_items_summary(order)} | total R$ {_order_total(order):.2f}"
+        + (f" | endereço: {_address_summary(order.get('delivery_address'))}" if order.get("delivery_address") else "")
+    )
+
+
+def get_menu() -> str:
+    """Lista pizzas (sabor|descrição), tamanhos e bordas disponíveis."""
+    menu = menu_tool.get_menu()
+    return (
+        to_table([{"sabor": p["flavor"], "descricao": p["description"]} for p in menu["sabores"]], ["sabor", "descricao"])
+        + "\ntamanhos: " + ", ".join(menu["tamanhos"])
+        + "\nbordas: " + ", ".join(menu["bordas"])
+    )
+
+
+def get_ingredients(flavor: PizzaIngredients) -> str:
+    """Obtém os ingredientes de uma pizza específica."""
+    ingredients = menu_tool.get_ingredients(flavor)
+    return ", ".join(ingredients) if ingredients else "sabor não encontrado"
+
+
+def filter_orders(client_document: str, delivery_date: str | None = None, limit: int = 5, offset: int = 0) -> str:
+    """
+    Filtra pedidos por documento do cliente e opcionalmente por data de entrega (YYYY-MM-DD).
+    Retorna os `limit` mais recentes a partir de `offset`.
+    """
+    # Só até a página pedida (+1 para saber se há mais); API sem paginação devolve tudo
+    orders = order_api_tool.filter_orders(client_document, delivery_date, limit=offset + limit + 1)
+    return format_orders(orders, limit, offset)
+
+
+def get_client_orders(client_document: str, limit: int = 5, offset: int = 0) -> str:
+    """
+    Busca os pedidos de um cliente pelo documento (mais recentes primeiro).
+    Use offset para ver pedidos mais antigos.
+    """
+    orders = order_api_tool.get_client_orders(client_document, limit=offset + limit + 1)
+    return format_orders(orders, limit, offset)
+
+
+def create_complete_order(client_name: Optional[str] = None, client_document: Optional[str] = None,
+                          delivery_date: Optional[str] = None, items: Optional[List[Dict[str, Any]]] = None,
+                          delivery_address: Optional[Dict[str, str]] = None) -> str:
+    """
+    Cria um pedido completo com itens e endereço de entrega (campos omitidos vêm do carrinho).
+
+    Args:
+        client_name (str): Nome do cliente (padrão: carrinho).
+        client_document (str): Documento do cliente (padrão: carrinho).
+        delivery_date (str): Data de entrega "YYYY-MM-DD" (padrão: carrinho).
+        items (List[Dict[str, Any]]): [{"name": str, "quantity": int, "unit_price": float}, ...]
+        delivery_address (Dict[str, str]): {"street_name", "number", "complement", "reference_point"}
+    """
+    order = order_api_tool.create_complete_order(client_name, client_document, delivery_date, items, delivery_address)
+    return "criado: " + format_order(order)
+
+
+def update_order_address(order_id: int, delivery_address: Dict[str, str]) -> str:
+    """
+    Atualiza o endereço de entrega de um pedido.
+    delivery_address = {"street_name" (obrigatório), "number" (obrigatório), "complement", "reference_point"}
+    """
+    order_api_tool.update_order_address(order_id, delivery_address)
+    return f"endereço do pedido #{order_id} atualizado: {_address_summary(delivery_address)}"
+
+
+def measure_token_reduction(history_size: int = 50) -> Dict[str, Dict[str, int]]:
+    """
+    Compara tokens da saída original vs compacta de cada ferramenta.
+
+    O histórico compacto mostra as mesmas `history_size` linhas do original,
+    então a diferença vem só do formato, não da paginação.
+    """
+    from app.replay import sample_order
+
+    order = sample_order()
+    history = [dict(order, id=1000 + i, delivery_date=f"2025-01-{1 + i % 28:02d}") for i in range(history_size)]
+    pairs = {
+        "get_menu": (menu_tool.get_menu(), get_menu()),
+        "get_client_orders": (history, format_orders(history, limit=len(history))),
+        "create_complete_order": (order, "criado: " + format_order(order)),
+    }
+    report = {}
+    for tool, (verbose, compact) in pairs.items():
+        before, after = estimate_tokens(verbose), estimate_tokens(compact)
+        report[tool] = {"verbose": before, "compact": after, "saved": before - after}
+    return report
+
+
+if __name__ == "__main__":
+    from app.init_db import initialize_database
+
+    initialize_database()
+    for tool, row in measure_token_reduction().items():
+        pct = 100 * row["saved"] / row["verbose"] if row["verbose"] else 0
+        print(f"{tool:22s} {row['verbose']:>6} -> {row['compact']:>5} tokens (-{pct:.0f}%)")
@@ -1,6 +1,10 @@
+import os
 import sqlite3
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Optional, Tuple
 from .schemas import PizzaSpec
 
 import sqlite3
@@ -8,13 +12,41 @@ import logging
 from pathlib import Path
 from .schemas import PizzaIngredients,Flavor
 
-def _get_connection(db_path: str = "data/knowledge_base.db"):
-    """Cria conexão com o banco de dados."""
-    db_path_obj = Path(db_path)
+DB_PATH = "data/knowledge_base.db"
+# Loja cujos preços o atendimento consulta (tabela `lojas`; 1 = matriz)
+STORE_ID = int(os.getenv("STORE_ID", "1"))
+
+# Catálogo do tenant em atendimento (app.tenants): (db_path, loja_id)
+_current_catalog: ContextVar = ContextVar("menu_catalog", default=None)
+
+
+@contextmanager
+def use_catalog(db_path: str, loja_id: int):
+    """Direciona as ferramentas do cardápio para outro banco/loja neste contexto."""
+    token = _current_catalog.set((db_path, loja_id))
+    try:
+        yield
+    finally:
+        _current_catalog.reset(token)
+
+
+def current_catalog(db_path: Optional[str] = None, loja_id: Optional[int] = None) -> Tuple[str, int]:
+    """Resolve banco e loja: argumentos explícitos > tenant atual > padrão do processo."""
+    context_db, context_store = _current_catalog.get() or (DB_PATH, STORE_ID)
+    return db_path or context_db, context_store if loja_id is None else loja_id
+
+
+def _get_connection(db_path: Optional[str] = None):
+    """Cria conexão com o banco de dados (somente leitura quando o arquivo já existe)."""
+    db_path_obj = Path(current_catalog(db_path)[0])
+    if db_path_obj.exists():
+        # As ferramentas do cardápio só leem: conexões read-only em WAL permitem
+        # que vários workers consultem o mesmo arquivo sem bloqueio
+        return sqlite3.connect(f"{db_path_obj.resolve().as_uri()}?mode=ro", uri=True)
     db_path_obj.parent.mkdir(parents=True, exist_ok=True)
     return sqlite3.connect(db_path_obj)
 
-def get_menu(db_path: str = "data/knowledge_base.db") -> dict:
+def get_menu(db_path: Optional[str] = None) -> dict:
     """Lista pizzas, tamanhos e bordas disponíveis."""
     with _get_connection(db_path) as con:
         # Pizzas
@@ -35,7 +67,16 @@ def get_menu(db_path: str = "data/knowledge_base.db") -> dict:
             "bordas": crusts
         }
 
-def get_ingredients(flavor: PizzaIngredients, db_path: str = "data/knowledge_base.db") -> list[str]:
+def get_catalog_ids(db_path: Optional[str] = None) -> dict:
+    """Nomes do catálogo por ID: {"sabores": {id: sabor}, "tamanhos": {...}, "bordas": {...}}."""
+    with _get_connection(db_path) as con:
+        return {
+            "sabores": dict(con.execute("SELECT id, sabor FROM pizzas ORDER BY id").fetchall()),
+            "tamanhos": dict(con.execute("SELECT id, tamanho FROM tamanhos ORDER BY id").fetchall()),
+            "bordas": dict(con.execute("SELECT id, tipo FROM bordas ORDER BY id").fetchall()),
+        }
+
+def get_ingredients(flavor: PizzaIngredients, db_path: Optional[str] = None) -> list[str]:
     """Obtém os ingredientes de uma pizza específica."""
     with _get_connection(db_path) as con:
         cur = con.execute("SELECT ingredientes FROM pizzas WHERE sabor = ?", (flavor.flavor,))
@@ -47,26 +88,28 @@ def get_ingredients(flavor: PizzaIngredients, db_path: str = "data/knowledge_bas
         else:
             return []
 
-def get_price(pizza_spec: PizzaSpec, db_path: str = "data/knowledge_base.db") -> float:
+def get_price(pizza_spec: PizzaSpec, db_path: Optional[str] = None) -> float:
     """Busca por NOME → mapeia para IDs → lê preço da combinação exata em `precos`."""
     return get_price_by_ids(pizza_spec.flavor, pizza_spec.size, pizza_spec.crust, db_path)
 
-def get_price_by_ids(pizza_id: int, tamanho_id: int, borda_id: int, db_path: str = "data/knowledge_base.db") -> float:
-    """Busca DIRETO por IDs na tabela `precos`."""
+def get_price_by_ids(pizza_id: int, tamanho_id: int, borda_id: int, db_path: Optional[str] = None,
+                     loja_id: int | None = None) -> float:
+    """Busca DIRETO por IDs na tabela `precos` (da loja do tenant atual/STORE_ID, se loja_id não for informado)."""
+    db_path, loja_id = current_catalog(db_path, loja_id)
     with _get_connection(db_path) as con:
         row = con.execute(
             """
             SELECT preco
             FROM precos
-            WHERE pizza_id = ? AND tamanho_id = ? AND borda_id = ?;
+            WHERE loja_id = ? AND pizza_id = ? AND tamanho_id = ? AND borda_id = ?;
             """,
-            (pizza_id, tamanho_id, borda_id)
+            (loja_id, pizza_id, tamanho_id, borda_id)
         ).fetchone()
         
         if not row:
             raise LookupError(
                 f"Preço não cadastrado para combinação "
-                f"(pizza_id={pizza_id}, tamanho_id={tamanho_id}, borda_id={borda_id})."
+                f"(loja_id={loja_id}, pizza_id={pizza_id}, tamanho_id={tamanho_id}, borda_id={borda_id})."
             )
         
         price = float(row[0])
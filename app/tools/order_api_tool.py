@@ -1,33 +1,91 @@
+import heapq
 import os
+import threading
 import httpx
 
 
 import requests
-from typing import List, Dict, Any, Optional
-from contextlib import contextmanager
+import requests.adapters
+from typing import List, Dict, Any, Iterator, Optional
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
 from datetime import datetime
+from itertools import islice
+from urllib.parse import parse_qsl, urlsplit
+
+from app.cart import current_cart
+from app.scheduler import check_deadline
+
+
+# Um pool de conexões (keep-alive) por URL base, compartilhado por todas as
+# chamadas e tenants do processo
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _shared_session(base_url: str) -> requests.Session:
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[base_url] = session
+        return session
+
+
+class _BaseURLClient:
+    """Requisições relativas a base_url usando a sessão compartilhada."""
+
+    def __init__(self, session: requests.Session, base_url: str, timeout: float):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.base_url + '/' + url.lstrip('/'), *args, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
 
 
 @contextmanager
 def _get_client(base_url: str | None = None, timeout: float = 10.0):
-    """Context manager para criar uma sessão HTTP com configurações padrão."""
+    """Context manager que fornece um cliente HTTP com configurações padrão (conexões reaproveitadas)."""
     if base_url is None:
         base_url = "http://localhost:8000/api"
-    
-    session = requests.Session()
-    session.timeout = timeout
+    yield _BaseURLClient(_shared_session(base_url), base_url, timeout)
+
+
+# Alteração de pedido em andamento neste contexto (as etapas internas não conferem o prazo de novo)
+_mutating: ContextVar = ContextVar("order_mutation", default=False)
+
+
+@contextmanager
+def _order_mutation():
+    """
+    Alterações na API só começam com o turno ativo (ver app.slo): um turno
+    abandonado pelo prazo não cria nem altera pedidos depois da resposta
+    degradada. Uma vez iniciada, a alteração vai até o fim (sem pedido pela metade).
+    """
+    if not _mutating.get():
+        check_deadline()
+    token = _mutating.set(True)
     try:
-        # Configurar base URL
-        class BaseURLSession(requests.Session):
-            def request(self, method, url, *args, **kwargs):
-                url = base_url.rstrip('/') + '/' + url.lstrip('/')
-                return super().request(method, url, *args, **kwargs)
-        
-        client = BaseURLSession()
-        client.timeout = timeout
-        yield client
+        yield
     finally:
-        session.close()
+        _mutating.reset(token)
 
 
 def create_order(client_name: str, client_document: str, delivery_date: str,
@@ -62,7 +120,7 @@ def create_order(client_name: str, client_document: str, delivery_date: str,
         "delivery_date": delivery_date.strip()
     }
     
-    with _get_client(base_url, timeout) as client:
+    with _order_mutation(), _get_client(base_url, timeout) as client:
         r = client.post("/orders/", json=payload)
         r.raise_for_status()
         return r.json()["id"]
@@ -92,16 +150,109 @@ def get_order(order_id: int, base_url: str | None = None, timeout: float = 10.0)
         return r.json()
 
 
+ORDER_PAGE_SIZE = 20
+# Mais recentes primeiro (a API ordena e pagina no servidor)
+ORDER_ORDERING = "-delivery_date,-id"
+
+
+def _recency_key(order: Dict[str, Any]):
+    return (order.get("delivery_date") or "", order.get("id") or 0)
+
+
+def iter_order_pages(client_document: str, delivery_date: str | None = None,
+                     page_size: int = ORDER_PAGE_SIZE, base_url: str | None = None,
+                     timeout: float = 10.0, limit: int | None = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Percorre /orders/filter/ página por página (mais recentes primeiro), sob demanda.
+
+    Envia limit/offset e segue o cursor `next` quando a API responde no formato
+    paginado ({"results": [...], "next": ...}). Só a página atual fica em
+    memória; parar a iteração não busca as páginas seguintes.
+
+    A API de referência não pagina e devolve uma lista simples: nesse caso o
+    histórico completo é baixado numa única resposta, e só a seleção é local
+    (os `limit` mais recentes com heapq, sem ordenar tudo). Busca limitada de
+    verdade depende de a API paginar.
+
+    Args:
+        client_document (str): Documento do cliente (obrigatório).
+        delivery_date (str | None): Data de entrega (opcional, formato YYYY-MM-DD).
+        page_size (int): Pedidos por página.
+        base_url (str | None): URL base da API.
+        timeout (float): Timeout para requisições.
+        limit (int | None): Máximo de pedidos (None: todos).
+
+    Yields:
+        List[Dict[str, Any]]: Uma página de pedidos.
+
+    Raises:
+        ValueError: Se client_document estiver vazio.
+    """
+    # Validação do campo obrigatório conforme API
+    if not client_document or not client_document.strip():
+        raise ValueError("client_document é obrigatório e não pode estar vazio")
+
+    params: Dict[str, Any] = {
+        "client_document": client_document.strip(),
+        "ordering": ORDER_ORDERING,
+        "limit": page_size,
+        "offset": 0,
+    }
+    if delivery_date and delivery_date.strip():
+        params["delivery_date"] = delivery_date.strip()
+
+    # Uma única sessão HTTP (conexão reaproveitada) para todas as páginas
+    yielded = 0
+    with _get_client(base_url, timeout) as client:
+        while True:
+            r = client.get("/orders/filter/", params=params)
+            r.raise_for_status()
+            data = r.json()
+
+            if isinstance(data, list):
+                # API sem paginação: tudo veio de uma vez; seleciona só os necessários
+                if limit is None:
+                    data.sort(key=_recency_key, reverse=True)
+                else:
+                    data = heapq.nlargest(limit, data, key=_recency_key)
+                for start in range(0, len(data), page_size):
+                    yield data[start:start + page_size]
+                return
+
+            page = data.get("results") or []
+            if limit is not None:
+                page = page[:limit - yielded]
+            if page:
+                yield page
+                yielded += len(page)
+            next_url = data.get("next")
+            if not next_url or not page or (limit is not None and yielded >= limit):
+                return
+            # Cursor/offset da próxima página vem na query string de `next`
+            query = dict(parse_qsl(urlsplit(next_url).query))
+            params = {**params, **query} if query else dict(params, offset=int(params["offset"]) + len(page))
+
+
+def iter_client_orders(client_document: str, delivery_date: str | None = None,
+                       page_size: int = ORDER_PAGE_SIZE, base_url: str | None = None,
+                       timeout: float = 10.0, limit: int | None = None) -> Iterator[Dict[str, Any]]:
+    """Itera pedido a pedido (mais recentes primeiro), buscando as páginas conforme o consumo."""
+    for page in iter_order_pages(client_document, delivery_date, page_size, base_url, timeout, limit):
+        yield from page
+
+
 def filter_orders(client_document: str, delivery_date: str | None = None,
-                 base_url: str | None = None, timeout: float = 10.0) -> List[Dict[str, Any]]:
+                 base_url: str | None = None, timeout: float = 10.0, limit: int = 5) -> List[Dict[str, Any]]:
     """
     Filtra pedidos por documento do cliente e opcionalmente por data de entrega.
+    Retorna apenas os `limit` pedidos mais recentes.
     
     Args:
         client_document (str): Documento do cliente (obrigatório).
         delivery_date (str | None): Data de entrega (opcional, formato YYYY-MM-DD).
         base_url (str | None): URL base da API.
         timeout (float): Timeout para requisições.
+        limit (int): Quantidade de pedidos mais recentes (padrão 5).
         
     Returns:
         List[Dict[str, Any]]: Lista de pedidos encontrados.
@@ -109,18 +260,9 @@ def filter_orders(client_document: str, delivery_date: str | None = None,
     Raises:
         ValueError: Se client_document estiver vazio.
     """
-    # Validação do campo obrigatório conforme API
-    if not client_document or not client_document.strip():
-        raise ValueError("client_document é obrigatório e não pode estar vazio")
-    
-    params = {"client_document": client_document.strip()}
-    if delivery_date and delivery_date.strip():
-        params["delivery_date"] = delivery_date.strip()
-    
-    with _get_client(base_url, timeout) as client:
-        r = client.get("/orders/filter/", params=params)
-        r.raise_for_status()
-        return r.json()
+    limit = max(limit, 0)
+    pages = iter_client_orders(client_document, delivery_date, min(max(limit, 1), 50), base_url, timeout, limit)
+    return list(islice(pages, limit))
 
 
 def add_items_to_order(order_id: int, items: List[Dict[str, Any]],
@@ -181,7 +323,7 @@ def add_items_to_order(order_id: int, items: List[Dict[str, Any]],
     
     payload = {"items": items}
     
-    with _get_client(base_url, timeout) as client:
+    with _order_mutation(), _get_client(base_url, timeout) as client:
         r = client.patch(f"/orders/{order_id}/add-items/", json=payload)
         r.raise_for_status()
         return r.json() if r.content else {"message": "Itens adicionados com sucesso."}
@@ -210,12 +352,24 @@ def delete_item_from_order(order_id: int, item_id: int,
     if not isinstance(item_id, int) or item_id <= 0:
         raise ValueError("item_id deve ser um número inteiro positivo")
     
-    with _get_client(base_url, timeout) as client:
+    with _order_mutation(), _get_client(base_url, timeout) as client:
         r = client.delete(f"/orders/{order_id}/items/{item_id}/")
         r.raise_for_status()
         return r.status_code == 204
 
 
+def _validate_address(delivery_address: Dict[str, str]):
+    """Campos obrigatórios do endereço conforme a API."""
+    if not delivery_address or not isinstance(delivery_address, dict):
+        raise ValueError("delivery_address é obrigatório e deve ser um dicionário")
+    
+    if not delivery_address.get("street_name") or not delivery_address["street_name"].strip():
+        raise ValueError("'street_name' é obrigatório e não pode estar vazio")
+    
+    if not delivery_address.get("number") or not delivery_address["number"].strip():
+        raise ValueError("'number' é obrigatório e não pode estar vazio")
+
+
 def update_order_address(order_id: int, delivery_address: Dict[str, str],
                         base_url="http://localhost:8000/api", timeout: float = 10.0) -> Dict[str, Any]:
     """
@@ -255,76 +409,83 @@ def update_order_address(order_id: int, delivery_address: Dict[str, str],
     if not isinstance(order_id, int) or order_id <= 0:
         raise ValueError("order_id deve ser um número inteiro positivo")
     
-    if not delivery_address or not isinstance(delivery_address, dict):
-        raise ValueError("delivery_address é obrigatório e deve ser um dicionário")
-    
-    # Campos obrigatórios conforme API
-    if not delivery_address.get("street_name") or not delivery_address["street_name"].strip():
-        raise ValueError("'street_name' é obrigatório e não pode estar vazio")
-    
-    if not delivery_address.get("number") or not delivery_address["number"].strip():
-        raise ValueError("'number' é obrigatório e não pode estar vazio")
-    
+    _validate_address(delivery_address)
     
     payload = {"delivery_address": delivery_address}
     
-    with _get_client(base_url, timeout) as client:
+    with _order_mutation(), _get_client(base_url, timeout) as client:
         r = client.patch(f"/orders/{order_id}/update-address/", json=payload)
         r.raise_for_status()
         return r.json() if r.content else {"message": "Endereço atualizado com sucesso."}
 
 
-def create_complete_order(client_name: str, client_document: str, delivery_date: str,
-                         items: List[Dict[str, Any]], delivery_address: Dict[str, str],
-                         base_url="http://localhost:8000/api", timeout: float = 10.0) -> Dict[str, Any]:
+def create_complete_order(client_name: str | None = None, client_document: str | None = None,
+                          delivery_date: str | None = None, items: List[Dict[str, Any]] | None = None,
+                          delivery_address: Dict[str, str] | None = None,
+                          base_url="http://localhost:8000/api", timeout: float = 10.0) -> Dict[str, Any]:
     """
     Cria um pedido completo com itens e endereço de entrega.
+    Campos não informados vêm do carrinho da sessão, que é esvaziado após o pedido.
     
     Args:
-        client_name (str): Nome do cliente (obrigatório).
-        client_document (str): Documento do cliente (obrigatório).
-        delivery_date (str): Data de entrega "YYYY-MM-DD" (obrigatório).
-        items (List[Dict[str, Any]]): Lista de itens do pedido (obrigatório).
-        items = [
-            {"name": "Produto A", "quantity": 2, "unit_price": 10.50},
-            {"name": "Produto B", "quantity": 1, "unit_price": 25.00}
-        ]
-
-        delivery_address (Dict[str, str]): Endereço de entrega (obrigatório).
-        delivery_address = {
-            "street_name": "Nome da rua contida no endereço" (obrigatório),
-            "number": "Numero do logradouro" (obrigatório),
-            "complement": "Complemento" ,
-            "reference_point": "Ponto de referência"
-        }
+        client_name (str): Nome do cliente (padrão: carrinho).
+        client_document (str): Documento do cliente (padrão: carrinho).
+        delivery_date (str): Data de entrega "YYYY-MM-DD" (padrão: carrinho).
+        items (List[Dict[str, Any]]): [{"name", "quantity", "unit_price"}] (padrão: itens do carrinho).
+        delivery_address (Dict[str, str]): {"street_name", "number", "complement", "reference_point"}
+            (padrão: carrinho).
         base_url (str | None): URL base da API.
         timeout (float): Timeout para requisições.
         
     Returns:
         Dict[str, Any]: Dados do pedido criado com todos os itens.
     """
-    # Criar o pedido (já valida campos obrigatórios)
-    order_id = create_order(client_name, client_document, delivery_date, base_url, timeout)
-    
-    # Adicionar itens se fornecidos (já valida campos obrigatórios)
-    if items:
-        add_items_to_order(order_id, items, base_url, timeout)
-    
+    # Completa com o carrinho da sessão (app.cart). O carrinho fica travado até o
+    # pedido sair; um turno abandonado pelo prazo (com ou sem carrinho) não cria o
+    # pedido depois da resposta degradada
+    cart = current_cart()
+    with _order_mutation(), cart.editing() if cart is not None else nullcontext():
+        if cart is not None:
+            client_name = client_name or cart.client_name
+            client_document = client_document or cart.client_document
+            delivery_date = delivery_date or cart.delivery_date
+            delivery_address = delivery_address or cart.delivery_address
+            items = items or cart.order_items()
+        if delivery_address:
+            # Valida antes de criar o pedido, para não deixar um pedido sem endereço
+            _validate_address(delivery_address)
+
+        # Criar o pedido (já valida campos obrigatórios)
+        order_id = create_order(client_name, client_document, delivery_date, base_url, timeout)
+
+        # Adicionar itens se fornecidos (já valida campos obrigatórios)
+        if items:
+            add_items_to_order(order_id, items, base_url, timeout)
+
+        if delivery_address:
+            update_order_address(order_id, delivery_address, base_url, timeout)
+
+        if cart is not None:
+            cart.clear()
+
     # Retornar o pedido completo
     return get_order(order_id, base_url, timeout)
 
 
-def get_client_orders(client_document: str, base_url: str | None = None, timeout: float = 10.0) -> List[Dict[str, Any]]:
+def get_client_orders(client_document: str, base_url: str | None = None, timeout: float = 10.0,
+                      limit: int = 5) -> List[Dict[str, Any]]:
     """
-    Busca todos os pedidos de um cliente pelo documento.
+    Busca os pedidos mais recentes de um cliente pelo documento.
+    Para percorrer o histórico completo use iter_client_orders.
     
     Args:
         client_document (str): Documento do cliente (obrigatório).
         base_url (str | None): URL base da API.
         timeout (float): Timeout para requisições.
+        limit (int): Quantidade de pedidos mais recentes (padrão 5).
         
     Returns:
-        List[Dict[str, Any]]: Lista de todos os pedidos do cliente.
+        List[Dict[str, Any]]: Os `limit` pedidos mais recentes do cliente.
     """
     # Usa filter_orders que já valida o campo obrigatório
-    return filter_orders(client_document, None, base_url, timeout)
\ No newline at end of file
+    return filter_orders(client_document, None, base_url, timeout, limit=limit)
\ No newline at end of file
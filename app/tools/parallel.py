@@ -0,0 +1,90 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Tuple
+
+from app.scheduler import ScheduledOpenAIChat
+
+
+# Ferramentas sem efeito colateral: podem rodar em paralelo dentro do mesmo turno.
+# Ações de pedido (create_complete_order, update_order_address, ...) ficam serializadas.
+READ_ONLY_TOOLS = {
+    "get_menu",
+    "get_ingredients",
+    "get_price",
+    "get_client_orders",
+    "filter_orders",
+    "view_cart",
+}
+
+TOOL_TIMING: Dict[str, float] = {"batches": 0, "calls": 0, "sequential_seconds": 0.0, "wall_seconds": 0.0}
+_timing_lock = threading.Lock()
+
+
+def run_parallel(calls: List[Callable[[], Any]], max_workers: int = 4) -> List[Tuple[Any, float]]:
+    """
+    Executa os callables num pool limitado e retorna (resultado, duração) na
+    ordem de entrada. Exceções são propagadas como resultado.
+    """
+    def timed(call):
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - start
+
+    if len(calls) <= 1:
+        return [timed(call) for call in calls]
+
+    # Cada thread roda numa cópia do contexto (tenant, prioridade do agendador)
+    contexts = [contextvars.copy_context() for _ in calls]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(calls))) as pool:
+        outcomes = list(pool.map(lambda ctx, call: ctx.run(timed, call), contexts, calls))
+    wall = time.perf_counter() - start
+
+    with _timing_lock:
+        TOOL_TIMING["batches"] += 1
+        TOOL_TIMING["calls"] += len(calls)
+        TOOL_TIMING["sequential_seconds"] += sum(elapsed for _, elapsed in outcomes)
+        TOOL_TIMING["wall_seconds"] += wall
+    return outcomes
+
+
+def time_saved() -> float:
+    """Segundos economizados pela execução concorrente (soma sequencial - tempo real)."""
+    return TOOL_TIMING["sequential_seconds"] - TOOL_TIMING["wall_seconds"]
+
+
+class ParallelOpenAIChat(ScheduledOpenAIChat):
+    """
+    OpenAIChat (agendado, ver app.scheduler) que executa em paralelo as tool calls somente leitura emitidas
+    na mesma resposta do modelo.
+
+    As chamadas read-only que vêm antes da primeira ação de pedido são
+    pré-executadas no pool; depois o fluxo normal do Agno percorre as chamadas
+    na ordem original (reaproveitando os resultados), de modo que mensagens de
+    resultado e eventos saem em ordem determinística.
+    """
+
+    max_tool_workers: int = 4
+
+    def run_function_calls(self, function_calls, *args, **kwargs):
+        prefetch = []
+        for fc in function_calls:
+            if fc.function.name not in READ_ONLY_TOOLS:
+                break
+            prefetch.append(fc)
+
+        if len(prefetch) > 1:
+            outcomes = run_parallel([fc.execute for fc in prefetch], self.max_tool_workers)
+            for fc, (result, _) in zip(prefetch, outcomes):
+                if isinstance(result, Exception):
+                    # Deixa o Agno executar de novo e tratar o erro no fluxo normal
+                    continue
+                # FunctionCall é um modelo pydantic: grava direto no __dict__ da instância
+                object.__setattr__(fc, "execute", lambda result=result: result)
+
+        yield from super().run_function_calls(function_calls, *args, **kwargs)
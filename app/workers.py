@@ -0,0 +1,284 @@
+"""
+Modo multi-processo (pre-fork) com afinidade de sessão.
+
+O supervisor importa antes do fork apenas módulos puros (agno, langchain,
+app.team...) e cria/migra o banco do cardápio, de modo que essas páginas ficam
+compartilhadas. Conexões SQLite, clientes HTTP/OpenAI, Chroma e pools de
+threads não sobrevivem a um fork: cada worker monta o próprio agente depois
+do fork.
+A base de conhecimento dos workers é sempre um snapshot (KNOWLEDGE_SNAPSHOT,
+padrão data/knowledge.bpks): se ele não existir, o supervisor o gera uma única
+vez antes do fork, num processo à parte, em vez de N workers fazerem embedding
+e escreverem o mesmo diretório do Chroma. O índice é um mmap do mesmo arquivo,
+compartilhado pelo page cache.
+Só o primeiro fork acontece com o supervisor sem threads; workers que caem
+são recriados por um forkserver (ou spawn), nunca com fork do supervisor já
+rodando as threads de coleta e monitoramento.
+Cada worker recebe 1/N dos limites OPENAI_RPM/OPENAI_TPM (SCHEDULER_SHARE),
+para que o conjunto respeite o limite da conta.
+Cada sessão é sempre roteada para o mesmo worker, que mantém a janela de
+conversa em cache (persistida no SessionStore).
+Workers que morrem são recriados e as métricas de todos são agregadas.
+
+Uso (uma mensagem por linha, no formato "sessao|mensagem"):
+    python -m app.workers --workers 4 < conversas.txt
+"""
+import gc
+import multiprocessing as mp
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from itertools import count
+from typing import Dict, Any, Optional, Tuple
+
+
+# Importados antes do fork: só definições, sem conexões, clientes ou threads
+PRELOAD_MODULES = ("app.team", "app.slo", "app.session_store", "app.embeddings.knowledge_setup")
+DEFAULT_SNAPSHOT = "data/knowledge.bpks"
+
+
+def preload_modules():
+    """Cria/migra o banco (conexão fechada antes do fork) e importa os módulos puros."""
+    import importlib
+    from app.init_db import initialize_database
+
+    initialize_database()
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+def _build_snapshot(path: str):
+    from app.embeddings.snapshot import build_snapshot
+
+    build_snapshot(path)
+
+
+def ensure_snapshot(path: Optional[str] = None) -> str:
+    """
+    Garante o snapshot da base de conhecimento para os workers e o exporta em KNOWLEDGE_SNAPSHOT.
+
+    Se o arquivo não existir, ele é gerado uma vez num processo `spawn` (o
+    supervisor continua sem threads nem clientes HTTP para o fork).
+    """
+    from app.embeddings.snapshot import is_snapshot
+
+    path = path or os.getenv("KNOWLEDGE_SNAPSHOT") or DEFAULT_SNAPSHOT
+    if not is_snapshot(path):
+        if os.path.exists(path):
+            raise RuntimeError(f"{path} não é um snapshot da base de conhecimento (KNOWLEDGE_SNAPSHOT)")
+        print(f"📦 Gerando o snapshot da base de conhecimento em {path} (uma vez, antes dos workers)...")
+        builder = mp.get_context("spawn").Process(target=_build_snapshot, args=(path,), name="beauty-pizza-snapshot")
+        builder.start()
+        builder.join()
+        if builder.exitcode != 0 or not is_snapshot(path):
+            raise RuntimeError(
+                f"Não foi possível gerar o snapshot {path}; gere com `python -m app.embeddings.snapshot build`"
+            )
+    os.environ["KNOWLEDGE_SNAPSHOT"] = path
+    return path
+
+
+def _worker_loop(index: int, size: int, inbox, outbox):
+    """Loop de um worker: processa mensagens das sessões roteadas para ele."""
+    # O agendador é por processo: cada worker fica com sua parte do RPM/TPM da conta
+    os.environ["SCHEDULER_SHARE"] = str(1 / size)
+    from app.agent import get_agent
+    from app.main import WINDOW
+    from app.session_store import SessionStore
+    from app.slo import answer_turn
+
+    # A janela de cada sessão fica no SQLite compartilhado: sobrevive ao restart do worker
+    agent = get_agent()
+    sessions = SessionStore(window=WINDOW)
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        request_id, session_id, message = item
+        start = time.perf_counter()
+        try:
+            window = sessions.append(session_id, "user", message)
+            cart = sessions.load_cart(session_id)
+            text = answer_turn(lambda prompt: agent.run(prompt, stream=False), window, session_id, cart=cart)
+            sessions.save_cart(session_id, cart)
+            sessions.append(session_id, "assistant", text)
+            outbox.put((request_id, index, True, text, time.perf_counter() - start))
+        except Exception as e:
+            outbox.put((request_id, index, False, f"{type(e).__name__}: {e}", time.perf_counter() - start))
+
+
+class WorkerPool:
+    """Supervisor dos workers pre-fork."""
+
+    def __init__(self, workers: Optional[int] = None, preload: bool = True, check_interval: float = 1.0,
+                 snapshot: Optional[str] = None):
+        self.size = workers or os.cpu_count() or 1
+        self.preload = preload
+        self.check_interval = check_interval
+        self.snapshot = snapshot
+
+        methods = mp.get_all_start_methods()
+        # Restarts (e as filas) usam forkserver/spawn: o supervisor já tem threads rodando
+        self._restart_ctx = mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._ctx = mp.get_context("fork") if "fork" in methods else self._restart_ctx
+        if self._restart_ctx.get_start_method() == "forkserver":
+            # O forkserver importa os mesmos módulos puros uma vez; os workers recriados herdam as páginas
+            self._restart_ctx.set_forkserver_preload(list(PRELOAD_MODULES))
+        self._outbox = self._restart_ctx.Queue()
+        self._inboxes: list = [None] * self.size
+        self._processes: list = [None] * self.size
+        self._pending: Dict[int, Tuple[int, Future]] = {}
+        self._ids = count(1)
+        self._lock = threading.Lock()
+        self._running = False
+        self._threads: list = []
+        self._metrics = [
+            {"requests": 0, "errors": 0, "latency_total": 0.0, "restarts": 0}
+            for _ in range(self.size)
+        ]
+
+    def start(self) -> "WorkerPool":
+        # Índice construído uma vez aqui; os workers só abrem o snapshot (mmap)
+        self.snapshot = ensure_snapshot(self.snapshot)
+        if self.preload:
+            # Módulos carregados antes do fork (páginas compartilhadas); recursos só nos workers
+            preload_modules()
+            # Objetos já carregados não são mais percorridos pelo GC, evitando cópias
+            gc.freeze()
+
+        for index in range(self.size):
+            self._spawn(index)
+
+        self._running = True
+        for target in (self._collect, self._monitor):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🚀 {self.size} workers iniciados ({self._ctx.get_start_method()}; "
+              f"restarts via {self._restart_ctx.get_start_method()})")
+        return self
+
+    def route(self, session_id: str) -> int:
+        """Afinidade de sessão: hash estável entre processos."""
+        return zlib.crc32(session_id.encode("utf-8")) % self.size
+
+    def submit(self, session_id: str, message: str) -> Future:
+        """Envia a mensagem ao worker da sessão e retorna um Future com a resposta."""
+        if not self._running:
+            raise RuntimeError("WorkerPool não iniciado")
+        future: Future = Future()
+        index = self.route(session_id)
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (index, future)
+            inbox = self._inboxes[index]
+        inbox.put((request_id, session_id, message))
+        return future
+
+    def ask(self, session_id: str, message: str, timeout: Optional[float] = None) -> str:
+        return self.submit(session_id, message).result(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Métricas por worker e agregadas."""
+        with self._lock:
+            per_worker = [dict(m, alive=p.is_alive()) for m, p in zip(self._metrics, self._processes)]
+            pending = len(self._pending)
+        requests = sum(m["requests"] for m in per_worker)
+        latency = sum(m["latency_total"] for m in per_worker)
+        return {
+            "workers": per_worker,
+            "requests": requests,
+            "errors": sum(m["errors"] for m in per_worker),
+            "restarts": sum(m["restarts"] for m in per_worker),
+            "pending": pending,
+            "avg_latency": latency / requests if requests else 0.0,
+        }
+
+    def stop(self, timeout: float = 5.0):
+        self._running = False
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _spawn(self, index: int, ctx=None):
+        inbox = self._restart_ctx.Queue()
+        process = (ctx or self._ctx).Process(
+            target=_worker_loop,
+            args=(index, self.size, inbox, self._outbox),
+            name=f"beauty-pizza-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self._inboxes[index] = inbox
+        self._processes[index] = process
+
+    def _collect(self):
+        """Recebe respostas dos workers, resolve os Futures e agrega métricas."""
+        while self._running:
+            try:
+                request_id, index, ok, payload, elapsed = self._outbox.get(timeout=self.check_interval)
+            except Exception:
+                continue
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+                metrics = self._metrics[index]
+                metrics["requests"] += 1
+                metrics["latency_total"] += elapsed
+                if not ok:
+                    metrics["errors"] += 1
+            if entry is None:
+                continue
+            if ok:
+                entry[1].set_result(payload)
+            else:
+                entry[1].set_exception(RuntimeError(payload))
+
+    def _monitor(self):
+        """Recria workers que morreram e falha as requisições que estavam com eles."""
+        while self._running:
+            time.sleep(self.check_interval)
+            for index, process in enumerate(self._processes):
+                if process.is_alive() or not self._running:
+                    continue
+                print(f"⚠️ Worker {index} caiu (exit={process.exitcode}), reiniciando...")
+                with self._lock:
+                    lost = [rid for rid, (i, _) in self._pending.items() if i == index]
+                    futures = [self._pending.pop(rid)[1] for rid in lost]
+                    self._metrics[index]["restarts"] += 1
+                    self._spawn(index, self._restart_ctx)
+                for future in futures:
+                    future.set_exception(RuntimeError(f"Worker {index} reiniciado durante o atendimento"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Beauty Pizza em modo multi-processo")
+    parser.add_argument("--workers", type=int, default=None, help="Número de workers (padrão: núcleos)")
+    parser.add_argument("--snapshot", default=None, help=f"Snapshot da base (padrão: KNOWLEDGE_SNAPSHOT ou {DEFAULT_SNAPSHOT})")
+    args = parser.parse_args()
+
+    with WorkerPool(args.workers, snapshot=args.snapshot) as pool:
+        futures = []
+        for line in sys.stdin:
+            session_id, _, message = line.rstrip("\n").partition("|")
+            if message.strip():
+                futures.append((session_id, pool.submit(session_id, message.strip())))
+        for session_id, future in futures:
+            try:
+                print(f"[{session_id}] Atendente: {future.result()}")
+            except Exception as e:
+                print(f"[{session_id}] Erro: {e}")
+        print(f"📊 Métricas: {pool.metrics()}")
@@ -0,0 +1,22 @@
+"""Orçamento de importação do agente (app.import_budget)."""
+from app.import_budget import check_import_budget
+
+
+def test_import_agent_within_budget():
+    # Sem --allow: nenhum vectorstore pesado pode ser carregado só pelo import
+    assert check_import_budget("app.agent", max_seconds=3.0, max_rss_mb=400.0) == []
+
+
+def test_import_agent_has_no_side_effects(tmp_path):
+    # Importar não cria o banco nem a base de conhecimento (isso fica em get_agent)
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    root = Path(__file__).resolve().parent.parent
+    probe = "import app.agent, sys; sys.exit('app.init_db' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", probe], cwd=tmp_path, env={"PYTHONPATH": str(root)}, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert list(tmp_path.iterdir()) == []